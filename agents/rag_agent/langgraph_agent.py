@@ -1,12 +1,31 @@
-from typing import Literal
+import sqlite3
+import uuid
+from typing import Literal, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
-from .nodes import router_node, rag_node, web_node, answer_node
+from langgraph.checkpoint.memory import MemorySaver
+from .nodes import (
+    pre_router_node,
+    router_node,
+    rag_node,
+    web_node,
+    answer_node,
+    memory_node,
+)
 from .shared import AgentState
+from config import (
+    RAG_CHECKPOINT_BACKEND,
+    RAG_CHECKPOINT_PATH,
+    RAG_CHECKPOINT_DB_URL,
+)
 from IPython.display import display
 
 
 # ── Routing helpers ─────────────────────────────────────────────────
+def from_pre_router(st: AgentState) -> Literal["router", "rag", "end"]:
+    return st["route"]
+
+
 def from_router(st: AgentState) -> Literal["rag", "answer", "end"]:
     return st["route"]
 
@@ -21,22 +40,63 @@ def after_web(_) -> Literal["answer"]:
 
 # ── Build graph ─────────────────────────────────────────────────────
 g = StateGraph(AgentState)
+g.add_node("pre_router", pre_router_node)
 g.add_node("router", router_node)
 g.add_node("rag_lookup", rag_node)
 g.add_node("web_search", web_node)
 g.add_node("answer", answer_node)
+g.add_node("memory", memory_node)
 
-g.set_entry_point("router")
+g.set_entry_point("pre_router")
+g.add_conditional_edges(
+    "pre_router",
+    from_pre_router,
+    {"router": "router", "rag": "rag_lookup", "end": "memory"},
+)
 g.add_conditional_edges(
-    "router", from_router, {"rag": "rag_lookup", "answer": "answer", "end": END}
+    "router",
+    from_router,
+    {"rag": "rag_lookup", "answer": "answer", "end": "memory"},
 )
 g.add_conditional_edges(
     "rag_lookup", after_rag, {"answer": "answer", "web": "web_search"}
 )
 g.add_edge("web_search", "answer")
-g.add_edge("answer", END)
+g.add_edge("answer", "memory")
+g.add_edge("memory", END)
+
+
+# ── Conversation checkpoints ────────────────────────────────────────
+def make_checkpointer():
+    if RAG_CHECKPOINT_BACKEND == "postgres":
+        from psycopg import Connection
+        from psycopg.rows import dict_row
+        from langgraph.checkpoint.postgres import PostgresSaver
+
+        conn = Connection.connect(
+            RAG_CHECKPOINT_DB_URL,
+            autocommit=True,
+            prepare_threshold=0,
+            row_factory=dict_row,
+        )
+        saver = PostgresSaver(conn)
+        saver.setup()
+        return saver
+
+    if RAG_CHECKPOINT_BACKEND == "sqlite":
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        return SqliteSaver(sqlite3.connect(RAG_CHECKPOINT_PATH, check_same_thread=False))
+
+    return MemorySaver()
+
+
+def thread_config(thread_id: Optional[str] = None) -> dict:
+    """Invoke config for a conversation; a new thread is started when no id is given."""
+    return {"configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+
 
-agent = g.compile()
+agent = g.compile(checkpointer=make_checkpointer())
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from .langgraph_agent import agent
+from .langgraph_agent import agent, thread_config
 from .shared import AgentState
 from langchain_core.messages import HumanMessage
 
@@ -17,7 +17,7 @@ if __name__ == "__main__":
     }
 
     # Run the agent with the initial state
-    final_state = agent.invoke(initial_state)
+    final_state = agent.invoke(initial_state, config=thread_config())
 
     # Print the final messages from the agent
     for message in final_state["messages"]:
@@ -1,14 +1,54 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, RemoveMessage
 from .shared import (
     AgentState,
     router_llm,
     judge_llm,
     answer_llm,
+    decompose_llm,
+    summary_llm,
     RouteDecision,
     RagJudge,
+    SubQueries,
+    emit_progress,
 )
-from .tools import rag_search_tool, web_search_tool
+from .tools import rag_search_tool, rag_multi_search_tool, web_search_tool
+from .pre_router import pre_route, small_talk_reply
+from config import (
+    PRE_ROUTER_ENABLED,
+    SPECULATIVE_WEB_SEARCH,
+    RAG_MULTI_QUERY,
+    RAG_MAX_SUBQUERIES,
+    RAG_MEMORY_WINDOW,
+)
+
+
+def _summary_context(state: AgentState) -> str:
+    summary = state.get("summary")
+    return f"\n\nSummary of the earlier conversation:\n{summary}" if summary else ""
+
+
+# ── Node 0: local pre-router ────────────────────────────────────────
+def pre_router_node(state: AgentState) -> AgentState:
+    query = next(
+        (m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)),
+        "",
+    )
+    route = None
+    if PRE_ROUTER_ENABLED:
+        route, confidence, method = pre_route(query)
+        print(f"Pre-router: {route or 'llm'} ({method}, confidence={confidence:.2f})")
+
+    if route is None:
+        return {**state, "route": "router"}
+
+    if route == "end":
+        state["messages"] = state["messages"] + [AIMessage(content=small_talk_reply(query))]
+    return {**state, "route": route}
 
 
 # ── Node 1: decision/router ─────────────────────────────────────────
@@ -19,6 +59,7 @@ def router_node(state: AgentState) -> AgentState:
         "- Use 'end' for pure greetings/small-talk (also provide a 'reply') and answer that is already in the current conversation chat history\n"
         "- Use 'rag' when knowledge base (text of documents of a shop keeper important docs and invoice) lookup is needed \n"
         "- Use 'answer' when you can answer directly without external info"
+        + _summary_context(state)
     )
     messages = [SystemMessage(content=system_prompt)] + state["messages"]
     result: RouteDecision = router_llm.invoke(messages)
@@ -31,6 +72,88 @@ def router_node(state: AgentState) -> AgentState:
     return state
 
 
+# ── Speculative web search ───────────────────────────────────────────
+_speculative_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="spec-web")
+_speculative_lock = threading.Lock()
+SPECULATIVE_WEB_STATS = {
+    "launched": 0,
+    "used": 0,
+    "cancelled": 0,  # judge said sufficient before Tavily was even called
+    "cache_hits": 0,  # thrown away, but served from the web cache: no Tavily call
+    "wasted_calls": 0,  # Tavily was called but the result was thrown away
+    "latency_saved_s": 0.0,
+    "wasted_web_s": 0.0,
+}
+
+
+def _record_speculation(**deltas) -> None:
+    with _speculative_lock:
+        for key, value in deltas.items():
+            SPECULATIVE_WEB_STATS[key] += value
+
+
+def get_speculative_web_stats() -> dict:
+    with _speculative_lock:
+        stats = dict(SPECULATIVE_WEB_STATS)
+    stats["latency_saved_s"] = round(stats["latency_saved_s"], 3)
+    stats["wasted_web_s"] = round(stats["wasted_web_s"], 3)
+    return stats
+
+
+def _timed_web_search(query: str) -> tuple[dict, float]:
+    start = time.perf_counter()
+    snippets = web_search_tool.invoke({"query": query})
+    return snippets, time.perf_counter() - start
+
+
+def _discard_speculation(future) -> None:
+    if future.cancel():
+        _record_speculation(cancelled=1)
+        return
+    # Already running: let it finish in the background and book real API calls as waste.
+    def _book(f) -> None:
+        if f.exception():
+            _record_speculation(wasted_calls=1)
+        elif f.result()[0].get("cached"):
+            _record_speculation(cache_hits=1)
+        else:
+            _record_speculation(wasted_calls=1, wasted_web_s=f.result()[1])
+
+    future.add_done_callback(_book)
+
+
+# ── Query decomposition ──────────────────────────────────────────────
+COMPOUND_PATTERN = re.compile(
+    r"\b(and|vs\.?|versus|compare|comparison|both|as well as|along with|between)\b|[,;]",
+    re.IGNORECASE,
+)
+
+
+def decompose_query(query: str) -> list[str]:
+    """Split a compound question into sub-queries; simple questions skip the LLM."""
+    if not RAG_MULTI_QUERY or not COMPOUND_PATTERN.search(query):
+        return [query]
+    try:
+        result: SubQueries = decompose_llm.invoke(
+            [
+                (
+                    "system",
+                    "Split the user's question into independent search queries for a "
+                    "document store, one per document or fact it asks about. "
+                    "Return the question unchanged as the only query if it asks about one thing.",
+                ),
+                ("user", query),
+            ]
+        )
+        sub_queries = [q.strip() for q in result.queries if q.strip()]
+    except Exception as e:
+        print(f"Query decomposition failed, using original query: {e}")
+        return [query]
+
+    # Keep the original question too; it often matches chunks that mention both parts.
+    return list(dict.fromkeys([query] + sub_queries))[: RAG_MAX_SUBQUERIES + 1]
+
+
 # ── Node 2: RAG lookup ───────────────────────────────────────────────
 def rag_node(state: AgentState) -> AgentState:
     query = next(
@@ -38,9 +161,15 @@ def rag_node(state: AgentState) -> AgentState:
         "",
     )
 
-    result = rag_search_tool.invoke({"query": query})
+    sub_queries = decompose_query(query)
+    if len(sub_queries) > 1:
+        print(f"Decomposed into sub-queries: {sub_queries}")
+        result = rag_multi_search_tool.invoke({"queries": sub_queries})
+    else:
+        result = rag_search_tool.invoke({"query": query})
     chunks = result.get("content", "")
     state["Rag_Citation"] = result.get("source_file", [])
+    emit_progress("retrieved", sources=state["Rag_Citation"], queries=sub_queries)
 
     # Use structured output to judge if RAG results are sufficient
     judge_messages = [
@@ -57,9 +186,38 @@ def rag_node(state: AgentState) -> AgentState:
         ),
     ]
 
+    web_future = None
+    if SPECULATIVE_WEB_SEARCH:
+        web_future = _speculative_pool.submit(_timed_web_search, query)
+        _record_speculation(launched=1)
+
+    judge_start = time.perf_counter()
     verdict: RagJudge = judge_llm.invoke(judge_messages)
+    judge_time = time.perf_counter() - judge_start
+    emit_progress("judged", sufficient=verdict.sufficient)
 
-    return {**state, "rag": chunks, "route": "answer" if verdict.sufficient else "web"}
+    if web_future is None:
+        return {
+            **state,
+            "rag": chunks,
+            "route": "answer" if verdict.sufficient else "web",
+        }
+
+    if verdict.sufficient:
+        _discard_speculation(web_future)
+        return {**state, "rag": chunks, "route": "answer"}
+
+    snippets, web_time = web_future.result()
+    _record_speculation(used=1, latency_saved_s=min(judge_time, web_time))
+    print(f"Speculative web search used (saved ~{min(judge_time, web_time):.2f}s)")
+    emit_progress("web_searched", sources=snippets.get("source_url", []))
+    return {
+        **state,
+        "rag": chunks,
+        "web": snippets.get("content", ""),
+        "Web_Citation": snippets.get("source_url", []),
+        "route": "answer",
+    }
 
 
 # ── Node 3: web search ───────────────────────────────────────────────
@@ -98,6 +256,52 @@ Context:
 
 Provide a helpful, accurate, and concise response based on the available information."""
     messages = state["messages"] + [HumanMessage(content=prompt)]
+    if state.get("summary"):
+        messages = [SystemMessage(content=_summary_context(state).strip())] + messages
     ans = answer_llm.invoke(messages).content
 
     return {**state, "messages": state["messages"] + [AIMessage(content=ans)]}
+
+
+# ── Node 5: rolling conversation memory ──────────────────────────────
+def memory_node(state: AgentState) -> dict:
+    """Fold turns older than RAG_MEMORY_WINDOW into the running summary."""
+    messages = state["messages"]
+    window = max(2, RAG_MEMORY_WINDOW)  # at least the latest question and its answer
+    if len(messages) <= window:
+        return {}
+
+    # Cut on a human turn so the kept window never starts with an orphan answer,
+    # and never past the latest one so the answer just given stays.
+    last_human = max(
+        (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0
+    )
+    cut = len(messages) - window
+    while cut < last_human and not isinstance(messages[cut], HumanMessage):
+        cut += 1
+    old = messages[:min(cut, last_human)]
+    if not old:
+        return {}
+
+    transcript = "\n".join(
+        f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+        for m in old
+    )
+    prompt = (
+        "Update the running summary of this conversation between a shop keeper and "
+        "their assistant. Keep names, documents, amounts, dates and open questions; "
+        "drop greetings. Reply with the summary only.\n\n"
+        f"Current summary:\n{state.get('summary') or 'None'}\n\n"
+        f"New messages:\n{transcript}"
+    )
+    try:
+        summary = summary_llm.invoke([HumanMessage(content=prompt)]).content
+    except Exception as e:
+        print(f"Memory summarization failed, keeping full history: {e}")
+        return {}
+
+    print(f"🧠 Summarized {len(old)} old messages")
+    return {
+        "summary": summary,
+        "messages": [RemoveMessage(id=m.id) for m in old],
+    }
@@ -0,0 +1,157 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Literal, Optional, Tuple
+
+from config import PRE_ROUTER_CONFIDENCE, PRE_ROUTER_MARGIN
+
+
+# ── Rules ────────────────────────────────────────────────────────────
+# Small talk kinds, checked in this order so "ok bye" is a farewell.
+SMALL_TALK_WORDS = {
+    "farewell": r"bye|good\s*bye|see\s+you|good\s+night",
+    "thanks": r"thanks?|thank\s+you|thx",
+    "ack": r"ok(ay)?",
+    "greeting": r"hi+|hello+|hey+|hii+|namaste|namaskar|salaam|salam|assalamualaikum|"
+    r"good\s+(morning|afternoon|evening)|how\s+are\s+you",
+}
+SMALL_TALK_REPLIES = {
+    "greeting": "Hello! 👋 How can I help you with your shop today?",
+    "thanks": "You're welcome! 😊 Let me know if you need anything else.",
+    "ack": "👍 Let me know if you need anything else for your shop.",
+    "farewell": "Goodbye! 👋 Come back any time you need help with your shop.",
+}
+
+# Whole-message small talk only; "hi, what's on the laptop bill?" must not match.
+GREETING_PATTERN = re.compile(
+    r"^\s*(" + "|".join(SMALL_TALK_WORDS.values()) + ")"
+    r"(\s+(there|bhai|ji|sir|madam|again|so\s+much|a\s+lot))?[\s!.?🙏👋]*$",
+    re.IGNORECASE,
+)
+
+# Words that only make sense when the shop keeper is asking about their documents.
+RAG_PATTERN = re.compile(
+    r"\b(invoice|invoices|bill|bills|quotation|receipt|receipts|certificate|"
+    r"document|documents|docs|pdf|uploaded|gst\s*no|invoice\s*no|bill\s*no)\b",
+    re.IGNORECASE,
+)
+
+
+def small_talk_reply(text: str) -> str:
+    """Canned reply for a message routed to "end" locally (rule or nearest neighbour)."""
+    for kind, words in SMALL_TALK_WORDS.items():
+        if re.search(rf"\b({words})\b", text, re.IGNORECASE):
+            return SMALL_TALK_REPLIES[kind]
+    return SMALL_TALK_REPLIES["greeting"]
+
+
+# ── Labelled examples for nearest-neighbour check ───────────────────
+LABELLED_EXAMPLES: list[Tuple[str, Literal["rag", "end"]]] = [
+    ("hi", "end"),
+    ("hello there", "end"),
+    ("hey how are you", "end"),
+    ("good morning", "end"),
+    ("thanks a lot", "end"),
+    ("thank you so much", "end"),
+    ("ok bye", "end"),
+    ("namaste ji", "end"),
+    ("what is the total amount in the laptop bill", "rag"),
+    ("what items are in the latest invoice", "rag"),
+    ("how much was the mess bill", "rag"),
+    ("show the quotation amount", "rag"),
+    ("who is the vendor on the invoice", "rag"),
+    ("what is the date on the bill", "rag"),
+    ("what is written in the income certificate", "rag"),
+    ("list the items and prices from the receipt", "rag"),
+    ("what is the gst number on the invoice", "rag"),
+    ("summarize the uploaded document", "rag"),
+]
+
+
+def _vectorize(text: str) -> Counter:
+    """Character trigram counts, cheap enough to compute on every request."""
+    normalized = f"  {re.sub(r'[^a-z0-9 ]+', ' ', text.lower()).strip()}  "
+    normalized = re.sub(r"\s+", " ", normalized)
+    return Counter(normalized[i : i + 3] for i in range(len(normalized) - 2))
+
+
+def _norm(vec: Counter) -> float:
+    return math.sqrt(sum(v * v for v in vec.values()))
+
+
+def _cosine(a: Counter, a_norm: float, b: Counter, b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b[k] for k, v in a.items() if k in b) / (a_norm * b_norm)
+
+
+_EXAMPLE_VECTORS = [
+    (vec, _norm(vec), label)
+    for vec, label in ((_vectorize(text), label) for text, label in LABELLED_EXAMPLES)
+]
+
+
+# ── Counters ─────────────────────────────────────────────────────────
+_stats_lock = threading.Lock()
+PRE_ROUTER_STATS = {
+    "total": 0,
+    "rule_hits": 0,
+    "knn_hits": 0,
+    "llm_fallbacks": 0,
+}
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        PRE_ROUTER_STATS["total"] += 1
+        PRE_ROUTER_STATS[key] += 1
+
+
+def get_pre_router_stats() -> dict:
+    """Snapshot of the counters plus the share of requests that skipped the LLM router."""
+    with _stats_lock:
+        stats = dict(PRE_ROUTER_STATS)
+    skipped = stats["rule_hits"] + stats["knn_hits"]
+    stats["llm_skipped"] = skipped
+    stats["llm_skip_rate"] = round(skipped / stats["total"], 3) if stats["total"] else 0.0
+    return stats
+
+
+# ── Classifier ───────────────────────────────────────────────────────
+def pre_route(
+    text: str,
+) -> Tuple[Optional[Literal["rag", "end"]], float, str]:
+    """Classify obvious queries locally.
+
+    Returns (route, confidence, method); route is None when the LLM router
+    should decide.
+    """
+    if GREETING_PATTERN.match(text):
+        _count("rule_hits")
+        return "end", 1.0, "rule"
+
+    if RAG_PATTERN.search(text):
+        _count("rule_hits")
+        return "rag", 1.0, "rule"
+
+    query_vec = _vectorize(text)
+    query_norm = _norm(query_vec)
+    best: dict[str, float] = {"rag": 0.0, "end": 0.0}
+    for vec, norm, label in _EXAMPLE_VECTORS:
+        best[label] = max(best[label], _cosine(query_vec, query_norm, vec, norm))
+
+    label = max(best, key=best.get)
+    other = "end" if label == "rag" else "rag"
+    confidence = best[label]
+    if (
+        confidence >= PRE_ROUTER_CONFIDENCE
+        and confidence - best[other] >= PRE_ROUTER_MARGIN
+    ):
+        _count("knn_hits")
+        return label, confidence, "knn"
+
+    _count("llm_fallbacks")
+    return None, confidence, "llm"
@@ -1,6 +1,8 @@
-from typing import TypedDict, List, Literal, Optional
+from typing import Annotated, TypedDict, List, Literal, Optional
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+from langgraph.config import get_stream_writer
 from config import GLOBAL_LLM  # Use the global LLM from config
 
 
@@ -14,17 +16,36 @@ class RagJudge(BaseModel):
     sufficient: bool
 
 
+class SubQueries(BaseModel):
+    queries: List[str] = Field(
+        ..., description="Self-contained search queries, one per document or fact asked about"
+    )
+
+
 # ── LLM instances with structured output where needed ───────────────
 router_llm = GLOBAL_LLM.with_structured_output(RouteDecision)
 judge_llm = GLOBAL_LLM.with_structured_output(RagJudge)
+decompose_llm = GLOBAL_LLM.with_structured_output(SubQueries)
 answer_llm = GLOBAL_LLM
+summary_llm = GLOBAL_LLM
 
 
 # ── Shared state type ────────────────────────────────────────────────
 class AgentState(TypedDict):
-    messages: List[BaseMessage]
-    route: Literal["rag", "answer", "end"]
+    messages: Annotated[List[BaseMessage], add_messages]
+    summary: str  # rolling summary of turns that fell out of the memory window
+    route: Literal["router", "rag", "answer", "end"]
     rag: str
     web: str
     Rag_Citation: Optional[List[str]]
     Web_Citation: Optional[List[str]]
+
+
+# ── Progress events for streaming callers ───────────────────────────
+def emit_progress(event: str, **data) -> None:
+    """Send a progress event to stream_mode="custom" callers; a no-op for plain invoke()."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:  # called outside a graph run
+        return
+    writer({"event": event, **data})
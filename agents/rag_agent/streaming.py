@@ -0,0 +1,69 @@
+import json
+from typing import Iterator, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from .langgraph_agent import agent
+from .shared import AgentState
+
+
+def _chunk_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content
+    )
+
+
+def stream_rag_events(
+    initial_state: AgentState, config: Optional[dict] = None
+) -> Iterator[dict]:
+    """Run the RAG agent and yield progress events followed by answer tokens.
+
+    Events: routed, retrieved, judged, web_searched, token, done.
+    """
+    citations = {"rag_citation": [], "web_citation": []}
+
+    for mode, chunk in agent.stream(
+        initial_state, config=config, stream_mode=["updates", "custom", "messages"]
+    ):
+        if mode == "custom":
+            yield chunk
+
+        elif mode == "messages":
+            message, metadata = chunk
+            # The finished AIMessage that answer_node appends is replayed here
+            # too; only forward the chunks so the answer isn't sent twice.
+            if metadata.get("langgraph_node") == "answer" and isinstance(
+                message, AIMessageChunk
+            ):
+                text = _chunk_text(message.content)
+                if text:
+                    yield {"event": "token", "content": text}
+
+        elif mode == "updates":
+            for node, update in chunk.items():
+                if not update:
+                    continue
+                if update.get("Rag_Citation"):
+                    citations["rag_citation"] = update["Rag_Citation"]
+                if update.get("Web_Citation"):
+                    citations["web_citation"] = update["Web_Citation"]
+
+                if node in ("pre_router", "router"):
+                    yield {"event": "routed", "route": update["route"], "by": node}
+                    # Greetings are answered by the router itself, not answer_llm.
+                    if update["route"] == "end" and update.get("messages"):
+                        last = update["messages"][-1]
+                        if isinstance(last, AIMessage):
+                            yield {"event": "token", "content": _chunk_text(last.content)}
+                elif node == "web_search":
+                    yield {"event": "web_searched", "sources": update.get("Web_Citation", [])}
+
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    yield {"event": "done", "thread_id": thread_id, **citations}
+
+
+def to_sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -2,7 +2,14 @@ from langchain_tavily import TavilySearch
 from langchain_core.tools import tool
 import psycopg2
 from dotenv import load_dotenv
-from config import EMBEDDING_MODEL  # Ensure it's initialized correctly
+from config import (
+    EMBEDDING_MODEL,  # Ensure it's initialized correctly
+    WEB_CACHE_TTL_SECONDS,
+    WEB_CACHE_STALE_SECONDS,
+    WEB_CACHE_MAX_ENTRIES,
+    WEB_CACHE_PATH,
+)
+from .web_cache import WebResultCache
 import os
 
 load_dotenv()
@@ -53,13 +60,65 @@ def rag_search_tool(query: str, top_k: int = 3) -> dict:
         return {"content": f"RAG_ERROR::{e}", "source_file": []}
 
 
+def _embed_queries(queries: list[str]) -> list[list[float]]:
+    """Embed all sub-queries in one batch call."""
+    try:
+        return EMBEDDING_MODEL.embed_documents(queries, task_type="RETRIEVAL_QUERY")
+    except TypeError:  # embedders without task types (e.g. Ollama)
+        return EMBEDDING_MODEL.embed_documents(queries)
+
+
+@tool
+def rag_multi_search_tool(queries: list[str], top_k: int = 3) -> dict:
+    """Search PGVector for several sub-queries in a single SQL round trip"""
+    try:
+        vectors = _embed_queries(queries)
+        vector_literals = ["[" + ",".join(map(str, v)) + "]" for v in vectors]
+
+        # One lateral top-k scan per query vector, deduplicated by chunk id
+        sql = """
+        SELECT DISTINCT ON (d.id) d.id, d.content, d.source_file,
+               1 - (d.embedding <=> q.vec) AS similarity
+        FROM unnest(%s::vector[]) AS q(vec)
+        CROSS JOIN LATERAL (
+            SELECT id, content, source_file, embedding
+            FROM documents
+            ORDER BY embedding <=> q.vec
+            LIMIT %s
+        ) d
+        ORDER BY d.id, similarity DESC
+    """
+
+        with get_pg_conn() as conn, conn.cursor() as cur:
+            cur.execute(sql, (vector_literals, top_k))
+            rows = cur.fetchall()
+
+        if not rows:
+            return {"content": "No relevant documents found.", "source_file": []}
+
+        rows.sort(key=lambda row: row[3], reverse=True)
+        Content = "\n\n".join(row[1] for row in rows)
+        Source_file = list(dict.fromkeys(row[2] for row in rows))
+
+        return {"content": Content, "source_file": Source_file}
+
+    except Exception as e:
+        return {"content": f"RAG_ERROR::{e}", "source_file": []}
+
+
 # Tavily web search tool
 tavily = TavilySearch(max_results=3, topic="general")
 
 
-@tool
-def web_search_tool(query: str) -> dict:
-    """Get up-to-date web results via Tavily"""
+web_cache = WebResultCache(
+    ttl=WEB_CACHE_TTL_SECONDS,
+    stale_ttl=WEB_CACHE_STALE_SECONDS,
+    max_entries=WEB_CACHE_MAX_ENTRIES,
+    path=WEB_CACHE_PATH or None,
+)
+
+
+def _tavily_search(query: str) -> dict:
     answer = {"content": "No search results returned from Tavily.", "source_url": []}
     try:
         result = tavily.invoke({"query": query})
@@ -83,3 +142,25 @@ def web_search_tool(query: str) -> dict:
         answer["content"] = f"WEB_ERROR::{e}"
         answer["source_url"] = []
         return answer
+
+
+def _cacheable_search(query: str) -> dict | None:
+    """Tavily result worth caching, or None for errors and empty results."""
+    answer = _tavily_search(query)
+    return answer if answer["source_url"] else None
+
+
+@tool
+def web_search_tool(query: str) -> dict:
+    """Get up-to-date web results via Tavily"""
+    cached, freshness = web_cache.get(query)
+    if freshness == "fresh":
+        return {**cached, "cached": True}
+    if freshness == "stale":
+        web_cache.revalidate(query, _cacheable_search)
+        return {**cached, "cached": True}
+
+    answer = _tavily_search(query)
+    if answer["source_url"]:
+        web_cache.set(query, answer)
+    return answer
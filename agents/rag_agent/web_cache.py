@@ -0,0 +1,143 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Literal, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial rewordings share a key."""
+    query = re.sub(r"[^\w\s.]", " ", query.lower())
+    query = re.sub(r"\.(?!\d)", " ", query)  # keep decimals like 2.5mm
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class WebResultCache:
+    """LRU cache of web search results with TTL and stale-while-revalidate.
+
+    Entries younger than `ttl` are served as fresh. Entries between `ttl` and
+    `ttl + stale_ttl` are served immediately while a background refresh runs.
+    When `path` is set, entries are also written to a SQLite file so the
+    cache survives restarts.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        stale_ttl: float,
+        max_entries: int,
+        path: Optional[str] = None,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: OrderedDict[str, Tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing: set[str] = set()
+        self.stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+        if self.path:
+            self._init_store()
+
+    # ── Persistent backend ──────────────────────────────────────────
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _init_store(self) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS web_cache (
+                    key TEXT PRIMARY KEY,
+                    stored_at REAL NOT NULL,
+                    value TEXT NOT NULL
+                )
+                """
+            )
+            cutoff = time.time() - self.ttl - self.stale_ttl
+            conn.execute("DELETE FROM web_cache WHERE stored_at < ?", (cutoff,))
+            rows = conn.execute(
+                "SELECT key, stored_at, value FROM web_cache ORDER BY stored_at DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+        for key, stored_at, value in reversed(rows):
+            self._entries[key] = (stored_at, json.loads(value))
+        print(f"[🗃️] Loaded {len(rows)} cached web results from {self.path}")
+
+    def _persist(self, key: str, stored_at: float, value: dict) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO web_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                    (key, stored_at, json.dumps(value)),
+                )
+                conn.execute(
+                    """
+                    DELETE FROM web_cache WHERE key NOT IN (
+                        SELECT key FROM web_cache ORDER BY stored_at DESC LIMIT ?
+                    )
+                    """,
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            print(f"[⚠️] Web cache persist failed: {e}")
+
+    # ── Cache API ───────────────────────────────────────────────────
+    def get(self, query: str) -> Tuple[Optional[dict], Optional[Literal["fresh", "stale"]]]:
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, None
+            stored_at, value = entry
+            age = now - stored_at
+            if age > self.ttl + self.stale_ttl:
+                del self._entries[key]
+                self.stats["misses"] += 1
+                return None, None
+            self._entries.move_to_end(key)
+            if age <= self.ttl:
+                self.stats["fresh_hits"] += 1
+                return value, "fresh"
+            self.stats["stale_hits"] += 1
+            return value, "stale"
+
+    def set(self, query: str, value: dict) -> None:
+        key = normalize_query(query)
+        stored_at = time.time()
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.path:
+            self._persist(key, stored_at, value)
+
+    def revalidate(self, query: str, fetch: Callable[[str], Optional[dict]]) -> None:
+        """Refresh a stale entry in the background; concurrent requests share one refresh."""
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.stats["refreshes"] += 1
+
+        def _refresh():
+            try:
+                value = fetch(query)
+                if value is not None:
+                    self.set(query, value)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_refresh, daemon=True, name="web-cache-refresh").start()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
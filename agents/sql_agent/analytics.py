@@ -0,0 +1,490 @@
+# analytics.py
+# Take / refresh the Parquet snapshot once (e.g. from cron): python -m agents.sql_agent.analytics
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Iterator, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlalchemy import text
+
+from config import (
+    ANALYTICS_ENABLED,
+    ANALYTICS_DIR,
+    ANALYTICS_TABLES,
+    ANALYTICS_REFRESH_SECONDS,
+    ANALYTICS_MAX_STALENESS_SECONDS,
+    ANALYTICS_MIN_COST,
+    ANALYTICS_FULL_EXPORT_MAX_MB,
+    ANALYTICS_FULL_EXPORT_SECONDS,
+    ANALYTICS_MAX_DELTA_FILES,
+    SQL_FETCH_SIZE,
+    SQL_STATEMENT_TIMEOUT_MS,
+)
+from .shared import _db
+
+# Partitions and tables whose write counters are read in one go. Backends
+# flush these statistics within about a second of committing, which is why
+# freshness is only counted from a little before the counters were read.
+WRITE_COUNTERS_SQL = """
+SELECT c.relname, coalesce(p.relname, c.relname) AS parent,
+       coalesce(s.n_tup_ins, 0) AS inserts,
+       coalesce(s.n_tup_upd + s.n_tup_del, 0) AS changes,
+       pg_relation_size(c.oid) AS bytes
+FROM pg_class c
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+LEFT JOIN pg_class p ON p.oid = i.inhparent
+WHERE c.relnamespace = 'public'::regnamespace AND c.relkind = 'r'
+  AND coalesce(p.relname, c.relname) = ANY(:tables)
+"""
+STATS_FLUSH_SLACK_SECONDS = 2.0
+
+# Leading integer primary key column: rows are appended in its order, so
+# insert-only changes can be exported as "key > last exported key"
+KEY_COLUMN_SQL = """
+SELECT a.attname FROM pg_index i
+JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+WHERE i.indrelid = CAST(:table AS regclass) AND i.indisprimary
+  AND format_type(a.atttypid, a.atttypmod) IN ('smallint', 'integer', 'bigint')
+"""
+
+COLUMN_TYPES_SQL = """
+SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute
+WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped
+ORDER BY attnum
+"""
+
+
+class AnalyticsUnavailable(Exception):
+    """The query can't run on the snapshot; run it on PostgreSQL instead."""
+
+
+def _arrow_type(pg_type: str):
+    """Arrow type for a format_type() string; anything unknown is kept as text."""
+    import pyarrow as pa
+
+    if pg_type in ("integer", "smallint"):
+        return pa.int32()
+    if pg_type == "bigint":
+        return pa.int64()
+    if pg_type in ("double precision", "real"):
+        return pa.float64()
+    if numeric := re.fullmatch(r"numeric\((\d+),(\d+)\)", pg_type):
+        return pa.decimal128(int(numeric.group(1)), int(numeric.group(2)))
+    if pg_type == "numeric":
+        return pa.float64()
+    if pg_type == "boolean":
+        return pa.bool_()
+    if pg_type == "date":
+        return pa.date32()
+    if pg_type.startswith("timestamp"):
+        return pa.timestamp("us", tz="UTC" if "with time zone" in pg_type else None)
+    return pa.string()
+
+
+def is_aggregate(sql: str) -> bool:
+    """True for a SELECT whose outermost query aggregates (GROUP BY or aggregate functions)."""
+    try:
+        tree = sqlglot.parse_one(sql, read="postgres")
+    except SqlglotError:
+        return False
+    select = tree if isinstance(tree, exp.Select) else tree.find(exp.Select)
+    if select is None:
+        return False
+    if select.args.get("group"):
+        return True
+    return any(
+        projection.find(exp.AggFunc) is not None and projection.find(exp.Window) is None
+        for projection in select.expressions
+    )
+
+
+def _pg_column_name(projection: exp.Expression) -> str:
+    """The name PostgreSQL gives an unaliased output column."""
+    if isinstance(projection, exp.Column):
+        return projection.name
+    if isinstance(projection, exp.Cast):
+        return _pg_column_name(projection.this)
+    if isinstance(projection, exp.Anonymous):
+        return projection.name.lower()
+    if isinstance(projection, exp.Func):
+        return projection.sql_name().lower()
+    return "?column?"
+
+
+def to_duckdb(sql: str) -> str:
+    """PostgreSQL SELECT → DuckDB, keeping PostgreSQL's output column names."""
+    tree = sqlglot.parse_one(sql, read="postgres")
+    select = tree if isinstance(tree, exp.Select) else tree.find(exp.Select)
+    if select is not None:
+        select.set(
+            "expressions",
+            [
+                e if isinstance(e, (exp.Alias, exp.Column, exp.Star)) else exp.alias_(e, _pg_column_name(e), quoted=True)
+                for e in select.expressions
+            ],
+        )
+    return tree.sql(dialect="duckdb")
+
+
+class AnalyticsEngine:
+    """Parquet snapshots of the core tables, queried with an embedded DuckDB.
+
+    Parquet files per table, or per partition for partitioned tables, under
+    `directory/<table>/`. A refresh reads every relation's insert and
+    update/delete counters from pg_stat, all exports run inside one
+    REPEATABLE READ transaction so joined tables stay consistent:
+
+    - only inserts since the last export: the rows above the last exported
+      primary key go into a new delta file (`<relation>.d<n>.parquet`);
+      more than `max_deltas` of them are merged locally, not re-read;
+    - updates or deletes (or no integer key): the relation is exported again,
+      but a relation over `full_export_max_mb` at most once per
+      `full_export_seconds`. Until then its table counts as stale, so
+      queries on it stay on PostgreSQL.
+
+    Refreshes run in a background thread every `refresh_seconds`.
+
+    `should_offload()` sends aggregate queries whose PostgreSQL plan cost is
+    at least `min_cost` here, as long as every table they read was verified
+    against PostgreSQL within `max_staleness` seconds.
+    """
+
+    def __init__(
+        self,
+        engine,
+        directory: str = ANALYTICS_DIR,
+        tables: list[str] = ANALYTICS_TABLES,
+        refresh_seconds: float = ANALYTICS_REFRESH_SECONDS,
+        max_staleness: float = ANALYTICS_MAX_STALENESS_SECONDS,
+        min_cost: float = ANALYTICS_MIN_COST,
+        full_export_max_mb: float = ANALYTICS_FULL_EXPORT_MAX_MB,
+        full_export_seconds: float = ANALYTICS_FULL_EXPORT_SECONDS,
+        max_deltas: int = ANALYTICS_MAX_DELTA_FILES,
+    ):
+        self.engine = engine
+        self.directory = directory
+        self.tables = list(tables)
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness = max_staleness
+        self.min_cost = min_cost
+        self.full_export_max_bytes = full_export_max_mb * 1024 * 1024
+        self.full_export_seconds = full_export_seconds
+        self.max_deltas = max_deltas
+        # relation → {inserts, changes, watermark, full_at, seq} as of its last export
+        self._relations: dict[str, dict] = self._load_manifest()
+        self._fresh_as_of: dict[str, float] = {}  # table → wall time its files matched PostgreSQL
+        self._duckdb = None
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.stats = {
+            "offloaded": 0,
+            "stale": 0,
+            "fallbacks": 0,
+            "refreshes": 0,
+            "files_written": 0,
+            "delta_files": 0,
+            "deferred": 0,
+            "rows_written": 0,
+            "last_refresh_seconds": None,
+        }
+
+    # ── Snapshots ───────────────────────────────────────────────────
+    def _load_manifest(self) -> dict[str, dict]:
+        try:
+            with open(os.path.join(self.directory, "manifest.json")) as f:
+                return json.load(f)["relations"]
+        except (OSError, ValueError, KeyError):
+            return {}  # also snapshots from before delta files: exported again
+
+    def _save_manifest(self) -> None:
+        path = os.path.join(self.directory, "manifest.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"relations": self._relations}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _files(self, table: str, relation: str) -> list[str]:
+        """The base file and delta files of one relation, oldest first."""
+        folder = os.path.join(self.directory, table)
+        if not os.path.isdir(folder):
+            return []
+        names = [n for n in os.listdir(folder) if n.endswith(".parquet") and n.split(".")[0] == relation]
+        names.sort(key=lambda n: int(n.split(".")[1][1:]) if n.count(".") == 2 else 0)
+        return [os.path.join(folder, n) for n in names]
+
+    def _plan(self, relation: str, parent: str, inserts: int, changes: int, size: int, key: Optional[str]) -> Optional[str]:
+        """How to bring one relation up to date: "full", "delta", "deferred" or None (current)."""
+        state = self._relations.get(relation)
+        if not state or not os.path.exists(os.path.join(self.directory, parent, f"{relation}.parquet")):
+            return "full"
+        if state["inserts"] == inserts and state["changes"] == changes:
+            return None
+        if state["changes"] == changes and key and state["watermark"] is not None:
+            return "delta"
+        if size > self.full_export_max_bytes and time.time() - state["full_at"] < self.full_export_seconds:
+            return "deferred"
+        return "full"
+
+    def _merge_deltas(self, table: str, relation: str, schema) -> None:
+        """Fold the delta files of a relation into one, from the local files only."""
+        import pyarrow.parquet as pq
+
+        deltas = self._files(table, relation)[1:]
+        if len(deltas) <= self.max_deltas:
+            return
+        merged = f"{deltas[-1]}.tmp"
+        with pq.ParquetWriter(merged, schema) as writer:
+            for path in deltas:
+                writer.write_table(pq.read_table(path, schema=schema))
+        os.replace(merged, deltas[-1])
+        for path in deltas[:-1]:
+            os.remove(path)
+
+    def _export(self, cursor, query: str, relation: str, table: str, schema, suffix: str = "") -> int:
+        """COPY the rows of `query` out of PostgreSQL into <table>/<relation><suffix>.parquet."""
+        import pyarrow.csv as pv
+        import pyarrow.parquet as pq
+
+        folder = os.path.join(self.directory, table)
+        os.makedirs(folder, exist_ok=True)
+        rows = 0
+        with tempfile.NamedTemporaryFile(dir=folder, suffix=".csv") as dump:
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", dump)
+            dump.flush()
+            target = os.path.join(folder, f"{relation}{suffix}.parquet")
+            if not os.path.getsize(dump.name):  # empty partition
+                pq.write_table(schema.empty_table(), f"{target}.tmp")
+                os.replace(f"{target}.tmp", target)
+                return 0
+            reader = pv.open_csv(
+                dump.name,
+                read_options=pv.ReadOptions(column_names=schema.names),
+                convert_options=pv.ConvertOptions(
+                    column_types=schema,
+                    null_values=[""],
+                    strings_can_be_null=True,
+                    quoted_strings_can_be_null=False,  # "" is an empty string, unquoted is NULL
+                    true_values=["t"],
+                    false_values=["f"],
+                ),
+            )
+            with pq.ParquetWriter(f"{target}.tmp", schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+                    rows += batch.num_rows
+            os.replace(f"{target}.tmp", target)
+        return rows
+
+    def refresh(self) -> dict:
+        """Bring every snapshot file up to date with PostgreSQL (see the class docstring)."""
+        import pyarrow as pa
+
+        with self._refresh_lock:
+            started = time.perf_counter()
+            checked_at = time.time() - STATS_FLUSH_SLACK_SECONDS
+            with self.engine.connect() as conn:
+                relations = conn.execute(text(WRITE_COUNTERS_SQL), {"tables": self.tables}).all()
+                parents = {parent for _, parent, *_ in relations}
+                schemas = {
+                    table: pa.schema(
+                        [
+                            (name, _arrow_type(pg_type))
+                            for name, pg_type in conn.execute(text(COLUMN_TYPES_SQL), {"table": table})
+                        ]
+                    )
+                    for table in parents
+                }
+                keys = {table: conn.execute(text(KEY_COLUMN_SQL), {"table": table}).scalar() for table in parents}
+            plans = {
+                relation: self._plan(relation, parent, inserts, changes, size, keys[parent])
+                for relation, parent, inserts, changes, size in relations
+            }
+            work = [row for row in relations if plans[row[0]] in ("full", "delta")]
+            deferred = {parent for relation, parent, *_ in relations if plans[relation] == "deferred"}
+
+            written, files, deltas = 0, 0, 0
+            if work:
+                raw = self.engine.raw_connection()
+                try:
+                    with raw.cursor() as cursor:
+                        # One snapshot for every COPY, so joined tables agree
+                        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                        for relation, parent, inserts, changes, _ in work:
+                            key, schema = keys[parent], schemas[parent]
+                            state = self._relations.get(relation)
+                            high = None
+                            if key:
+                                cursor.execute(f"SELECT max({key}) FROM {relation}")  # PK index lookup
+                                high = cursor.fetchone()[0]
+                            if plans[relation] == "full":
+                                written += self._export(cursor, f"SELECT * FROM {relation}", relation, parent, schema)
+                                for path in self._files(parent, relation)[1:]:
+                                    os.remove(path)  # folded into the new base file
+                                files += 1
+                                state = {"full_at": time.time(), "seq": 0}
+                            elif high is not None and high > state["watermark"]:
+                                state["seq"] += 1
+                                written += self._export(
+                                    cursor,
+                                    f"SELECT * FROM {relation} WHERE {key} > {int(state['watermark'])} AND {key} <= {int(high)}",
+                                    relation, parent, schema, suffix=f".d{state['seq']}",
+                                )
+                                files += 1
+                                deltas += 1
+                                self._merge_deltas(parent, relation, schema)
+                            state.update(
+                                inserts=inserts,
+                                changes=changes,
+                                watermark=high if high is not None else state.get("watermark"),
+                            )
+                            self._relations[relation] = state
+                    raw.rollback()
+                finally:
+                    raw.close()
+                self._save_manifest()
+
+            # Files of partitions that no longer exist
+            current = {relation for relation, *_ in relations}
+            for table in parents:
+                for name in os.listdir(os.path.join(self.directory, table)):
+                    if name.endswith(".parquet") and name.split(".")[0] not in current:
+                        os.remove(os.path.join(self.directory, table, name))
+
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                if not self._fresh_as_of.keys() >= parents - deferred:
+                    self._duckdb = None  # views are created for the snapshotted tables only
+                for table in parents - deferred:
+                    self._fresh_as_of[table] = checked_at
+                self.stats["refreshes"] += 1
+                self.stats["files_written"] += files
+                self.stats["delta_files"] += deltas
+                self.stats["deferred"] += len(deferred)
+                self.stats["rows_written"] += written
+                self.stats["last_refresh_seconds"] = round(elapsed, 3)
+            if files:
+                print(f"🦆 Analytics snapshot: {files} files, {written:,} rows exported in {elapsed:.1f}s")
+            return {"files": files, "rows": written, "deferred": sorted(deferred), "seconds": round(elapsed, 3)}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._refresher and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True, name="analytics-refresh")
+            self._refresher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._refresher:
+            self._refresher.join(timeout=30)
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Analytics snapshot refresh failed: {e}")
+            self._stop.wait(self.refresh_seconds)
+
+    # ── Routing ─────────────────────────────────────────────────────
+    def _staleness(self, tables: set[str]) -> float:
+        with self._lock:
+            if not tables or not tables <= self._fresh_as_of.keys():
+                return float("inf")
+            return time.time() - min(self._fresh_as_of[table] for table in tables)
+
+    def should_offload(self, sql: str, params: Optional[dict], plan: dict) -> bool:
+        """Heavy aggregate over snapshot tables that are fresh enough (no bind parameters)."""
+        self.start()
+        if params or plan["cost"] < self.min_cost or not is_aggregate(sql):
+            return False
+        try:
+            tree = sqlglot.parse_one(sql, read="postgres")
+        except SqlglotError:
+            return False
+        ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        tables = {t.name.lower() for t in tree.find_all(exp.Table)} - ctes
+        if not tables <= set(self.tables):
+            return False
+        if self._staleness(tables) > self.max_staleness:
+            with self._lock:
+                self.stats["stale"] += 1
+            return False
+        return True
+
+    def _connection(self):
+        import duckdb
+
+        with self._lock:
+            if self._duckdb is None:
+                conn = duckdb.connect()
+                for table in self._fresh_as_of:
+                    pattern = os.path.join(self.directory, table, "*.parquet").replace("'", "''")
+                    conn.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{pattern}')")
+                self._duckdb = conn
+            return self._duckdb.cursor()  # one cursor per query, safe across threads
+
+    def execute(
+        self, sql: str, batch_size: int = SQL_FETCH_SIZE, timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS
+    ) -> tuple[list[str], Iterator[list[tuple]]]:
+        """Run `sql` (PostgreSQL dialect) on the snapshot: `(columns, batches)`.
+
+        Raises AnalyticsUnavailable before any row is produced when DuckDB
+        can't run the query, so the caller can use PostgreSQL instead.
+        """
+        import duckdb
+
+        timer = None
+        try:
+            duck_sql = to_duckdb(sql)
+            cursor = self._connection()
+            timer = threading.Timer(timeout_ms / 1000, cursor.interrupt)
+            timer.start()
+            reader = cursor.execute(duck_sql).fetch_record_batch(batch_size)
+        except (SqlglotError, duckdb.Error) as e:
+            if timer:
+                timer.cancel()
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            raise AnalyticsUnavailable(str(e)) from e
+        with self._lock:
+            self.stats["offloaded"] += 1
+
+        def batches():
+            try:
+                for batch in reader:
+                    columns = batch.to_pydict().values()
+                    yield list(zip(*columns))
+            except duckdb.Error as e:  # e.g. interrupted by the timeout
+                raise AnalyticsUnavailable(str(e)) from e
+            finally:
+                timer.cancel()
+                cursor.close()
+
+        return list(reader.schema.names), batches()
+
+    def get_stats(self) -> dict:
+        staleness = self._staleness(set(self.tables))
+        with self._lock:
+            return {
+                **self.stats,
+                "tables": len(self._fresh_as_of),
+                "staleness_seconds": round(staleness, 1) if staleness != float("inf") else None,
+            }
+
+
+analytics_engine = AnalyticsEngine(_db._engine) if ANALYTICS_ENABLED else None
+
+
+if __name__ == "__main__":
+    AnalyticsEngine(_db._engine).refresh()
+    _db._engine.dispose()
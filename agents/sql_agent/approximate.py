@@ -0,0 +1,275 @@
+# approximate.py
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from config import (
+    APPROX_ENABLED,
+    APPROX_MIN_COST,
+    APPROX_SAMPLE_ROWS,
+    APPROX_MAX_FRACTION,
+)
+from .catalog import get_catalog
+from .executor import guarded_connection, explain_plan
+from .analytics import analytics_engine, _pg_column_name
+
+# Questions that ask for a rough number get a sample even when the exact
+# query would be cheap enough.
+ROUGH_WORDING = re.compile(
+    r"\b(roughly|approximately|approx|ballpark|rough|estimated?|more or less|lagbhag|takriban)\b",
+    re.IGNORECASE,
+)
+Z_95 = 1.96  # error bounds are 95% confidence intervals
+SAMPLE_SEED = 1  # REPEATABLE: the same question gets the same sample (and cache key)
+WRAPPERS = (exp.Round, exp.Cast, exp.Paren)  # allowed around an aggregate
+
+APPROX_STATS = {"considered": 0, "asked": 0, "by_cost": 0, "ineligible": 0, "exact_offload": 0, "too_small": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        APPROX_STATS[key] += 1
+
+
+def get_approximate_stats() -> dict:
+    with _stats_lock:
+        return dict(APPROX_STATS)
+
+
+@dataclass
+class Approximation:
+    sql: str  # the rewritten query, with a `<column>_error` column per estimate
+    table: str
+    percent: float
+    reason: str  # "asked" or "cost"
+
+    def describe(self) -> str:
+        return (
+            f"≈ Approximate answer from a {self.percent:g}% block sample of {self.table}; "
+            "each *_error column is the ± margin at 95% confidence."
+        )
+
+
+# ── Rewrite ─────────────────────────────────────────────────────────
+# SUM / COUNT / AVG over a TABLESAMPLE SYSTEM sample of the largest table.
+# SYSTEM samples whole heap pages, so pages are treated as clusters: the
+# inner query aggregates per (group, partition, page), the outer one scales
+# the page totals by 1/f and takes the variance across pages, which is what
+# makes the bounds honest for block sampling. AVG is a ratio estimate.
+def _aggregate(projection: exp.Expression) -> Optional[exp.AggFunc]:
+    """The single SUM/COUNT/AVG in a projection (possibly under ROUND/CAST); raises ValueError otherwise."""
+    aggregates = list(projection.find_all(exp.AggFunc))
+    if not aggregates:
+        return None
+    agg = aggregates[0]
+    if len(aggregates) > 1 or not isinstance(agg, (exp.Count, exp.Sum, exp.Avg)):
+        raise ValueError("only one SUM, COUNT or AVG per column")
+    if isinstance(agg.this, exp.Distinct):
+        raise ValueError("COUNT(DISTINCT) can't be scaled from a sample")
+    node = agg
+    while node is not projection:
+        parent = node.parent
+        if not isinstance(parent, WRAPPERS) or parent.this is not node:
+            raise ValueError("aggregate inside an expression")
+        node = parent
+    return agg
+
+
+def _estimates(agg: exp.AggFunc, i: int, f: float) -> tuple[list[str], str, str]:
+    """(inner per-page columns, outer estimate, outer 95% margin) for aggregate number i."""
+    s, n = f"_s{i}", f"_n{i}"
+    if isinstance(agg, exp.Count):
+        counted = "*" if isinstance(agg.this, exp.Star) or agg.this is None else agg.this.sql("postgres")
+        return (
+            [f"COUNT({counted}) AS {n}"],
+            f"CAST(ROUND(SUM({n}) / {f}) AS BIGINT)",
+            f"CAST(ROUND({Z_95} * SQRT({round(1 - f, 8)} * SUM(CAST({n} AS DOUBLE PRECISION) * {n})) / {f}) AS BIGINT)",
+        )
+    value = agg.this.sql("postgres")
+    if isinstance(agg, exp.Sum):
+        return (
+            [f"SUM({value}) AS {s}"],
+            f"ROUND(CAST(SUM({s}) AS NUMERIC) / {f}, 2)",
+            f"ROUND(CAST({Z_95} * SQRT({round(1 - f, 8)} * SUM(CAST({s} AS DOUBLE PRECISION) * {s})) / {f} AS NUMERIC), 2)",
+        )
+    ratio = f"(CAST(SUM({s}) AS DOUBLE PRECISION) / NULLIF(SUM({n}), 0))"
+    spread = (
+        f"SUM(CAST({s} AS DOUBLE PRECISION) * {s}) - 2 * {ratio} * SUM(CAST({s} AS DOUBLE PRECISION) * {n})"
+        f" + {ratio} * {ratio} * SUM(CAST({n} AS DOUBLE PRECISION) * {n})"
+    )
+    return (
+        [f"SUM({value}) AS {s}", f"COUNT({value}) AS {n}"],
+        f"ROUND(CAST(SUM({s}) AS NUMERIC) / NULLIF(SUM({n}), 0), 4)",
+        f"ROUND(CAST({Z_95} * SQRT({round(1 - f, 8)} * GREATEST({spread}, 0)) / NULLIF(SUM({n}), 0) AS NUMERIC), 4)",
+    )
+
+
+def sampled_table(select: exp.Select, row_estimates: dict[str, int]) -> exp.Table:
+    """The largest table of the query, if sampling it keeps the joins unbiased."""
+    tables = [t for t in select.find_all(exp.Table) if isinstance(t.this, exp.Identifier)]
+    if not tables:
+        raise ValueError("no table to sample")
+    table = max(tables, key=lambda t: row_estimates.get(t.name.lower(), -1))
+    from_table = select.args["from_"].this
+    for join in select.args.get("joins") or []:
+        side = (join.side or "").upper()
+        # Every output row must hold exactly one sampled row: inner joins, or
+        # LEFT joins hanging off the sampled table
+        if side and not (side == "LEFT" and from_table is table):
+            raise ValueError(f"{side} JOIN around the sampled table")
+    return table
+
+
+def rewrite(select: exp.Select, table: exp.Table, f: float) -> str:
+    """The approximate version of an eligible aggregate `select`, sampling `table` with fraction f."""
+    projections = [p.unalias() for p in select.expressions]
+    names = [p.alias if isinstance(p, exp.Alias) else _pg_column_name(p) for p in select.expressions]
+    aggregates = [_aggregate(p) for p in projections]
+    if not any(aggregates):
+        raise ValueError("not an aggregate query")
+
+    keys = []
+    for key in (select.args.get("group") or exp.Group()).expressions:
+        if isinstance(key, exp.Literal) and key.is_int:
+            key = projections[int(key.this) - 1]
+        elif isinstance(key, exp.Column) and not key.table and key.name in names:
+            key = projections[names.index(key.name)]
+        if key.find(exp.AggFunc):
+            raise ValueError("aggregate in GROUP BY")
+        keys.append(key)
+
+    alias = table.alias_or_name
+    page = f"(CAST(CAST({alias}.ctid AS TEXT) AS POINT))[0]"
+    inner_columns = [f"{k.sql('postgres')} AS _g{j}" for j, k in enumerate(keys)]
+    outer_columns, outer_group = [], [f"_g{j}" for j in range(len(keys))]
+    for i, (projection, agg, name) in enumerate(zip(projections, aggregates, names)):
+        quoted = exp.to_identifier(name, quoted=True).sql("postgres")
+        if agg is None:
+            inner_columns.append(f"{projection.sql('postgres')} AS _k{i}")
+            outer_columns.append(f"_k{i} AS {quoted}")
+            outer_group.append(f"_k{i}")
+            continue
+        parts, estimate, margin = _estimates(agg, i, f)
+        inner_columns += parts
+        for sql, label in ((estimate, quoted), (margin, exp.to_identifier(f"{name}_error", quoted=True).sql("postgres"))):
+            wrapped = projection.copy()
+            replacement = sqlglot.parse_one(sql, read="postgres")
+            if isinstance(wrapped, exp.AggFunc):
+                wrapped = replacement
+            else:
+                wrapped.find(exp.AggFunc).replace(replacement)
+            outer_columns.append(f"{wrapped.sql('postgres')} AS {label}")
+
+    inner = select.copy()
+    target = next(t for t in inner.find_all(exp.Table) if t.alias_or_name == alias)
+    target.set(
+        "sample",
+        exp.TableSample(
+            method=exp.var("SYSTEM"),
+            percent=exp.Literal.number(round(100 * f, 4)),
+            seed=exp.Literal.number(SAMPLE_SEED),
+        ),
+    )
+    for arg in ("group", "order", "limit", "offset"):
+        inner.set(arg, None)
+    inner.set("expressions", [sqlglot.parse_one(c, read="postgres") for c in inner_columns])
+    inner.set(
+        "group",
+        exp.Group(
+            expressions=[k.copy() for k in keys]
+            + [sqlglot.parse_one(f"{alias}.tableoid", read="postgres"), sqlglot.parse_one(page, read="postgres")]
+        ),
+    )
+
+    sql = f"SELECT {', '.join(outer_columns)} FROM ({inner.sql('postgres')}) AS _pages"
+    if outer_group:
+        sql += f" GROUP BY {', '.join(outer_group)}"
+
+    order = select.args.get("order")
+    if order:
+        terms = []
+        for ordered in order.expressions:
+            term = ordered.this
+            if isinstance(term, exp.Literal) and term.is_int:
+                # Positions shift once the *_error columns are in
+                ref = exp.to_identifier(names[int(term.this) - 1], quoted=True).sql("postgres")
+            elif isinstance(term, exp.Column) and not term.table and term.name in names:
+                ref = exp.to_identifier(term.name, quoted=True).sql("postgres")
+            elif term in projections:
+                ref = exp.to_identifier(names[projections.index(term)], quoted=True).sql("postgres")
+            elif term in keys:
+                ref = f"_g{keys.index(term)}"
+            else:
+                raise ValueError(f"ORDER BY {term.sql('postgres')} is not an output column")
+            terms.append(ref + (" DESC" if ordered.args.get("desc") else ""))
+        sql += f" ORDER BY {', '.join(terms)}"
+    if select.args.get("limit"):
+        sql += f" {select.args['limit'].sql('postgres')}"
+    return sql
+
+
+def _eligible(sql: str) -> exp.Select:
+    """Parsed single-level aggregate SELECT; raises ValueError for anything else."""
+    try:
+        tree = sqlglot.parse_one(sql, read="postgres")
+    except SqlglotError as e:
+        raise ValueError(str(e)) from e
+    if not isinstance(tree, exp.Select):
+        raise ValueError("not a plain SELECT")
+    for arg in ("with", "having", "distinct", "offset"):
+        if tree.args.get(arg):
+            raise ValueError(f"{arg.upper()} is not supported")
+    if any(s is not tree for s in tree.find_all(exp.Select)) or tree.find(exp.Window):
+        raise ValueError("subqueries and window functions are not supported")
+    return tree
+
+
+# ── Planning ────────────────────────────────────────────────────────
+def plan_approximation(sql: str, question: str, params: Optional[dict] = None, force: bool = False) -> Optional[Approximation]:
+    """Approximate rewrite of `sql` when the question asks for a rough number (or `force`),
+    or when the exact plan costs at least APPROX_MIN_COST; None means run it exactly."""
+    if not APPROX_ENABLED or params:
+        return None
+    _count("considered")
+    try:
+        select = _eligible(sql)
+        estimates = {name: table.row_estimate for name, table in get_catalog().items()}
+        table = sampled_table(select, estimates)
+        if not any([_aggregate(projection.unalias()) for projection in select.expressions]):
+            raise ValueError("not an aggregate query")
+    except ValueError:
+        _count("ineligible")
+        return None
+
+    asked = force or bool(ROUGH_WORDING.search(question))
+    with guarded_connection() as conn:
+        plan = explain_plan(conn, sql, {})
+        if not asked and plan["cost"] < APPROX_MIN_COST:
+            return None
+        if not asked and analytics_engine and analytics_engine.should_offload(sql, params, plan):
+            _count("exact_offload")  # DuckDB answers it exactly and fast enough
+            return None
+        # Rows the query reads, to size the sample
+        scan = select.copy()
+        for arg in ("group", "order", "limit"):
+            scan.set(arg, None)
+        scan.set("expressions", [exp.Star()])
+        matching = explain_plan(conn, scan.sql("postgres"), {})["rows"]
+
+    percent = round(100 * APPROX_SAMPLE_ROWS / max(matching, 1), 4)
+    if percent > 100 * APPROX_MAX_FRACTION:
+        _count("too_small")  # the sample would be most of the data anyway
+        return None
+    try:
+        approximate_sql = rewrite(select, table, percent / 100)
+    except ValueError:
+        _count("ineligible")
+        return None
+    _count("asked" if asked else "by_cost")
+    return Approximation(approximate_sql, table.name, percent, "asked" if asked else "cost")
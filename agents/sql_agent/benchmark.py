@@ -0,0 +1,262 @@
+# benchmark.py
+# Run: python -m agents.sql_agent.benchmark [mode ...]
+#      python -m agents.sql_agent.benchmark schema   (schema retriever only, no LLM)
+#      python -m agents.sql_agent.benchmark dates    (date-range query latency, no LLM)
+#      python -m agents.sql_agent.benchmark layouts [scale]
+#          (date-range latency on generated data, flat vs partitioned, no LLM)
+import datetime as dt
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from sqlalchemy import create_engine, make_url, text
+
+from config import DATABASE_URL
+
+from . import nodes
+from .langgraph_agent import build_agent
+from .shared import _db, new_state, get_schema
+from .schema_retriever import SchemaRetriever, estimate_tokens
+
+# Shared question set; the last two should be judged irrelevant.
+BENCHMARK_QUESTIONS = [
+    "Who are my top 5 customers by total purchase amount?",
+    "Which products have quantity below 60?",
+    "What is the total sales amount in 2024?",
+    "How many sales were made on credit (udhar) and are still unpaid?",
+    "Which vendor did we purchase the most from?",
+    "What is the total profit from all sales?",
+    "Which product was sold the most times?",
+    "List sales made to Customer 3 with their dates",
+    "What is the capital of France?",
+    "Write me a poem about the monsoon",
+]
+
+# Tables each relevant question needs; any one alternative is enough
+# (rollups answer some questions on their own once installed).
+BENCHMARK_EXPECTED_TABLES = {
+    BENCHMARK_QUESTIONS[0]: [{"customers", "sales_data"}],
+    BENCHMARK_QUESTIONS[1]: [{"products"}],
+    BENCHMARK_QUESTIONS[2]: [{"sales_data"}, {"monthly_pnl"}],
+    BENCHMARK_QUESTIONS[3]: [{"udhar_sales", "sales_data"}, {"customer_outstanding_credit"}],
+    BENCHMARK_QUESTIONS[4]: [{"vendors", "purchase_data"}],
+    BENCHMARK_QUESTIONS[5]: [{"profit_loss"}, {"monthly_pnl"}],
+    BENCHMARK_QUESTIONS[6]: [{"products", "sale_product"}, {"products", "daily_product_sales"}],
+    BENCHMARK_QUESTIONS[7]: [{"customers", "sales_data"}],
+}
+
+# Typical date-filtered questions as SQL, anchored on the latest month with data
+DATE_RANGE_QUERIES = {
+    "month_sales": """
+        SELECT COUNT(*), SUM(total_amount) FROM sales_data
+        WHERE transaction_date >= :month_start AND transaction_date < :month_end""",
+    "week_daily_sales": """
+        SELECT transaction_date, SUM(total_amount) FROM sales_data
+        WHERE transaction_date >= :week_start AND transaction_date < :month_end
+        GROUP BY transaction_date ORDER BY transaction_date""",
+    "month_top_products": """
+        SELECT sp.prod_id, COUNT(*) FROM sales_data s
+        JOIN sale_product sp ON sp.sales_id = s.sales_id
+        WHERE s.transaction_date >= :month_start AND s.transaction_date < :month_end
+        GROUP BY sp.prod_id ORDER BY COUNT(*) DESC LIMIT 10""",
+    "quarter_one_product": """
+        SELECT COUNT(*) FROM sale_product sp
+        JOIN sales_data s ON s.sales_id = sp.sales_id
+        WHERE sp.prod_id = 1
+          AND s.transaction_date >= :quarter_start AND s.transaction_date < :month_end""",
+    "quarter_one_customer": """
+        SELECT COUNT(*), SUM(total_amount) FROM sales_data
+        WHERE customer_id = 1
+          AND transaction_date >= :quarter_start AND transaction_date < :month_end""",
+    "month_vendor_purchases": """
+        SELECT vendor_id, SUM(total_amount) FROM purchase_data
+        WHERE transaction_date >= :month_start AND transaction_date < :month_end
+        GROUP BY vendor_id""",
+    "month_unpaid_udhar": """
+        SELECT COUNT(*) FROM udhar_sales
+        WHERE date_of_payment IS NULL
+          AND date_of_entry >= :month_start AND date_of_entry < :month_end""",
+}
+
+
+@contextmanager
+def _read_only_caches():
+    """Keep a run from writing the query log, plan cache or result cache.
+
+    Otherwise each mode would add few-shot examples and cached results that
+    the modes after it benefit from. The existing log still serves examples,
+    the same ones to every mode.
+    """
+    result_cache = nodes.result_cache
+    nodes.query_log.log = lambda *args, **kwargs: None
+    nodes.plan_cache.store = lambda *args, **kwargs: None
+    nodes.result_cache = None
+    try:
+        yield
+    finally:
+        del nodes.query_log.log, nodes.plan_cache.store  # back to the class methods
+        nodes.result_cache = result_cache
+
+
+def run_benchmark(modes: list[str], questions: list[str] = BENCHMARK_QUESTIONS) -> dict:
+    """Run every question through each graph variant with templates and the plan cache bypassed.
+
+    Runs leave the query log, plan cache and result cache untouched, so the
+    modes don't feed each other.
+    """
+    report = {}
+    for mode in modes:
+        agent = build_agent(mode, use_fast_paths=False)
+        latencies, llm_calls, attempts, tokens, examples, failures = [], [], [], [], [], 0
+        with _read_only_caches():
+            for question in questions:
+                usage = UsageMetadataCallbackHandler()
+                start = time.perf_counter()
+                result = agent.invoke(new_state(question), config={"callbacks": [usage]})
+                latencies.append(time.perf_counter() - start)
+                llm_calls.append(result.get("llm_calls", 0))
+                attempts.append(result.get("attempts", 0))
+                examples.append(result.get("few_shot_examples", 0))
+                tokens.append(
+                    sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values())
+                )
+                failures += bool(result.get("sql_error"))
+
+        report[mode] = {
+            "questions": len(questions),
+            "mean_latency_s": round(statistics.mean(latencies), 3),
+            "p95_latency_s": round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 3),
+            "mean_llm_calls": round(statistics.mean(llm_calls), 2),
+            "mean_attempts": round(statistics.mean(attempts), 2),
+            "mean_prompt_tokens": round(statistics.mean(tokens)),
+            "mean_few_shot_examples": round(statistics.mean(examples), 2),
+            "failures": failures,
+        }
+    return report
+
+
+def run_schema_benchmark(
+    expected: dict[str, list[set[str]]] = BENCHMARK_EXPECTED_TABLES,
+    retriever: SchemaRetriever = None,
+) -> dict:
+    """Table-selection accuracy and schema prompt size of the retriever vs the full schema."""
+    retriever = retriever or SchemaRetriever()
+    full_tokens = estimate_tokens(get_schema())
+    hits, pruned_tokens = 0, []
+    for question, alternatives in expected.items():
+        selected = set(retriever.select_tables(question))
+        hit = any(tables <= selected for tables in alternatives)
+        hits += hit
+        pruned_tokens.append(estimate_tokens(retriever.schema_for(question)))
+        print(f"{'✅' if hit else '❌'} {question} → {', '.join(sorted(selected))}")
+
+    return {
+        "schema": {
+            "questions": len(expected),
+            "table_recall_accuracy": round(hits / len(expected), 3),
+            "full_schema_tokens": full_tokens,
+            "mean_pruned_schema_tokens": round(statistics.mean(pruned_tokens)),
+            "token_savings": round(1 - statistics.mean(pruned_tokens) / full_tokens, 3),
+        }
+    }
+
+
+# synthetic_Data.generate scale factor for the layout comparison: ≈10M sales_data rows
+DATE_LAYOUT_SCALE = 6.7
+
+
+def run_date_range_benchmark(queries: dict[str, str] = DATE_RANGE_QUERIES, repeats: int = 5, engine=None) -> dict:
+    """Median latency of date-range SQL on the live database (before/after partitioning)."""
+    with (engine or _db._engine).connect() as conn:
+        last, rows, partitioned, page_cost = conn.execute(
+            text(
+                "SELECT MAX(transaction_date), COUNT(*), "
+                "(SELECT relkind = 'p' FROM pg_class WHERE oid = 'sales_data'::regclass), "
+                "current_setting('random_page_cost') FROM sales_data"
+            )
+        ).one()
+        month_start = (last or dt.date.today()).replace(day=1)
+        month_end = (month_start + dt.timedelta(days=32)).replace(day=1)
+        params = {
+            "month_start": month_start,
+            "month_end": month_end,
+            "week_start": month_end - dt.timedelta(days=7),
+            "quarter_start": (month_start - dt.timedelta(days=62)).replace(day=1),
+        }
+        # Join plans over the unpartitioned line-item tables hinge on this
+        report = {"sales_rows": rows, "partitioned": partitioned, "random_page_cost": page_cost}
+        for name, sql in queries.items():
+            timings = []
+            for _ in range(repeats + 1):  # the first run only warms the cache
+                start = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            report[f"{name}_ms"] = round(statistics.median(timings[1:]), 1)
+    return {"dates": report}
+
+
+def build_date_layouts(scale: float = DATE_LAYOUT_SCALE, seed: int = 42, url: str = DATABASE_URL) -> dict:
+    """The generated data at `scale` in two databases: as loaded, and partitioned by month.
+
+    A database is only (re)generated when its sales_data doesn't hold the
+    row count of `scale`, so repeated runs reuse the load.
+    """
+    from synthetic_Data.generate import generate, row_counts
+    from .partitions import partition_tables
+
+    base = make_url(url)
+    expected = row_counts(scale)["sales_data"]
+    admin = create_engine(base.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    urls = {}
+    for layout in ("flat", "partitioned"):
+        name = f"{base.database}_dates_{layout}"
+        with admin.connect() as conn:
+            if not conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name}).scalar():
+                conn.exec_driver_sql(f'CREATE DATABASE "{name}"')
+        urls[layout] = base.set(database=name).render_as_string(hide_password=False)
+        engine = create_engine(urls[layout])
+        with engine.connect() as conn:
+            loaded = conn.execute(text("SELECT to_regclass('sales_data') IS NOT NULL")).scalar()
+            rows = conn.execute(text("SELECT COUNT(*) FROM sales_data")).scalar() if loaded else 0
+        if rows != expected:
+            generate(urls[layout], scale, seed, reset=loaded)
+        if layout == "partitioned":
+            partition_tables(engine)
+        engine.dispose()
+    admin.dispose()
+    return urls
+
+
+def run_layout_benchmark(scale: float = DATE_LAYOUT_SCALE, seed: int = 42) -> dict:
+    """Date-range latency on the same generated data, unpartitioned vs partitioned."""
+    report = {}
+    for layout, url in build_date_layouts(scale, seed).items():
+        engine = create_engine(url)
+        try:
+            report[f"dates_{layout}"] = {"scale": scale, **run_date_range_benchmark(engine=engine)["dates"]}
+        finally:
+            engine.dispose()
+    return report
+
+
+if __name__ == "__main__":
+    modes = sys.argv[1:] or ["sequential", "fused", "speculative"]
+    if modes == ["schema"]:
+        report = run_schema_benchmark()
+    elif modes == ["dates"]:
+        report = run_date_range_benchmark()
+    elif modes[0] == "layouts":
+        report = run_layout_benchmark(float(modes[1]) if len(modes) > 1 else DATE_LAYOUT_SCALE)
+    else:
+        report = run_benchmark(modes)
+
+    print("\n" + "=" * 50)
+    for mode, stats in report.items():
+        print(f"📊 {mode}")
+        for key, value in stats.items():
+            print(f"   {key}: {value}")
+    print("=" * 50)
+
+    _db._engine.dispose()
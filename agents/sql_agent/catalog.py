@@ -0,0 +1,296 @@
+# catalog.py
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Optional
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import DATABASE_URL, CATALOG_CACHE_PATH, CATALOG_CHECK_SECONDS
+
+# What the columns alone don't say; rendered next to the live schema
+TABLE_NOTES = {
+    "customers": "stores customer information.",
+    "products": "details about available products.",
+    "vendors": "stores vendor details.",
+    "sales_data": "records of customer purchases.",
+    "purchase_data": "records of purchases from vendors.",
+    "sale_product": "links sales to products (many-to-many).",
+    "purchase_product": "links purchases to products (many-to-many).",
+    "profit_loss": "result of a sale, whether profit or loss.",
+    "udhar_sales": "sales done on credit.",
+    "udhar_purchase": "purchases done on credit.",
+    "daily_product_sales": "rollup of how many sales included each product per day.",
+    "monthly_pnl": "rollup with one row per month (month = first day of the month).",
+    "customer_outstanding_credit": "rollup of unpaid udhar per customer.",
+    "vendor_outstanding_credit": "rollup of unpaid udhar per vendor.",
+}
+COLUMN_NOTES = {
+    "monthly_pnl.loss_amount": "negative",
+    "udhar_sales.date_of_payment": "NULL while unpaid",
+    "udhar_purchase.date_of_payment": "NULL while unpaid",
+}
+# Foreign keys Postgres can't declare once sales_data / purchase_data are
+# partitioned (a referenced key would have to include the partition column)
+IMPLIED_FOREIGN_KEYS = {
+    "profit_loss": [("sales_id", "sales_data", "sales_id")],
+    "sale_product": [("sales_id", "sales_data", "sales_id")],
+    "udhar_sales": [("sales_id", "sales_data", "sales_id")],
+    "purchase_product": [("purch_id", "purchase_data", "purch_id")],
+    "udhar_purchase": [("purch_id", "purchase_data", "purch_id")],
+}
+# Bookkeeping tables of the app itself (result cache versions, LangGraph
+# checkpoints); never shown to the LLM or accepted in generated SQL
+INTERNAL_TABLES = {
+    "table_versions",
+    "checkpoints",
+    "checkpoint_blobs",
+    "checkpoint_writes",
+    "checkpoint_migrations",
+}
+ROLLUP_HINT = (
+    "Tables marked as rollups are always up to date. PREFER them over aggregating "
+    "sales_data / profit_loss / sale_product / udhar_* for totals and trends."
+)
+
+# Cheap DDL signature from pg_catalog: columns and types of tables and indexes,
+# plus constraint definitions. Row counts are deliberately not part of it.
+SIGNATURE_SQL = """
+SELECT md5(
+    coalesce((
+        SELECT string_agg(
+            c.relname || '.' || a.attname || ':' || format_type(a.atttypid, a.atttypmod)
+                || ':' || a.attnotnull,
+            ',' ORDER BY c.relname, a.attnum)
+        FROM pg_class c
+        JOIN pg_attribute a ON a.attrelid = c.oid
+        WHERE c.relnamespace = 'public'::regnamespace
+          AND c.relkind IN ('r', 'p', 'i')
+          AND a.attnum > 0 AND NOT a.attisdropped
+    ), '')
+    || '|' ||
+    coalesce((
+        SELECT string_agg(conname || ':' || pg_get_constraintdef(oid), ',' ORDER BY conname)
+        FROM pg_constraint
+        WHERE connamespace = 'public'::regnamespace
+    ), '')
+)
+"""
+
+ROW_ESTIMATES_SQL = """
+SELECT relname, reltuples::bigint AS estimate, relispartition
+FROM pg_class
+WHERE relnamespace = 'public'::regnamespace AND relkind IN ('r', 'p')
+"""
+
+
+@dataclass
+class TableInfo:
+    name: str
+    columns: dict[str, str]  # column name → SQL type
+    primary_key: list[str] = field(default_factory=list)
+    foreign_keys: list[dict] = field(default_factory=list)  # {columns, ref_table, ref_columns}
+    row_estimate: int = -1  # -1 until the table has been analyzed
+    indexes: list[dict] = field(default_factory=list)  # {name, columns, unique}
+
+
+class CatalogService:
+    """Introspected schema, cached in memory and on disk.
+
+    The database is only introspected when there is no usable disk cache or
+    the DDL signature changed. The signature is a single pg_catalog query,
+    run at most once every `check_seconds`.
+    """
+
+    def __init__(self, engine, path: Optional[str] = None, check_seconds: float = 60):
+        self.engine = engine
+        self.path = path
+        self.check_seconds = check_seconds
+        self._tables: Optional[dict[str, TableInfo]] = None
+        self._signature: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self.stats = {"introspections": 0, "signature_checks": 0, "disk_loads": 0}
+
+    # ── Introspection ───────────────────────────────────────────────
+    def _current_signature(self) -> Optional[str]:
+        if self.engine.dialect.name != "postgresql":
+            return None
+        with self.engine.connect() as conn:
+            return conn.execute(text(SIGNATURE_SQL)).scalar()
+
+    def _introspect(self) -> dict[str, TableInfo]:
+        inspector = inspect(self.engine)
+        estimates, partitions = {}, set()
+        if self.engine.dialect.name == "postgresql":
+            with self.engine.connect() as conn:
+                for name, estimate, is_partition in conn.execute(text(ROW_ESTIMATES_SQL)):
+                    estimates[name] = estimate
+                    if is_partition:
+                        partitions.add(name)
+
+        tables = {}
+        known = list(TABLE_NOTES)
+        names = sorted(
+            inspector.get_table_names(),
+            key=lambda t: (known.index(t) if t in known else len(known), t),
+        )
+        for table in names:
+            if table in partitions or table in INTERNAL_TABLES:
+                continue  # partitions are queried through the partitioned parent
+            foreign_keys = [
+                {
+                    "columns": fk["constrained_columns"],
+                    "ref_table": fk["referred_table"],
+                    "ref_columns": fk["referred_columns"],
+                }
+                for fk in inspector.get_foreign_keys(table)
+            ]
+            for column, ref_table, ref_column in IMPLIED_FOREIGN_KEYS.get(table, []):
+                declared = any(fk["columns"] == [column] for fk in foreign_keys)
+                if not declared and ref_table in names:
+                    foreign_keys.append({"columns": [column], "ref_table": ref_table, "ref_columns": [ref_column]})
+            tables[table] = TableInfo(
+                name=table,
+                columns={c["name"]: str(c["type"]) for c in inspector.get_columns(table)},
+                primary_key=inspector.get_pk_constraint(table).get("constrained_columns") or [],
+                foreign_keys=foreign_keys,
+                row_estimate=estimates.get(table, -1),
+                indexes=[
+                    {"name": ix["name"], "columns": ix["column_names"], "unique": ix["unique"]}
+                    for ix in inspector.get_indexes(table)
+                ],
+            )
+        self.stats["introspections"] += 1
+        print(f"📚 Introspected schema catalog: {len(tables)} tables")
+        return tables
+
+    # ── Persistence ─────────────────────────────────────────────────
+    def _load_disk(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._tables = {
+                t["name"]: TableInfo(**t) for t in data["tables"] if t["name"] not in INTERNAL_TABLES
+            }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Could not read schema catalog {self.path}: {e}")
+            return False
+        self._signature = data.get("signature")
+        self.stats["disk_loads"] += 1
+        print(f"📚 Loaded schema catalog from {self.path}: {len(self._tables)} tables")
+        return True
+
+    def _save_disk(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"signature": self._signature, "tables": [asdict(t) for t in self._tables.values()]},
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+    # ── Catalog API ─────────────────────────────────────────────────
+    def tables(self) -> dict[str, TableInfo]:
+        with self._lock:
+            if self._tables is None:
+                self._load_disk()
+            if self._tables is None or time.monotonic() - self._checked_at >= self.check_seconds:
+                self._revalidate()
+            return self._tables
+
+    def _revalidate(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            signature = self._current_signature()
+        except SQLAlchemyError as e:
+            if self._tables is None:
+                raise
+            print(f"⚠️ Schema signature check failed, keeping cached catalog: {e}")
+            return
+        self.stats["signature_checks"] += 1
+        if self._tables is not None and signature is not None and signature == self._signature:
+            return
+        if self._tables is not None:
+            print("🔄 Schema change detected, reloading catalog")
+        self._tables, self._signature = self._introspect(), signature
+        self._save_disk()
+
+    def invalidate(self) -> None:
+        """Forget everything; the next call introspects again (e.g. right after a migration)."""
+        with self._lock:
+            self._tables, self._signature, self._checked_at = None, None, 0.0
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def fingerprint(self) -> str:
+        """Hash of tables, columns, types and keys (not row estimates)."""
+        tables = self.tables()
+        described = "|".join(
+            f"{t.name}:{sorted(t.columns.items())}:{t.primary_key}:{t.foreign_keys}"
+            for t in sorted(tables.values(), key=lambda t: t.name)
+        )
+        return hashlib.sha256(described.encode()).hexdigest()[:16]
+
+    def render(self, names: Optional[Iterable[str]] = None) -> str:
+        """Compact prompt text: one block per table, one line per column."""
+        tables = self.tables()
+        selected = [tables[n] for n in (names or tables) if n in tables]
+        blocks = []
+        for table in selected:
+            header = f"    {table.name}: {TABLE_NOTES.get(table.name, 'table.')}"
+            if table.row_estimate >= 0:
+                header += f" (~{table.row_estimate:,} rows)"
+            fk_targets = {
+                column: f"{fk['ref_table']}.{ref}"
+                for fk in table.foreign_keys
+                for column, ref in zip(fk["columns"], fk["ref_columns"])
+            }
+            lines = [header]
+            for column, type_ in table.columns.items():
+                tags = [type_.lower()]
+                if column in table.primary_key:
+                    tags.append("PK")
+                if column in fk_targets:
+                    tags.append(f"FK → {fk_targets[column]}")
+                if f"{table.name}.{column}" in COLUMN_NOTES:
+                    tags.append(COLUMN_NOTES[f"{table.name}.{column}"])
+                lines.append(f"      - {column} ({', '.join(tags)})")
+            blocks.append("\n".join(lines))
+
+        rendered = "\n" + "\n\n".join(blocks) + "\n"
+        if any("rollup" in TABLE_NOTES.get(t.name, "") for t in selected):
+            rendered += f"\n    {ROLLUP_HINT}\n"
+        return rendered
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "tables": len(self._tables or {}),
+                "signature": self._signature,
+            }
+
+
+catalog_service = CatalogService(
+    create_engine(DATABASE_URL, pool_size=1, max_overflow=1),
+    path=CATALOG_CACHE_PATH or None,
+    check_seconds=CATALOG_CHECK_SECONDS,
+)
+
+
+def get_catalog() -> dict[str, TableInfo]:
+    return catalog_service.tables()
+
+
+def refresh_catalog() -> dict[str, TableInfo]:
+    catalog_service.invalidate()
+    return get_catalog()
@@ -0,0 +1,234 @@
+# entities.py
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, TEXT
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import ENTITY_MIN_SIMILARITY, ENTITY_REFRESH_SECONDS
+from .shared import _db
+
+# kind → (table, id column, name column)
+ENTITY_SOURCES = {
+    "product": ("products", "product_id", "product_name"),
+    "customer": ("customers", "cust_id", "customer_name"),
+    "vendor": ("vendors", "vend_id", "vendor_name"),
+}
+MAX_MENTION_WORDS = 4
+MAX_CANDIDATES = 3  # near-ties shown for one mention
+TIE_MARGIN = 0.05
+
+# A mention needs at least one word outside this list, otherwise "product"
+# alone would match every "Product N".
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "all", "by", "can", "did", "do", "does",
+    "for", "from", "get", "give", "has", "have", "how", "i", "in", "is", "it", "its",
+    "last", "list", "many", "me", "much", "my", "of", "on", "or", "our", "show", "so",
+    "sold", "than", "that", "the", "their", "there", "this", "to", "top", "total",
+    "was", "we", "were", "what", "when", "which", "who", "whom", "with", "year", "month",
+    "day", "today", "ji", "sahab", "bhai", "sir", "mr", "mrs", "ms",
+    "product", "products", "customer", "customers", "vendor", "vendors", "item", "items",
+    "sale", "sales", "purchase", "purchases", "bought", "buy", "sell", "udhar", "credit",
+    "amount", "price", "quantity", "stock", "profit", "loss", "paid", "unpaid", "most",
+}
+
+
+# Trigram indexes for the name columns; `name % mention` and similarity()
+# are then answered from the index instead of a scan.
+TRGM_DDL = "CREATE EXTENSION IF NOT EXISTS pg_trgm;\n" + "".join(
+    f"CREATE INDEX IF NOT EXISTS ix_{table}_{name_column}_trgm ON {table} USING gin ({name_column} gin_trgm_ops);\n"
+    for table, _, name_column in ENTITY_SOURCES.values()
+)
+
+# Best names for every mention in one round trip: each LATERAL branch is a
+# trigram index probe for one span of the question.
+MATCH_SQL = text(
+    """
+    SELECT m.ord, s.kind, s.entity_id, s.name, s.score
+    FROM unnest(:mentions) WITH ORDINALITY AS m(mention, ord)
+    CROSS JOIN LATERAL (
+        """
+    + "\n        UNION ALL\n        ".join(
+        f"SELECT '{kind}' AS kind, {id_column} AS entity_id, {name_column} AS name, "
+        f"similarity({name_column}, m.mention) AS score FROM {table} WHERE {name_column} % m.mention"
+        for kind, (table, id_column, name_column) in ENTITY_SOURCES.items()
+    )
+    + """
+        ORDER BY score DESC
+        LIMIT :limit
+    ) AS s
+    """
+).bindparams(bindparam("mentions", type_=ARRAY(TEXT)))
+
+
+@dataclass
+class EntityMatch:
+    kind: str
+    entity_id: int
+    name: str
+    mention: str
+    score: float
+
+    def describe(self) -> str:
+        table, id_column, name_column = ENTITY_SOURCES[self.kind]
+        return (
+            f'"{self.mention}" → {table}.{id_column} = {self.entity_id} '
+            f"({name_column} '{self.name}', similarity {self.score:.2f})"
+        )
+
+
+class EntityIndex:
+    """Product, customer and vendor names matched in Postgres with pg_trgm.
+
+    `resolve()` sends every 1-4 word span of a question to the trigram
+    indexes on the name columns and keeps the best non-overlapping matches.
+    Nothing is cached here, so writes to the name tables are visible at
+    once. Without pg_trgm resolution is off; its presence is re-checked
+    every `recheck_seconds`.
+    """
+
+    def __init__(self, engine, min_similarity: float = ENTITY_MIN_SIMILARITY, recheck_seconds: float = ENTITY_REFRESH_SECONDS):
+        self.engine = engine
+        self.min_similarity = min_similarity
+        self.recheck_seconds = recheck_seconds
+        self._available = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"questions": 0, "resolved": 0, "spans_queried": 0}
+        # first-attempt success of LLM-written SQL, with vs without resolved entities
+        self.outcomes = {
+            True: {"answered": 0, "first_attempt": 0, "failed": 0},
+            False: {"answered": 0, "first_attempt": 0, "failed": 0},
+        }
+
+    def available(self) -> bool:
+        with self._lock:
+            if self._available or (self._checked_at and time.monotonic() - self._checked_at < self.recheck_seconds):
+                return self._available
+            self._checked_at = time.monotonic()
+        with self.engine.connect() as conn:
+            installed = bool(conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar())
+        with self._lock:
+            self._available = installed
+        if not installed:
+            print("⚠️ pg_trgm is not installed, entity resolution is off (python -m agents.sql_agent.entities)")
+        return installed
+
+    # ── Resolution ──────────────────────────────────────────────────
+    def _spans(self, question: str):
+        words = list(re.finditer(r"[A-Za-z0-9]+", question))
+        for size in range(1, MAX_MENTION_WORDS + 1):
+            for start in range(len(words) - size + 1):
+                span = words[start : start + size]
+                tokens = [w.group().lower() for w in span]
+                distinctive = [t for t in tokens if t not in STOPWORDS]
+                if not distinctive or all(t.isdigit() for t in tokens):
+                    continue
+                yield (start, start + size), question[span[0].start() : span[-1].end()], distinctive
+
+    def _match(self, mentions: list[str]) -> dict[int, list[tuple]]:
+        """Mention position → up to MAX_CANDIDATES (kind, id, name, score), best first."""
+        with self.engine.begin() as conn:
+            # `%` filters on this threshold, so the index returns only usable names
+            conn.execute(
+                text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+                {"threshold": str(self.min_similarity)},
+            )
+            rows = conn.execute(MATCH_SQL, {"mentions": mentions, "limit": MAX_CANDIDATES})
+            matches = defaultdict(list)
+            for position, kind, entity_id, name, score in rows:
+                matches[position - 1].append((kind, entity_id, name, score))
+        return matches
+
+    def resolve(self, question: str) -> list[EntityMatch]:
+        spans = list(self._spans(question))
+        if not spans or not self.available():
+            return []
+        with self._lock:
+            self.stats["questions"] += 1
+            self.stats["spans_queried"] += len(spans)
+
+        candidates = []  # (score, span, matches)
+        for position, scored in self._match([mention for _, mention, _ in spans]).items():
+            span, mention, _ = spans[position]
+            best = max(score for *_, score in scored)
+            matches = [
+                EntityMatch(kind, entity_id, name, mention, score)
+                for kind, entity_id, name, score in scored
+                if score >= best - TIE_MARGIN
+            ]
+            candidates.append((best, span, matches))
+
+        # Best spans first; a word belongs to at most one mention
+        resolved, taken, seen = [], set(), set()
+        for best, (start, end), matches in sorted(candidates, key=lambda c: (c[0], c[1][1] - c[1][0]), reverse=True):
+            if taken & set(range(start, end)):
+                continue
+            taken |= set(range(start, end))
+            for match in matches:
+                if (match.kind, match.entity_id) not in seen:
+                    seen.add((match.kind, match.entity_id))
+                    resolved.append(match)
+        if resolved:
+            with self._lock:
+                self.stats["resolved"] += 1
+        return resolved
+
+    # ── Outcome tracking ────────────────────────────────────────────
+    def record_outcome(self, had_entities: bool, attempts: int, success: bool) -> None:
+        with self._lock:
+            bucket = self.outcomes[had_entities]
+            if success:
+                bucket["answered"] += 1
+                bucket["first_attempt"] += attempts == 0
+            else:
+                bucket["failed"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = {**self.stats, "pg_trgm": self._available}
+            for had_entities, bucket in self.outcomes.items():
+                total = bucket["answered"] + bucket["failed"]
+                stats["with_entities" if had_entities else "without_entities"] = {
+                    **bucket,
+                    "first_attempt_rate": round(bucket["first_attempt"] / total, 3) if total else None,
+                }
+        return stats
+
+
+entity_index = EntityIndex(_db._engine)
+
+
+def format_entities(matches: list[EntityMatch]) -> str:
+    if not matches:
+        return "None"
+    return "\n".join(f"- {match.describe()}" for match in matches)
+
+
+def resolve_entities(question: str) -> list[EntityMatch]:
+    try:
+        return entity_index.resolve(question)
+    except SQLAlchemyError as e:
+        print(f"⚠️ Entity resolution failed: {e}")
+        return []
+
+
+def install_entity_search(engine=None) -> None:
+    """Install pg_trgm and the trigram indexes on the name columns."""
+    with (engine or _db._engine).begin() as conn:
+        conn.exec_driver_sql(TRGM_DDL)
+    with entity_index._lock:
+        entity_index._checked_at = 0.0
+    print(f"✅ Trigram indexes installed on {', '.join(t for t, _, _ in ENTITY_SOURCES.values())}")
+
+
+if __name__ == "__main__":
+    try:
+        install_entity_search()
+    except SQLAlchemyError as e:
+        print(f"❌ Could not install entity search: {e}")
+    _db._engine.dispose()
@@ -0,0 +1,240 @@
+# executor.py
+import json
+import math
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from sqlalchemy import text
+
+from config import (
+    SQL_MAX_ROWS,
+    SQL_MAX_BYTES,
+    SQL_FETCH_SIZE,
+    SQL_MAX_PLAN_COST,
+    SQL_MAX_PLAN_ROWS,
+    SQL_STATEMENT_TIMEOUT_MS,
+    SQL_EXPORT_TIMEOUT_MS,
+    EXPORT_FETCH_SIZE,
+)
+from .shared import _db
+from .analytics import analytics_engine, AnalyticsUnavailable
+
+
+class QueryRejected(Exception):
+    """The planner's estimate for a query is over the configured limits."""
+
+
+@dataclass
+class QueryResult:
+    """Typed rows from one SELECT, plus how much was left behind by the caps."""
+
+    columns: list[str] = field(default_factory=list)
+    rows: list[dict[str, Any]] = field(default_factory=list)
+    truncated_rows: int = 0
+    truncated_by: Optional[str] = None  # "rows" or "bytes"
+    fetched_bytes: int = 0
+    plan: Optional[dict] = None  # planner estimate: {"cost", "rows"}
+    engine: str = "postgresql"  # or "duckdb" when offloaded to the analytics snapshot
+
+    @property
+    def truncated(self) -> bool:
+        return self.truncated_rows > 0
+
+
+def _row_size(values) -> int:
+    # Rough in-memory footprint; good enough to keep one result bounded
+    return sum(len(str(v)) for v in values) + 8 * len(values)
+
+
+def explain_plan(conn, sql: str, params: dict) -> dict:
+    """Planner estimate for the query, without running it: {"cost", "rows"}."""
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    return {"cost": root["Total Cost"], "rows": root["Plan Rows"]}
+
+
+def enforce_plan(plan: dict, max_cost: float = SQL_MAX_PLAN_COST, max_rows: float = SQL_MAX_PLAN_ROWS) -> dict:
+    """Raise QueryRejected for a plan over the cost / row limits."""
+    cost, rows = plan["cost"], plan["rows"]
+    if cost > max_cost:
+        raise QueryRejected(
+            f"Query rejected before execution: estimated cost {cost:,.0f} exceeds the limit "
+            f"of {max_cost:,.0f}. Add selective WHERE filters, aggregate instead "
+            "of listing rows, and make sure every JOIN has an ON condition (no cross joins)."
+        )
+    if rows > max_rows:
+        raise QueryRejected(
+            f"Query rejected before execution: it would return about {rows:,.0f} rows "
+            f"(limit {max_rows:,.0f}). Aggregate, filter or add a LIMIT."
+        )
+    return plan
+
+
+def check_plan(
+    conn, sql: str, params: dict, max_cost: float = SQL_MAX_PLAN_COST, max_rows: float = SQL_MAX_PLAN_ROWS
+) -> dict:
+    """EXPLAIN the query (without running it) and reject plans that are too expensive."""
+    return enforce_plan(explain_plan(conn, sql, params), max_cost, max_rows)
+
+
+@contextmanager
+def guarded_connection(timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS):
+    """Connection in a read-only transaction with a statement timeout (on PostgreSQL)."""
+    with _db._engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET TRANSACTION READ ONLY"))
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+        try:
+            yield conn
+        finally:
+            conn.rollback()  # nothing to commit; ends the read-only transaction
+
+
+def unique_columns(columns: list[str]) -> list[str]:
+    """Column labels with repeats suffixed (sales_id, sales_id_2) so rows keyed by them keep every value."""
+    seen: dict[str, int] = {}
+    unique = []
+    for column in columns:
+        label = column
+        while label in seen:
+            seen[column] += 1
+            label = f"{column}_{seen[column]}"
+        seen.setdefault(label, 1)
+        unique.append(label)
+    return unique
+
+
+def _collect(
+    result: QueryResult,
+    batches,
+    max_rows: int,
+    max_bytes: int,
+    on_batch: Optional[Callable[[list[str], list], None]],
+) -> None:
+    """Keep rows from `batches` up to the caps, counting (not holding) the rest."""
+    # SELECT * over a join repeats names like sales_id; dict rows would merge them
+    result.columns = unique_columns(result.columns)
+    for batch in batches:
+        if on_batch:
+            on_batch(result.columns, batch)
+        for row in batch:
+            if result.truncated_by:
+                result.truncated_rows += 1
+                continue
+            size = _row_size(row)
+            if len(result.rows) >= max_rows:
+                result.truncated_by = "rows"
+            elif result.fetched_bytes + size > max_bytes:
+                result.truncated_by = "bytes"
+            if result.truncated_by:
+                result.truncated_rows += 1
+                continue
+            result.rows.append(dict(zip(result.columns, row)))
+            result.fetched_bytes += size
+
+
+def _fetch(conn, sql: str, params: dict, result: QueryResult, max_rows: int, max_bytes: int, on_batch) -> None:
+    cursor = conn.execution_options(
+        stream_results=True, max_row_buffer=SQL_FETCH_SIZE
+    ).execute(text(sql), params)
+    result.columns = list(cursor.keys())
+    _collect(result, iter(lambda: cursor.fetchmany(SQL_FETCH_SIZE), []), max_rows, max_bytes, on_batch)
+    cursor.close()
+
+
+def run_select(
+    sql: str,
+    params: Optional[dict] = None,
+    max_rows: int = SQL_MAX_ROWS,
+    max_bytes: int = SQL_MAX_BYTES,
+    on_batch: Optional[Callable[[list[str], list], None]] = None,
+) -> QueryResult:
+    """Run a SELECT through a server-side cursor and keep at most `max_rows` / `max_bytes`.
+
+    Rows past a cap are still read from the cursor (in `SQL_FETCH_SIZE` batches,
+    never held) so the caller knows how many were dropped. On PostgreSQL the
+    query runs in a read-only transaction with a statement timeout, after its
+    EXPLAIN estimate passed `check_plan`; raises QueryRejected otherwise.
+    Heavy aggregates the analytics engine accepts skip the cost limit and run
+    on its DuckDB snapshot instead.
+    `on_batch(columns, rows)` sees every fetched batch, including dropped rows.
+    """
+    result = QueryResult()
+    params = params or {}
+    with guarded_connection() as conn:
+        if conn.dialect.name == "postgresql":
+            result.plan = explain_plan(conn, sql, params)
+            if analytics_engine and analytics_engine.should_offload(sql, params, result.plan):
+                result.engine = "duckdb"
+            else:
+                enforce_plan(result.plan)
+        if result.engine == "postgresql":
+            _fetch(conn, sql, params, result, max_rows, max_bytes, on_batch)
+            return result
+
+    # Offloaded; the PostgreSQL connection is released while DuckDB runs
+    try:
+        result.columns, batches = analytics_engine.execute(sql)
+    except AnalyticsUnavailable as e:
+        print(f"↩️ Analytics engine can't run the query, using PostgreSQL: {e}")
+        enforce_plan(result.plan)
+        result.engine = "postgresql"
+        with guarded_connection() as conn:
+            _fetch(conn, sql, params, result, max_rows, max_bytes, on_batch)
+        return result
+    try:
+        _collect(result, batches, max_rows, max_bytes, on_batch)
+    except AnalyticsUnavailable as e:
+        raise QueryRejected(f"Query failed on the analytics engine: {e}") from e
+    return result
+
+
+def result_types(conn, description) -> list[str]:
+    """format_type() name of every column in a DB-API cursor description."""
+    oids = [column[1] for column in description]
+    names = dict(
+        conn.execute(
+            text("SELECT oid, format_type(oid, NULL) FROM pg_type WHERE oid = ANY(:oids)"),
+            {"oids": list(set(oids))},
+        ).all()
+    )
+    return [names.get(oid, "text") for oid in oids]
+
+
+def stream_select(
+    sql: str,
+    params: Optional[dict] = None,
+    batch_size: int = EXPORT_FETCH_SIZE,
+    timeout_ms: int = SQL_EXPORT_TIMEOUT_MS,
+    on_types: Optional[Callable[[list[str]], None]] = None,
+) -> Iterator[tuple[list[str], list]]:
+    """Yield `(columns, rows)` batches of every row a SELECT returns.
+
+    For exports: same read-only transaction and cost check as `run_select`,
+    but no row cap and a longer timeout. Only one batch is held at a time;
+    an empty result yields a single `(columns, [])`. On PostgreSQL,
+    `on_types` gets the result's column types (format_type() names) before
+    the first batch.
+    """
+    params = params or {}
+    with guarded_connection(timeout_ms) as conn:
+        if conn.dialect.name == "postgresql":
+            check_plan(conn, sql, params, max_rows=math.inf)
+        cursor = conn.execution_options(
+            stream_results=True, max_row_buffer=batch_size
+        ).execute(text(sql), params)
+        columns = list(cursor.keys())
+        try:
+            if on_types and conn.dialect.name == "postgresql":
+                on_types(result_types(conn, cursor.cursor.description))
+            empty = True
+            while batch := cursor.fetchmany(batch_size):
+                empty = False
+                yield columns, batch
+            if empty:
+                yield columns, []  # callers still get the header
+        finally:
+            cursor.close()
@@ -2,21 +2,49 @@
 from langgraph.graph import StateGraph, END
 from .shared import AgentState
 from .nodes import (
+    match_query_template,
+    plan_cache_lookup,
     check_relevance,
+    check_relevance_and_convert,
     convert_nl_to_sql,
+    validate_generated_sql,
     execute_sql,
     generate_human_readable_answer,
     regenerate_query,
     generate_funny_response,
     end_max_iterations,
+    start_speculation,
+    relevance_branch,
+    speculative_sql_branch,
+    join_speculation,
 )
+from config import SQL_AGENT_MODE
+
+
+def template_router(state: AgentState):
+    return "execute_sql" if state["sql_query"] else "plan_cache_lookup"
+
+
+def plan_cache_router(state: AgentState):
+    return "execute_sql" if state["sql_query"] else "check_relevance"
 
 
 def relevance_router(state: AgentState):
-    return "convert_to_sql" if state["relevance"] else "generate_funny_response"
+    if not state["relevance"]:
+        return "generate_funny_response"
+    # The fused relevance + SQL call may already have produced the query
+    return "validate_sql" if state["sql_query"] else "convert_to_sql"
+
+
+def validate_sql_router(state: AgentState):
+    if not state["sql_error"]:
+        return "execute_sql"
+    return "regenerate_query" if state["attempts"] < 3 else "end_max_iterations"
 
 
 def execute_sql_router(state: AgentState):
+    if not (state["sql_error"] or state["sql_query"] or state["query_result"]):
+        return "plan_cache_lookup"  # template name lookup came back empty
     if not state["sql_error"]:
         return "generate_human_readable_answer"
     return "regenerate_query" if state["attempts"] < 3 else "end_max_iterations"
@@ -26,46 +54,101 @@ def check_attempts_router(state: AgentState):
     return "convert_to_sql" if state["attempts"] < 3 else "end_max_iterations"
 
 
-# Create the graph
-workflow = StateGraph(AgentState)
-workflow.add_node("check_relevance", check_relevance)
-workflow.add_node("convert_to_sql", convert_nl_to_sql)
-workflow.add_node("execute_sql", execute_sql)
-workflow.add_node("generate_human_readable_answer", generate_human_readable_answer)
-workflow.add_node("regenerate_query", regenerate_query)
-workflow.add_node("generate_funny_response", generate_funny_response)
-workflow.add_node("end_max_iterations", end_max_iterations)
-
-workflow.add_conditional_edges(
-    "check_relevance",
-    relevance_router,
-    {
-        "convert_to_sql": "convert_to_sql",
-        "generate_funny_response": "generate_funny_response",
-    },
-)
-workflow.add_edge("convert_to_sql", "execute_sql")
-workflow.add_conditional_edges(
-    "execute_sql",
-    execute_sql_router,
-    {
-        "generate_human_readable_answer": "generate_human_readable_answer",
-        "regenerate_query": "regenerate_query",
-        "end_max_iterations": "end_max_iterations",
-    },
-)
-workflow.add_conditional_edges(
-    "regenerate_query",
-    check_attempts_router,
-    {
-        "convert_to_sql": "convert_to_sql",
-        "end_max_iterations": "end_max_iterations",
-    },
-)
-workflow.add_edge("generate_human_readable_answer", END)
-workflow.add_edge("generate_funny_response", END)
-workflow.add_edge("end_max_iterations", END)
+def build_agent(mode: str = "sequential", use_fast_paths: bool = True):
+    """Compile the SQL agent graph.
+
+    mode="sequential" runs check_relevance then convert_nl_to_sql;
+    mode="fused" answers both with one structured call;
+    mode="speculative" runs both calls concurrently and joins them.
+    """
+    workflow = StateGraph(AgentState)
+    workflow.add_node("match_template", match_query_template)
+    workflow.add_node("plan_cache_lookup", plan_cache_lookup)
+    if mode == "speculative":
+        # Fan out to both LLM calls, join when both are in
+        workflow.add_node("start_speculation", start_speculation)
+        workflow.add_node("relevance_branch", relevance_branch)
+        workflow.add_node("speculative_sql", speculative_sql_branch)
+        workflow.add_node("check_relevance", join_speculation)
+        workflow.add_edge("start_speculation", "relevance_branch")
+        workflow.add_edge("start_speculation", "speculative_sql")
+        workflow.add_edge(["relevance_branch", "speculative_sql"], "check_relevance")
+        relevance_entry = "start_speculation"
+    else:
+        workflow.add_node(
+            "check_relevance",
+            check_relevance_and_convert if mode == "fused" else check_relevance,
+        )
+        relevance_entry = "check_relevance"
+    workflow.add_node("convert_to_sql", convert_nl_to_sql)
+    workflow.add_node("validate_sql", validate_generated_sql)
+    workflow.add_node("execute_sql", execute_sql)
+    workflow.add_node("generate_human_readable_answer", generate_human_readable_answer)
+    workflow.add_node("regenerate_query", regenerate_query)
+    workflow.add_node("generate_funny_response", generate_funny_response)
+    workflow.add_node("end_max_iterations", end_max_iterations)
+
+    workflow.add_conditional_edges(
+        "match_template",
+        template_router,
+        {
+            "execute_sql": "execute_sql",
+            "plan_cache_lookup": "plan_cache_lookup",
+        },
+    )
+    workflow.add_conditional_edges(
+        "plan_cache_lookup",
+        plan_cache_router,
+        {
+            "execute_sql": "execute_sql",
+            "check_relevance": relevance_entry,
+        },
+    )
+    workflow.add_conditional_edges(
+        "check_relevance",
+        relevance_router,
+        {
+            "convert_to_sql": "convert_to_sql",
+            "validate_sql": "validate_sql",
+            "generate_funny_response": "generate_funny_response",
+        },
+    )
+    workflow.add_edge("convert_to_sql", "validate_sql")
+    workflow.add_conditional_edges(
+        "validate_sql",
+        validate_sql_router,
+        {
+            "execute_sql": "execute_sql",
+            "regenerate_query": "regenerate_query",
+            "end_max_iterations": "end_max_iterations",
+        },
+    )
+    workflow.add_conditional_edges(
+        "execute_sql",
+        execute_sql_router,
+        {
+            "generate_human_readable_answer": "generate_human_readable_answer",
+            "plan_cache_lookup": "plan_cache_lookup",
+            "regenerate_query": "regenerate_query",
+            "end_max_iterations": "end_max_iterations",
+        },
+    )
+    workflow.add_conditional_edges(
+        "regenerate_query",
+        check_attempts_router,
+        {
+            "convert_to_sql": "convert_to_sql",
+            "end_max_iterations": "end_max_iterations",
+        },
+    )
+    workflow.add_edge("generate_human_readable_answer", END)
+    workflow.add_edge("generate_funny_response", END)
+    workflow.add_edge("end_max_iterations", END)
+
+    # The benchmark bypasses both local fast paths to compare the LLM variants
+    workflow.set_entry_point("match_template" if use_fast_paths else relevance_entry)
+
+    return workflow.compile()
 
-workflow.set_entry_point("check_relevance")
 
-agent = workflow.compile()
+agent = build_agent(SQL_AGENT_MODE)
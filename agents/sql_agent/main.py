@@ -1,20 +1,10 @@
 # main.py
 from .langgraph_agent import agent
-from .shared import AgentState, _db
+from .shared import AgentState, _db, new_state
 
 if __name__ == "__main__":
     query = input("Enter your business question: ")
-    result = agent.invoke(
-        {
-            "question": query,
-            "attempts": 0,
-            "curr_question": "",
-            "sql_query": "",
-            "query_result": "",
-            "relevance": False,
-            "sql_error": [],
-        }
-    )
+    result = agent.invoke(new_state(query))
 
     print("\n" + "=" * 50)
     print(result["query_result"])
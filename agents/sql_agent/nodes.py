@@ -1,25 +1,123 @@
 # nodes.py
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.callbacks import get_usage_metadata_callback
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
+import threading
+import time
 
 from .shared import (
     AgentState,
-    get_schema,
     GLOBAL_LLM,
-    _db,
     CheckRelevance,
     ConvertToSQL,
+    RelevanceAndSQL,
     HumanAnswer,
     RewrittenQuestion,
 )
 from .tools import format_sql_results
+from .executor import run_select, QueryRejected
+from .summarizer import ResultSummarizer
+from .result_handles import result_handles
+from .result_cache import result_cache
+from .plan_cache import plan_cache
+from .templates import match_template, NAME_PARAMS
+from .catalog import get_catalog, catalog_service
+from .validator import validate_sql
+from .schema_retriever import get_schema_for
+from .query_log import query_log, format_examples
+from .entities import entity_index, resolve_entities, format_entities
+from .approximate import plan_approximation
+from config import (
+    PLAN_CACHE_ENABLED,
+    FEW_SHOT_ENABLED,
+    ENTITY_RESOLUTION_ENABLED,
+    SQL_TEMPLATES_ENABLED,
+    SQL_TEMPLATE_INSIGHTS,
+    SQL_VALIDATE_ENABLED,
+    SUMMARY_MAX_CHARS,
+    SUMMARY_SAMPLE_ROWS,
+)
+
+
+def match_query_template(state: AgentState):
+    state.update({"curr_question": state["question"], "sql_error": []})
+    if not SQL_TEMPLATES_ENABLED:
+        return state
+
+    matched = match_template(state["question"])
+    if matched:
+        template, params = matched
+        print(f"📋 Template match: {template.name} {params}")
+        state.update(
+            {
+                "sql_query": template.sql.strip(),
+                "sql_params": params,
+                "relevance": True,
+                "sql_source": "template",
+            }
+        )
+    return state
+
+
+def plan_cache_lookup(state: AgentState):
+    state.update({"curr_question": state["question"], "sql_error": []})
+    if not PLAN_CACHE_ENABLED:
+        return state
+
+    plan_cache.set_fingerprint(catalog_service.fingerprint())  # no-op unless DDL changed
+    cached = plan_cache.lookup(state["question"])
+    if cached:
+        cached_sql, export_sql = cached
+        print(f"⚡ Plan cache hit, skipping relevance + SQL generation:\n{cached_sql}")
+        state.update(
+            {
+                "sql_query": cached_sql,
+                "export_sql": export_sql,
+                "relevance": True,
+                "sql_source": "plan_cache",
+            }
+        )
+    return state
+
+
+SQL_RULES = """Rules:
+1. Only generate SELECT queries.
+2. Use JOINs properly.
+3. Use table aliases.
+4. use LIMIT unless important to get full result.
+5. Return only the SQL query, no explanation.
+6. do learn from past errors and improve the query.
+6. use today's timestamp in the query if needed.
+"""
+
+
+def few_shot_examples(state: AgentState) -> str:
+    """Nearest logged question → SQL pairs for the prompt; records how many were used."""
+    examples = []
+    if FEW_SHOT_ENABLED:
+        try:
+            examples = query_log.examples_for(state["question"], catalog_service.fingerprint())
+        except SQLAlchemyError as e:
+            print(f"⚠️ Schema catalog unavailable, no few-shot examples: {e}")
+    state["few_shot_examples"] = len(examples)
+    if examples:
+        print(f"📎 Added {len(examples)} similar answered questions as examples")
+    return format_examples(examples)
+
+
+def resolved_entities(state: AgentState) -> str:
+    """Product/customer/vendor names in the question matched to their rows, for the prompt."""
+    matches = resolve_entities(state["question"]) if ENTITY_RESOLUTION_ENABLED else []
+    state["entities"] = [match.describe() for match in matches]
+    if matches:
+        print(f"🏷️ Resolved entities: {'; '.join(state['entities'])}")
+    return format_entities(matches)
 
 
 def check_relevance(state: AgentState):
     print(f"Checking relevance of the question: {state['question']}")
-    schema = get_schema()
     prompt = ChatPromptTemplate.from_messages(
         [
             (
@@ -36,9 +134,10 @@ def check_relevance(state: AgentState):
         ]
     )
     try:
+        state["llm_calls"] = state.get("llm_calls", 0) + 1
         result = (prompt | GLOBAL_LLM.with_structured_output(CheckRelevance)).invoke(
             {
-                "schema": schema,
+                "schema": get_schema_for(state["question"]),
                 "question": state["question"],
             }
         )
@@ -61,9 +160,71 @@ def check_relevance(state: AgentState):
     return state
 
 
+def check_relevance_and_convert(state: AgentState):
+    """Relevance check and SQL generation in one structured LLM call."""
+    print(f"Checking relevance and converting to SQL: {state['question']}")
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                """You are an expert PostgreSQL query generator for this database schema:
+{schema}
+
+curr_timestamp: {timestamp}
+
+First decide if the question can be answered from this schema (is_relevant).
+If it is relevant, also convert it into a valid PostgreSQL SELECT statement (sql_query).
+If it is not relevant, leave sql_query empty.
+
+Similar questions already answered correctly on this database:
+{examples}
+
+Names in the question matched to database rows (filter on these IDs, not on the names):
+{entities}
+
+{rules}""",
+            ),
+            ("human", "Question: {question}"),
+        ]
+    )
+    try:
+        state["llm_calls"] = state.get("llm_calls", 0) + 1
+        result = (prompt | GLOBAL_LLM.with_structured_output(RelevanceAndSQL)).invoke(
+            {
+                "schema": get_schema_for(state["question"]),
+                "question": state["question"],
+                "timestamp": datetime.now().isoformat(),
+                "examples": few_shot_examples(state),
+                "entities": resolved_entities(state),
+                "rules": SQL_RULES,
+            }
+        )
+        sql_query = result.sql_query.strip() if result.is_relevant else ""
+        state.update(
+            {
+                "relevance": result.is_relevant,
+                "curr_question": state["question"],
+                "sql_query": sql_query,
+                "sql_source": "llm" if sql_query else "",
+                "sql_error": [],
+            }
+        )
+    except Exception as e:
+        state.update(
+            {
+                "query_result": f"⚠️ Error checking relevance: {str(e)}",
+                "relevance": False,
+            }
+        )
+
+    print(f"Relevance determined: {state['relevance']}")
+    if state["sql_query"]:
+        print(f"✅ Generated SQL query:\n{state['sql_query']}")
+    return state
+
+
 def convert_nl_to_sql(state: AgentState):
     print(f"Converting question to SQL: {state['question']}")
-    schema = get_schema()
     error_context = (
         "\nList of SQL Error you done previously : " + str(state["sql_error"])
         if state["sql_error"]
@@ -81,32 +242,36 @@ Database Schema:
 
 {error_context}
 
+Similar questions already answered correctly on this database:
+{examples}
+
+Names in the question matched to database rows (filter on these IDs, not on the names):
+{entities}
+
 curr_timestamp: {timestamp}
 
-Rules:
-1. Only generate SELECT queries.
-2. Use JOINs properly.
-3. Use table aliases.
-4. use LIMIT unless important to get full result.
-5. Return only the SQL query, no explanation.
-6. do learn from past errors and improve the query.
-6. use today's timestamp in the query if needed.
-""",
+{rules}""",
             ),
             ("human", "Question: {curr_question}"),
         ]
     )
 
     try:
+        state["llm_calls"] = state.get("llm_calls", 0) + 1
         result = (prompt | GLOBAL_LLM.with_structured_output(ConvertToSQL)).invoke(
             {
                 "curr_question": state["curr_question"],
-                "schema": schema,
+                "schema": get_schema_for(state["curr_question"]),
                 "error_context": error_context,
+                "examples": few_shot_examples(state),
+                "entities": resolved_entities(state),
                 "timestamp": datetime.now().isoformat(),
+                "rules": SQL_RULES,
             }
         )
-        state["sql_query"] = result.sql_query.strip()
+        state.update(
+            {"sql_query": result.sql_query.strip(), "sql_params": {}, "sql_source": "llm"}
+        )
     except Exception as e:
         state.update(
             {
@@ -120,6 +285,125 @@ Rules:
     return state
 
 
+# ── Speculative SQL generation ───────────────────────────────────────
+# mode="speculative": the relevance check and SQL generation start in the
+# same graph step; the SQL is thrown away if the question is irrelevant.
+_speculative_lock = threading.Lock()
+SPECULATIVE_SQL_STATS = {
+    "launched": 0,
+    "used": 0,
+    "wasted": 0,  # question was irrelevant, the generated SQL was discarded
+    "failed": 0,  # generation failed, convert_to_sql runs as usual
+    "used_tokens": 0,
+    "wasted_tokens": 0,
+    "latency_saved_s": 0.0,
+    "wasted_llm_s": 0.0,
+}
+
+
+def _record_speculation(**deltas) -> None:
+    with _speculative_lock:
+        for key, value in deltas.items():
+            SPECULATIVE_SQL_STATS[key] += value
+
+
+def get_speculative_sql_stats() -> dict:
+    with _speculative_lock:
+        stats = dict(SPECULATIVE_SQL_STATS)
+    stats["latency_saved_s"] = round(stats["latency_saved_s"], 3)
+    stats["wasted_llm_s"] = round(stats["wasted_llm_s"], 3)
+    return stats
+
+
+def start_speculation(state: AgentState):
+    """Fan-out point; both branches below run concurrently."""
+    return {}
+
+
+def relevance_branch(state: AgentState):
+    # Parallel branches must not touch the same keys, so work on a copy
+    # and hand back only what the relevance check owns.
+    start = time.perf_counter()
+    result = check_relevance(dict(state))
+    return {
+        "relevance": result["relevance"],
+        "curr_question": result["curr_question"],
+        "sql_error": result["sql_error"],
+        "query_result": result["query_result"],
+        "llm_calls": result["llm_calls"],
+        "relevance_seconds": time.perf_counter() - start,
+    }
+
+
+def speculative_sql_branch(state: AgentState):
+    start = time.perf_counter()
+    with get_usage_metadata_callback() as usage:
+        result = convert_nl_to_sql(
+            {**state, "curr_question": state["question"], "sql_error": []}
+        )
+    failed = result["attempts"] > state["attempts"]
+    return {
+        "speculation": {
+            "sql": "" if failed else result["sql_query"],
+            "error": result["sql_error"] if failed else [],
+            "tokens": sum(u.get("total_tokens", 0) for u in usage.usage_metadata.values()),
+            "seconds": time.perf_counter() - start,
+        },
+        "few_shot_examples": result.get("few_shot_examples", 0),
+        "entities": result.get("entities", []),
+    }
+
+
+def join_speculation(state: AgentState):
+    speculation = state.get("speculation") or {}
+    tokens, seconds = speculation.get("tokens", 0), speculation.get("seconds", 0.0)
+    state["llm_calls"] = state.get("llm_calls", 0) + 1  # the speculative call ran either way
+    _record_speculation(launched=1)
+
+    if not state["relevance"]:
+        _record_speculation(wasted=1, wasted_tokens=tokens, wasted_llm_s=seconds)
+        print(f"🗑️ Question not relevant, discarded speculative SQL ({tokens} tokens)")
+        return state
+    if not speculation.get("sql"):
+        _record_speculation(failed=1, wasted_tokens=tokens, wasted_llm_s=seconds)
+        print(f"⚠️ Speculative SQL generation failed: {speculation.get('error')}")
+        return state
+
+    saved = min(state.get("relevance_seconds", 0.0), seconds)
+    _record_speculation(used=1, used_tokens=tokens, latency_saved_s=saved)
+    print(f"⚡ Speculative SQL used (saved ~{saved:.2f}s)")
+    state.update({"sql_query": speculation["sql"], "sql_params": {}, "sql_source": "llm"})
+    return state
+
+
+def validate_generated_sql(state: AgentState):
+    if not SQL_VALIDATE_ENABLED or not state["sql_query"]:
+        return state
+
+    try:
+        catalog = get_catalog()
+    except SQLAlchemyError as e:
+        print(f"⚠️ Schema catalog unavailable, skipping validation: {e}")
+        return state
+
+    check = validate_sql(state["sql_query"], catalog)
+    if check.errors:
+        print(f"❌ SQL validation failed: {check.errors}")
+        state.update(
+            {
+                "query_result": "❌ SQL validation failed: " + " ".join(check.errors),
+                "sql_error": check.errors,
+                "attempts": state["attempts"] + 1,
+            }
+        )
+        return state
+
+    if check.fixes:
+        print(f"🛠️ Auto-fixed SQL ({'; '.join(check.fixes)}):\n{check.sql}")
+    state.update({"sql_query": check.sql, "export_sql": check.export_sql, "sql_error": []})
+    return state
+
+
 def execute_sql(state: AgentState):
     if not state["sql_query"]:
         state["query_result"] = "No SQL query to execute"
@@ -139,11 +423,86 @@ def execute_sql(state: AgentState):
         return state
 
     try:
-        result = _db.run(sql_query)
-        state.update({"query_result": format_sql_results(result), "sql_error": []})
-        print("✅ SQL SELECT executed successfully.")
+        started = time.perf_counter()
+        approximation = None
+        if state.get("approximate") is not False:
+            approximation = plan_approximation(
+                sql_query, state["question"], state.get("sql_params"), force=bool(state.get("approximate"))
+            )
+        # Cache, handle and engine see the query that actually runs; the plan
+        # cache and query log keep the exact one
+        executed_sql = approximation.sql if approximation else sql_query
+        if approximation:
+            print(f"≈ Sampling {approximation.percent:g}% of {approximation.table} ({approximation.reason})")
+
+        cached, ticket = result_cache.lookup(executed_sql, state.get("sql_params")) if result_cache else (None, None)
+        if cached:
+            result, summary = cached
+            print("⚡ SQL result cache hit, tables unchanged since the last run")
+        else:
+            summarizer = ResultSummarizer()
+            result = run_select(
+                executed_sql, state.get("sql_params") or None, on_batch=summarizer.update
+            )
+            summary = summarizer.summary(shown_rows=len(result.rows))
+            # A snapshot answer is only as fresh as the snapshot; keyed under the
+            # live table versions it would outlive the staleness bound
+            if result_cache and result.engine != "duckdb":
+                result_cache.store(ticket, (result, summary))
+        if state.get("sql_source") == "template" and not result.rows and any(
+            (state.get("sql_params") or {}).get(param) for param in NAME_PARAMS
+        ):
+            # The name in the question may be spelled differently or not be a
+            # name at all; let the plan cache / LLM path try before saying "none"
+            print("📋 Template name lookup returned no rows, falling back to the LLM path")
+            state.update({"sql_query": "", "sql_params": {}, "sql_source": "", "query_result": ""})
+            return state
+        note = approximation.describe() if approximation else ""
+        state.update(
+            {
+                "query_result": f"{note}\n{format_sql_results(result)}" if note else format_sql_results(result),
+                "query_columns": result.columns,
+                "query_rows": result.rows,
+                "truncated_rows": result.truncated_rows,
+                "result_summary": f"{note}\n{summary}" if note else summary,
+                "approximation": note,
+                "result_handle": result_handles.register(
+                    executed_sql if approximation else state.get("export_sql") or sql_query,
+                    state.get("sql_params"),
+                    result.columns,
+                    question=state["question"],
+                ),
+                "sql_error": [],
+            }
+        )
+        print(f"✅ SQL SELECT executed successfully ({len(result.rows)} rows).")
+        if result.engine == "duckdb":
+            print("🦆 Answered from the analytics snapshot (DuckDB)")
+        if result.truncated:
+            print(f"✂️ {result.truncated_rows} rows dropped by the {result.truncated_by} cap")
+        if PLAN_CACHE_ENABLED and state.get("sql_source") == "llm":
+            plan_cache.store(state["question"], sql_query, state.get("export_sql"))
+        if state.get("sql_source") == "llm":
+            entity_index.record_outcome(bool(state.get("entities")), state["attempts"], success=True)
+        finished = time.perf_counter()
+        query_log.log(
+            state["question"],
+            sql_query,
+            source=state.get("sql_source") or "llm",
+            fingerprint=catalog_service.fingerprint(),
+            latency_ms=(finished - state.get("started_at", started)) * 1000,
+            exec_ms=(finished - started) * 1000,
+            attempts=state["attempts"],
+            llm_calls=state.get("llm_calls", 0),
+            examples=state.get("few_shot_examples", 0),
+            # Only new LLM answers become examples: template SQL needs its bind
+            # values and a plan-cache hit repeats a pair that is already indexed
+            usable=state.get("sql_source") == "llm",
+        )
 
-    except SQLAlchemyError as e:
+    except (SQLAlchemyError, QueryRejected) as e:
+        if state.get("sql_source") == "plan_cache":
+            plan_cache.invalidate_sql(sql_query)
         state.update(
             {
                 "query_result": f"❌ SQL Error: {str(e)}",
@@ -162,29 +521,41 @@ def generate_human_readable_answer(state: AgentState):
         state["query_result"] = "No results to explain"
         return state
 
-    if len(state["query_result"]) > 1000:  # Limit to avoid too long outputs
+    if state.get("sql_source") == "template" and not SQL_TEMPLATE_INSIGHTS:
+        state["query_result"] = f"🔍 Results:\n{state['query_result']}"
         return state
 
     print("📄 Generating human-readable summary...")
 
+    # The LLM sees a fixed-size summary of the whole result plus a few sample
+    # rows, never the raw result, so insights cost the same for any result size.
+    sample = "\n".join(
+        " | ".join(str(v) for v in row.values())
+        for row in state.get("query_rows", [])[:SUMMARY_SAMPLE_ROWS]
+    )
     prompt = ChatPromptTemplate.from_messages(
         [
             (
                 "system",
-                """You are a data analyst explaining database results to a shop owner...""",
+                """You are a data analyst explaining database results to a shop owner...
+Use the statistics, they cover every returned row; the sample rows are only the first few.
+If the statistics say the answer is approximate, say so and give each figure with its ± margin.""",
             ),
             (
                 "human",
-                f"Question: {state['curr_question']}\nData:\n{state['query_result']}",
+                "Question: {curr_question}\nStatistics:\n{summary}\n\nSample rows ({columns}):\n{sample}",
             ),
         ]
     )
 
     try:
+        state["llm_calls"] = state.get("llm_calls", 0) + 1
         result = (prompt | GLOBAL_LLM.with_structured_output(HumanAnswer)).invoke(
             {
                 "curr_question": state["curr_question"],
-                "query_result": state["query_result"],
+                "summary": state.get("result_summary") or state["query_result"][:SUMMARY_MAX_CHARS],
+                "columns": ", ".join(state.get("query_columns", [])),
+                "sample": sample,
             }
         )
         state["query_result"] = (
@@ -215,9 +586,10 @@ def regenerate_query(state: AgentState):
         ]
     )
     try:
+        state["llm_calls"] = state.get("llm_calls", 0) + 1
         result = (prompt | GLOBAL_LLM.with_structured_output(RewrittenQuestion)).invoke(
             {
-                "schema": get_schema(),
+                "schema": get_schema_for(state["curr_question"]),
                 "error": str(state["sql_error"]) if state["sql_error"] else "No error",
                 "question": state["curr_question"],
             }
@@ -252,15 +624,16 @@ def generate_funny_response(state: AgentState):
         ]
     )
     try:
+        state["llm_calls"] = state.get("llm_calls", 0) + 1
         result = (prompt | GLOBAL_LLM | StrOutputParser()).invoke(
             {
                 "question": state["question"],
-                "schema": get_schema(),
+                "schema": get_schema_for(state["question"]),
             }
         )
         print("✅ Funny helper response generated.")
         state["query_result"] = result
-    except Exception:
+    except Exception as e:
         print(f"❌ Failed to generate funny response: {e}")
         state["query_result"] = (
             "I'd make a joke, but I'm all queried out! Try asking about our products or sales."
@@ -269,6 +642,8 @@ def generate_funny_response(state: AgentState):
 
 
 def end_max_iterations(state: AgentState):
+    if state.get("sql_source") == "llm":
+        entity_index.record_outcome(bool(state.get("entities")), state["attempts"], success=False)
     state["query_result"] = """🔴 Maximum attempts reached (3)
 
 Suggestions:
@@ -0,0 +1,202 @@
+# partitions.py
+# Migrate / add future months: python -m agents.sql_agent.partitions [--extend]
+import datetime as dt
+import sys
+
+from sqlalchemy import text
+
+from config import PARTITION_MONTHS_AHEAD
+from .shared import _db
+from .catalog import catalog_service
+from .rollups import ROLLUP_DDL, rollups_installed
+from .result_cache import VERSION_DDL, result_cache
+
+# table → (partition key, id column). Both are range-partitioned by month; the
+# primary key becomes (id, key) because Postgres requires the partition key in
+# every unique constraint.
+PARTITIONED_TABLES = {
+    "sales_data": ("transaction_date", "sales_id"),
+    "purchase_data": ("transaction_date", "purch_id"),
+}
+
+# BRIN on dates (rows are loaded in date order, so block ranges stay tight
+# inside each month) and btree on the columns joins and lookups go through.
+# The dependents stay unpartitioned: they carry no date of their own, and
+# udhar is a fraction of the transactions.
+INDEX_DDL = """
+CREATE INDEX IF NOT EXISTS ix_sales_data_transaction_date ON sales_data USING brin (transaction_date);
+CREATE INDEX IF NOT EXISTS ix_sales_data_customer_id ON sales_data (customer_id);
+CREATE INDEX IF NOT EXISTS ix_purchase_data_transaction_date ON purchase_data USING brin (transaction_date);
+CREATE INDEX IF NOT EXISTS ix_purchase_data_vendor_id ON purchase_data (vendor_id);
+CREATE INDEX IF NOT EXISTS ix_sale_product_prod_id ON sale_product (prod_id);
+CREATE INDEX IF NOT EXISTS ix_purchase_product_prod_id ON purchase_product (prod_id);
+CREATE INDEX IF NOT EXISTS ix_udhar_sales_sales_id ON udhar_sales (sales_id);
+CREATE INDEX IF NOT EXISTS ix_udhar_sales_date_of_entry ON udhar_sales USING brin (date_of_entry);
+CREATE INDEX IF NOT EXISTS ix_udhar_purchase_purch_id ON udhar_purchase (purch_id);
+CREATE INDEX IF NOT EXISTS ix_udhar_purchase_date_of_entry ON udhar_purchase USING brin (date_of_entry);
+"""
+
+
+def _month(day: dt.date) -> dt.date:
+    return day.replace(day=1)
+
+
+def _next_month(month: dt.date) -> dt.date:
+    return (month + dt.timedelta(days=32)).replace(day=1)
+
+
+def _add_months(month: dt.date, months: int) -> dt.date:
+    for _ in range(months):
+        month = _next_month(month)
+    return month
+
+
+def partition_name(table: str, month: dt.date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return bool(
+        conn.execute(
+            text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": table},
+        ).scalar()
+    )
+
+
+def ensure_partitions(conn, table: str, first: dt.date, last: dt.date) -> int:
+    """Create the missing monthly partitions from `first` through `last`.
+
+    Rows already sitting in the default partition for a new month are moved
+    into it: deleted and re-inserted through the parent, so row triggers
+    (rollups) see a matching delete/insert pair.
+    """
+    key, _ = PARTITIONED_TABLES[table]
+    created = 0
+    month = _month(first)
+    while month <= last:
+        name = partition_name(table, month)
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+            bounds = f"FROM ('{month}') TO ('{_next_month(month)}')"
+            in_month = f"{key} >= '{month}' AND {key} < '{_next_month(month)}'"
+            conn.exec_driver_sql(f"CREATE TEMP TABLE _moved (LIKE {table}) ON COMMIT DROP")
+            conn.exec_driver_sql(
+                f"WITH d AS (DELETE FROM {table}_default WHERE {in_month} RETURNING *) "
+                f"INSERT INTO _moved SELECT * FROM d"
+            )
+            conn.exec_driver_sql(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}")
+            conn.exec_driver_sql(f"INSERT INTO {table} SELECT * FROM _moved")
+            conn.exec_driver_sql("DROP TABLE _moved")
+            created += 1
+        month = _next_month(month)
+    return created
+
+
+def _partition_table(conn, table: str, months_ahead: int) -> None:
+    key, id_column = PARTITIONED_TABLES[table]
+    nulls = conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {key} IS NULL")).scalar()
+    if nulls:
+        raise RuntimeError(f"{table} has {nulls} rows without {key}; fix them before partitioning")
+    first, last = conn.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).one()
+    this_month = _month(dt.date.today())
+    first = _month(first or this_month)
+    last = _add_months(max(_month(last or this_month), this_month), months_ahead)
+
+    sequence = conn.execute(
+        text("SELECT pg_get_serial_sequence(:table, :column)"), {"table": table, "column": id_column}
+    ).scalar()
+    outgoing = conn.execute(
+        text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ),
+        {"table": table},
+    ).all()
+    incoming = conn.execute(
+        text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE confrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ),
+        {"table": table},
+    ).all()
+
+    new = f"{table}_partitioned"
+    conn.exec_driver_sql(
+        f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE ({key})"
+    )
+    conn.exec_driver_sql(f"ALTER TABLE {new} ALTER COLUMN {key} SET NOT NULL")
+    conn.exec_driver_sql(f"CREATE TABLE {table}_default PARTITION OF {new} DEFAULT")
+    month = first
+    while month <= last:
+        conn.exec_driver_sql(
+            f"CREATE TABLE {partition_name(table, month)} PARTITION OF {new} "
+            f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+        )
+        month = _next_month(month)
+    # Date order keeps each partition's BRIN ranges narrow
+    conn.exec_driver_sql(f"INSERT INTO {new} SELECT * FROM {table} ORDER BY {key}, {id_column}")
+
+    # References into the old table can't point at a partitioned parent
+    # without the date; the catalog keeps them as implied foreign keys.
+    for dependent, constraint in incoming:
+        conn.exec_driver_sql(f"ALTER TABLE {dependent} DROP CONSTRAINT {constraint}")
+    if sequence:
+        conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    conn.exec_driver_sql(f"DROP TABLE {table}")  # fails loudly if a view still depends on it
+    conn.exec_driver_sql(f"ALTER TABLE {new} RENAME TO {table}")
+    conn.exec_driver_sql(f"ALTER TABLE {table} ADD PRIMARY KEY ({id_column}, {key})")
+    if sequence:
+        conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{id_column}")
+    for constraint, definition in outgoing:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} {definition}")
+    print(f"🗂️ Partitioned {table} by month: {first:%Y-%m} to {last:%Y-%m} plus {table}_default")
+
+
+def _reinstall_triggers(conn) -> None:
+    """Triggers went with the old tables; put back whatever was installed."""
+    if rollups_installed(conn):
+        conn.exec_driver_sql(ROLLUP_DDL)
+    if conn.execute(text("SELECT to_regclass('table_versions')")).scalar() is not None:
+        conn.exec_driver_sql(VERSION_DDL)
+
+
+def partition_tables(engine=None, months_ahead: int = PARTITION_MONTHS_AHEAD) -> None:
+    """Range-partition the transaction tables by month (once) and create the indexes."""
+    engine = engine or _db._engine
+    with engine.begin() as conn:
+        migrated = [table for table in PARTITIONED_TABLES if not is_partitioned(conn, table)]
+        for table in migrated:
+            _partition_table(conn, table, months_ahead)
+        conn.exec_driver_sql(INDEX_DDL)
+        if migrated:
+            _reinstall_triggers(conn)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in migrated:
+            conn.exec_driver_sql(f"ANALYZE {table}")
+
+    catalog_service.invalidate()
+    if result_cache:
+        result_cache.restart()  # versions were reinstalled on the new tables
+    print(f"✅ Transaction tables partitioned and indexed ({len(migrated)} migrated)")
+
+
+def extend_partitions(engine=None, months_ahead: int = PARTITION_MONTHS_AHEAD) -> None:
+    """Keep `months_ahead` months of empty partitions ahead of today (run monthly)."""
+    engine = engine or _db._engine
+    this_month = _month(dt.date.today())
+    with engine.begin() as conn:
+        created = sum(
+            ensure_partitions(conn, table, this_month, _add_months(this_month, months_ahead))
+            for table in PARTITIONED_TABLES
+            if is_partitioned(conn, table)
+        )
+    print(f"✅ {created} monthly partitions created")
+
+
+if __name__ == "__main__":
+    if "--extend" in sys.argv[1:]:
+        extend_partitions()
+    else:
+        partition_tables()
+    _db._engine.dispose()
@@ -0,0 +1,230 @@
+# plan_cache.py
+import atexit
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Optional
+
+from config import (
+    PLAN_CACHE_PATH,
+    PLAN_CACHE_SIMILARITY,
+    PLAN_CACHE_MAX_ENTRIES,
+    PLAN_CACHE_SAVE_DELAY_SECONDS,
+)
+from .shared import embed_question
+
+# Questions whose SQL the LLM may have written with today's date baked in
+TIME_RELATIVE_PATTERN = re.compile(
+    r"\b(today|todays|yesterday|tomorrow|now|current|this|last|past|recent|previous|next)\b"
+)
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return re.sub(r"\s+", " ", question).strip()
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class PlanCache:
+    """Normalized question → SQL that already ran without errors.
+
+    The whole cache is dropped when the schema fingerprint changes. With
+    `fingerprint=None` the file is only read once `set_fingerprint` is first
+    called, so building the cache doesn't touch the database. Entries
+    for time-relative questions ("today", "this month") are only valid on
+    the day they were stored. With `similarity` > 0 an exact miss falls back
+    to the closest stored question by embedding cosine similarity.
+
+    At most `max_entries` are kept, least recently used evicted first.
+    Changes reach the JSON file at most once per `save_delay` seconds (and
+    at exit), not on every store.
+    """
+
+    def __init__(
+        self,
+        fingerprint: Optional[str],
+        path: Optional[str] = None,
+        similarity: float = 0.0,
+        embed: Optional[Callable[[str], list[float]]] = None,
+        max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+        save_delay: float = PLAN_CACHE_SAVE_DELAY_SECONDS,
+    ):
+        self.fingerprint = fingerprint
+        self.path = path
+        self.similarity = similarity
+        self.embed = embed if similarity > 0 else None
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self._entries: OrderedDict[str, dict] = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one file write at a time
+        self._save_timer: Optional[threading.Timer] = None
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "evicted": 0, "saves": 0}
+        if fingerprint is not None:
+            self._load()
+        if self.path:
+            atexit.register(self.flush)
+
+    # ── Persistence ─────────────────────────────────────────────────
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read plan cache {self.path}: {e}")
+            return
+        if data.get("fingerprint") != self.fingerprint:
+            print("🔄 Schema changed since plan cache was written, starting empty.")
+            return
+        loaded = OrderedDict(data.get("entries", {}))
+        loaded.update(self._entries)  # anything stored before the file was read is newer
+        self._entries = loaded
+        self._evict()
+        print(f"🗃️ Loaded {len(self._entries)} cached SQL plans")
+
+    def _save(self) -> None:
+        """Schedule a write of the whole cache; called with the lock held."""
+        if not self.path or self._save_timer:
+            return
+        self._save_timer = threading.Timer(self.save_delay, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self) -> None:
+        """Write pending changes now; lookups and stores don't wait on the file."""
+        with self._write_lock:
+            with self._lock:
+                if not self._save_timer:
+                    return
+                self._save_timer.cancel()
+                self._save_timer = None
+                if self.fingerprint is None:
+                    return  # written once set_fingerprint is called
+                data = json.dumps({"fingerprint": self.fingerprint, "entries": self._entries})
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Could not write plan cache {self.path}: {e}")
+                return
+        with self._lock:
+            self.stats["saves"] += 1
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    # ── Cache API ───────────────────────────────────────────────────
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """Invalidate everything if the schema fingerprint moved."""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            if self.fingerprint is None:  # first call: now the file can be checked
+                self.fingerprint = fingerprint
+                self._load()
+                if self._entries:
+                    self._save()
+                return
+            self.fingerprint = fingerprint
+            self._entries.clear()
+            self._save()
+        print("🔄 Schema changed, SQL plan cache cleared.")
+
+    def _valid(self, entry: dict) -> bool:
+        valid_on = entry.get("valid_on")
+        return valid_on is None or valid_on == date.today().isoformat()
+
+    def lookup(self, question: str) -> Optional[tuple[str, str]]:
+        """(SQL, SQL without the validator's default LIMIT) for a stored question."""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._valid(entry):
+                self._entries.move_to_end(key)
+                entry["hits"] += 1
+                self.stats["exact_hits"] += 1
+                return entry["sql"], entry.get("export_sql") or entry["sql"]
+
+        if self.embed:
+            try:
+                vector = self.embed(question)
+            except Exception as e:
+                print(f"⚠️ Plan cache embedding failed: {e}")
+                vector = None
+            if vector:
+                with self._lock:
+                    best_score, best_key, best = 0.0, None, None
+                    for key, entry in self._entries.items():
+                        if entry.get("embedding") and self._valid(entry):
+                            score = _cosine(vector, entry["embedding"])
+                            if score > best_score:
+                                best_score, best_key, best = score, key, entry
+                    if best and best_score >= self.similarity:
+                        self._entries.move_to_end(best_key)
+                        best["hits"] += 1
+                        self.stats["similar_hits"] += 1
+                        print(f"🎯 Similar cached question ({best_score:.3f}): {best['question']}")
+                        return best["sql"], best.get("export_sql") or best["sql"]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def store(self, question: str, sql: str, export_sql: Optional[str] = None) -> None:
+        key = normalize_question(question)
+        embedding = None
+        if self.embed:
+            try:
+                embedding = self.embed(question)
+            except Exception as e:
+                print(f"⚠️ Plan cache embedding failed: {e}")
+        valid_on = date.today().isoformat() if TIME_RELATIVE_PATTERN.search(key) else None
+        with self._lock:
+            self._entries.pop(key, None)  # re-insert as the most recent
+            self._entries[key] = {
+                "question": question,
+                "sql": sql,
+                "export_sql": export_sql if export_sql and export_sql != sql else None,
+                "embedding": embedding,
+                "valid_on": valid_on,
+                "hits": 0,
+            }
+            self.stats["stores"] += 1
+            self._evict()
+            self._save()
+
+    def invalidate_sql(self, sql: str) -> None:
+        """Drop every entry that produced `sql` (it just failed against the DB)."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry["sql"] == sql]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._save()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+
+plan_cache = PlanCache(
+    fingerprint=None,  # set on the first lookup, not at import
+    path=PLAN_CACHE_PATH or None,
+    similarity=PLAN_CACHE_SIMILARITY,
+    embed=embed_question,
+)
@@ -0,0 +1,223 @@
+# query_log.py
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Optional
+
+from config import QUERY_LOG_PATH, FEW_SHOT_K, FEW_SHOT_MIN_SIMILARITY, FEW_SHOT_INDEX_MAX
+from .shared import embed_question
+from .plan_cache import normalize_question, _cosine, TIME_RELATIVE_PATTERN
+
+
+def _valid_on(key: str, logged_on: date) -> Optional[str]:
+    # SQL for "today" / "this month" has that day's dates baked in
+    return logged_on.isoformat() if TIME_RELATIVE_PATTERN.search(key) else None
+
+
+class QueryLog:
+    """Every successfully executed question → SQL pair, with latency and cost.
+
+    Rows are appended to a SQLite file (or kept in memory when `path` is
+    empty). The latest pair per normalized question is also held in an
+    in-memory vector index, which serves the nearest pairs as few-shot
+    examples for SQL generation. Only pairs logged under the current schema
+    fingerprint are used as examples, and pairs for time-relative questions
+    ("sales today") only on the day they were logged, as in the plan cache.
+    Writes (and the embedding call) run on a background thread so answering
+    never waits for them.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        embed: Optional[Callable[[str], list[float]]] = None,
+        max_index: int = FEW_SHOT_INDEX_MAX,
+    ):
+        self.path = path or ":memory:"
+        self.embed = embed or embed_question
+        self.max_index = max_index
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._index: dict[str, dict] = {}  # normalized question → latest pair
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-log")
+        self.stats = {"logged": 0, "retrievals": 0, "examples_served": 0}
+        self._init_store()
+
+    # ── Persistent backend ──────────────────────────────────────────
+    def _init_store(self) -> None:
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    logged_at REAL NOT NULL,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    latency_ms REAL NOT NULL,
+                    exec_ms REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    llm_calls INTEGER NOT NULL,
+                    examples INTEGER NOT NULL,
+                    embedding TEXT
+                )
+                """
+            )
+            rows = self._conn.execute(
+                """
+                SELECT question, sql, fingerprint, embedding, logged_at FROM query_log
+                WHERE embedding IS NOT NULL ORDER BY id DESC LIMIT ?
+                """,
+                (self.max_index,),
+            ).fetchall()
+        for question, sql, fingerprint, embedding, logged_at in reversed(rows):
+            key = normalize_question(question)
+            self._index[key] = {
+                "question": question,
+                "sql": sql,
+                "fingerprint": fingerprint,
+                "embedding": json.loads(embedding),
+                "valid_on": _valid_on(key, date.fromtimestamp(logged_at)),
+            }
+        if rows:
+            print(f"🗃️ Loaded {len(self._index)} logged SQL examples")
+
+    # ── Log API ─────────────────────────────────────────────────────
+    def log(
+        self,
+        question: str,
+        sql: str,
+        *,
+        source: str,
+        fingerprint: str,
+        latency_ms: float,
+        exec_ms: float,
+        attempts: int,
+        llm_calls: int,
+        examples: int,
+        usable: bool = True,
+    ) -> None:
+        """Record one answered question in the background; `usable=False` keeps it out of
+        the example index (e.g. template SQL with bind parameters)."""
+        self._writer.submit(
+            self._write, time.time(), question, sql, source, fingerprint, latency_ms, exec_ms,
+            attempts, llm_calls, examples, usable,
+        )
+
+    def _write(
+        self, logged_at, question, sql, source, fingerprint, latency_ms, exec_ms, attempts, llm_calls, examples, usable
+    ) -> None:
+        embedding = None
+        if usable:
+            try:
+                embedding = self.embed(question)
+            except Exception as e:
+                print(f"⚠️ Query log embedding failed: {e}")
+
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        """
+                        INSERT INTO query_log (logged_at, question, sql, source, fingerprint,
+                            latency_ms, exec_ms, attempts, llm_calls, examples, embedding)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            logged_at, question, sql, source, fingerprint, latency_ms,
+                            exec_ms, attempts, llm_calls, examples,
+                            json.dumps(embedding) if embedding else None,
+                        ),
+                    )
+            except sqlite3.Error as e:
+                print(f"⚠️ Query log write failed: {e}")
+            self.stats["logged"] += 1
+
+            if embedding:
+                key = normalize_question(question)
+                self._index.pop(key, None)  # re-insert as the newest
+                self._index[key] = {
+                    "question": question,
+                    "sql": sql,
+                    "fingerprint": fingerprint,
+                    "embedding": embedding,
+                    "valid_on": _valid_on(key, date.today()),
+                }
+                while len(self._index) > self.max_index:
+                    self._index.pop(next(iter(self._index)))
+
+    def examples_for(
+        self,
+        question: str,
+        fingerprint: str,
+        k: int = FEW_SHOT_K,
+        min_similarity: float = FEW_SHOT_MIN_SIMILARITY,
+    ) -> list[dict]:
+        """Up to `k` logged pairs closest to `question`, most similar first."""
+        if k <= 0:
+            return []
+        today = date.today().isoformat()
+        with self._lock:
+            candidates = [
+                e for e in self._index.values()
+                if e["fingerprint"] == fingerprint and e["valid_on"] in (None, today)
+            ]
+        if not candidates:
+            return []
+        try:
+            vector = self.embed(question)
+        except Exception as e:
+            print(f"⚠️ Query log embedding failed: {e}")
+            return []
+
+        scored = sorted(
+            ((_cosine(vector, e["embedding"]), e) for e in candidates),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        examples = [
+            {"question": e["question"], "sql": e["sql"], "similarity": round(score, 3)}
+            for score, e in scored[:k]
+            if score >= min_similarity
+        ]
+        with self._lock:
+            self.stats["retrievals"] += 1
+            self.stats["examples_served"] += len(examples)
+        return examples
+
+    def get_stats(self) -> dict:
+        """Counters plus mean attempts / LLM calls / latency per answered question,
+        split by whether SQL generation got few-shot examples."""
+        with self._lock:
+            stats = {**self.stats, "indexed": len(self._index)}
+            try:
+                rows = self._conn.execute(
+                    """
+                    SELECT examples > 0, COUNT(*), AVG(attempts), AVG(llm_calls), AVG(latency_ms)
+                    FROM query_log WHERE source = 'llm' GROUP BY examples > 0
+                    """
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"⚠️ Query log read failed: {e}")
+                rows = []
+        for with_examples, answered, attempts, llm_calls, latency in rows:
+            stats["few_shot" if with_examples else "zero_shot"] = {
+                "answered": answered,
+                "mean_attempts": round(attempts, 2),
+                "mean_llm_calls": round(llm_calls, 2),
+                "mean_latency_ms": round(latency),
+            }
+        return stats
+
+
+def format_examples(examples: list[dict]) -> str:
+    if not examples:
+        return "None"
+    return "\n\n".join(f"Question: {e['question']}\nSQL: {e['sql']}" for e in examples)
+
+
+query_log = QueryLog(path=QUERY_LOG_PATH or None)
@@ -0,0 +1,293 @@
+# result_cache.py
+# Install / update the version triggers: python -m agents.sql_agent.result_cache
+import json
+import hashlib
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import (
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_VOLATILE_TTL_SECONDS,
+)
+from .shared import _db
+
+NOTIFY_CHANNEL = "table_versions"
+
+# One counter per table, bumped once per writing statement (TRUNCATE included)
+# and announced with NOTIFY, which Postgres only delivers on commit.
+VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name text PRIMARY KEY,
+    version bigint NOT NULL DEFAULT 0,
+    changed_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_versions AS v (table_name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = v.version + 1, changed_at = now();
+    PERFORM pg_notify('table_versions', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE t text;
+BEGIN
+    FOR t IN
+        SELECT relname FROM pg_class
+        WHERE relnamespace = 'public'::regnamespace AND relkind IN ('r', 'p')
+          AND NOT relispartition AND relname <> 'table_versions'
+    LOOP
+        EXECUTE 'DROP TRIGGER IF EXISTS version_bump ON ' || quote_ident(t);
+        EXECUTE 'CREATE TRIGGER version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON '
+            || quote_ident(t) || ' FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()';
+        INSERT INTO table_versions (table_name) VALUES (t) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
+"""
+
+# Results depend on the clock: cached for RESULT_CACHE_VOLATILE_TTL_SECONDS only
+TIME_FUNCTIONS = tuple(
+    cls
+    for cls in (
+        getattr(exp, name, None)
+        for name in ("CurrentDate", "CurrentTime", "CurrentTimestamp", "CurrentDatetime", "Localtime", "Localtimestamp")
+    )
+    if cls
+)
+TIME_FUNCTION_NAMES = {"now", "clock_timestamp", "statement_timestamp", "transaction_timestamp", "timeofday"}
+# Results differ on every run: never cached
+RANDOM_FUNCTION_NAMES = {"random", "gen_random_uuid", "uuid_generate_v4", "nextval", "setseed"}
+
+
+def analyze_sql(sql: str) -> Optional[tuple[str, set[str], bool]]:
+    """(normalized SQL, tables read, time dependent), or None if it must not be cached."""
+    try:
+        tree = sqlglot.parse_one(sql, read="postgres")
+    except SqlglotError:
+        return None
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    tables = {
+        t.name.lower()
+        for t in tree.find_all(exp.Table)
+        if isinstance(t.this, exp.Identifier) and t.name.lower() not in ctes
+    }
+
+    volatile = False
+    for func in tree.find_all(exp.Func):
+        name = func.name.lower() if isinstance(func, exp.Anonymous) else ""
+        if isinstance(func, exp.Rand) or name in RANDOM_FUNCTION_NAMES:
+            return None
+        if isinstance(func, TIME_FUNCTIONS) or name in TIME_FUNCTION_NAMES:
+            volatile = True
+    return tree.sql(dialect="postgres"), tables, volatile
+
+
+class ResultCache:
+    """Query results keyed by normalized SQL + params, invalidated by table versions.
+
+    Every entry remembers the version of each table it read. A background
+    thread LISTENs for the NOTIFY sent by the version triggers and bumps the
+    local copy of the versions, so checking an entry never touches the
+    database. Only queries whose tables are all versioned are cached; while
+    the listener is down nothing is served (and the cache is cleared on
+    reconnect, since notifications may have been missed).
+    """
+
+    def __init__(
+        self,
+        engine,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl: float = RESULT_CACHE_TTL_SECONDS,
+        volatile_ttl: float = RESULT_CACHE_VOLATILE_TTL_SECONDS,
+    ):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.volatile_ttl = volatile_ttl
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._listening = False
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "uncacheable": 0, "stores": 0, "notifications": 0}
+
+    # ── Version listener ────────────────────────────────────────────
+    def start(self) -> None:
+        with self._lock:
+            if self._listener and self._listener.is_alive():
+                return
+            if self.engine.dialect.name != "postgresql":
+                return
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen, daemon=True, name="result-cache-listener")
+            self._listener.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener:
+            self._listener.join(timeout=10)
+
+    def restart(self) -> None:
+        """Reconnect a running listener (e.g. after more tables got versioned)."""
+        if self._listener and self._listener.is_alive():
+            self.stop()
+            self.start()
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = self.engine.raw_connection()
+                conn = raw.driver_connection
+                raw.detach()  # a long-lived session, not a pooled connection
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    cur.execute("SELECT to_regclass('table_versions') IS NOT NULL")
+                    installed = cur.fetchone()[0]
+                    if installed:
+                        cur.execute("SELECT table_name, version FROM table_versions")
+                        versions = dict(cur.fetchall())
+                if not installed:
+                    print("ℹ️ table_versions not installed, SQL result cache disabled")
+                    self._stop.wait(60)  # check again later
+                    continue
+                with self._lock:
+                    # Writes may have gone unnoticed while we were not listening
+                    self._entries.clear()
+                    self._versions = versions
+                    self._listening = True
+                print(f"👂 SQL result cache listening for changes on {len(versions)} tables")
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    changed = [n.payload for n in conn.notifies]
+                    conn.notifies.clear()
+                    with self._lock:
+                        for table in changed:
+                            self._versions[table] = self._versions.get(table, 0) + 1
+                        self.stats["notifications"] += len(changed)
+            except Exception as e:
+                print(f"⚠️ SQL result cache listener failed, retrying: {e}")
+            finally:
+                with self._lock:
+                    self._listening = False
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+            self._stop.wait(5)
+
+    # ── Cache API ───────────────────────────────────────────────────
+    def lookup(self, sql: str, params: Optional[dict] = None) -> tuple[Optional[Any], Optional[dict]]:
+        """(cached value or None, ticket for `store()`; None when the query can't be cached)."""
+        self.start()
+        analyzed = analyze_sql(sql)
+        with self._lock:
+            if (
+                analyzed is None
+                or not self._listening
+                or not analyzed[1]
+                or not analyzed[1] <= self._versions.keys()
+            ):
+                self.stats["uncacheable"] += 1
+                return None, None
+            normalized, tables, volatile = analyzed
+            key = hashlib.sha256(
+                (normalized + json.dumps(params or {}, sort_keys=True, default=str)).encode()
+            ).hexdigest()
+            versions = {table: self._versions[table] for table in tables}
+            ticket = {
+                "key": key,
+                "versions": versions,
+                "ttl": self.volatile_ttl if volatile else self.ttl,
+            }
+
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, ticket
+            if entry["versions"] != versions or time.time() > entry["expires_at"]:
+                del self._entries[key]
+                self.stats["stale"] += 1
+                return None, ticket
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry["value"], None
+
+    def store(self, ticket: Optional[dict], value: Any) -> None:
+        """Cache `value` under the table versions seen by `lookup()` (before the query ran)."""
+        if ticket is None or ticket["ttl"] <= 0:
+            return
+        with self._lock:
+            if not self._listening:
+                return
+            self._entries[ticket["key"]] = {
+                "value": value,
+                "versions": ticket["versions"],
+                "expires_at": time.time() + ticket["ttl"],
+            }
+            self._entries.move_to_end(ticket["key"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats["stores"] += 1
+
+    def table_versions(self, tables) -> Optional[dict[str, int]]:
+        """Current versions of `tables`, or None while changes can't be tracked."""
+        self.start()
+        with self._lock:
+            if not self._listening:
+                return None
+            return {table: self._versions.get(table, -1) for table in tables}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "listening": self._listening,
+                "tables": len(self._versions),
+            }
+
+
+result_cache = ResultCache(_db._engine) if RESULT_CACHE_ENABLED else None
+
+
+def install_table_versions(engine=None) -> None:
+    """Create table_versions and (re)attach the version trigger to every table."""
+    with (engine or _db._engine).begin() as conn:
+        conn.exec_driver_sql(VERSION_DDL)
+        count = conn.execute(text("SELECT COUNT(*) FROM table_versions")).scalar()
+    if result_cache:
+        result_cache.restart()  # pick up newly versioned tables
+    print(f"✅ Table version triggers installed on {count} tables")
+
+
+if __name__ == "__main__":
+    try:
+        install_table_versions()
+    except SQLAlchemyError as e:
+        print(f"❌ Could not install table versions: {e}")
+    _db._engine.dispose()
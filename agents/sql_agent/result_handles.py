@@ -0,0 +1,247 @@
+# result_handles.py
+import base64
+import csv
+import datetime as dt
+import io
+import json
+import math
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+
+from config import (
+    RESULT_HANDLE_TTL_SECONDS,
+    RESULT_HANDLE_MAX,
+    RESULT_PAGE_SIZE,
+    RESULT_PAGE_MAX,
+)
+from .analytics import _arrow_type
+from .executor import check_plan, guarded_connection, stream_select, unique_columns
+
+
+@dataclass
+class ResultHandle:
+    """An executed query kept server-side so its full result can be re-read without the LLM."""
+
+    handle_id: str
+    sql: str
+    params: dict = field(default_factory=dict)
+    columns: list[str] = field(default_factory=list)
+    question: str = ""
+    created_at: float = field(default_factory=time.time)
+
+
+class ResultHandleStore:
+    """In-memory handle → query, expired after `ttl` seconds, oldest evicted past `max_entries`."""
+
+    def __init__(self, ttl: float = RESULT_HANDLE_TTL_SECONDS, max_entries: int = RESULT_HANDLE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._handles: OrderedDict[str, ResultHandle] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"registered": 0, "pages": 0, "exports": 0, "expired": 0}
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        while self._handles:
+            handle = next(iter(self._handles.values()))
+            if handle.created_at >= cutoff and len(self._handles) <= self.max_entries:
+                break
+            self._handles.popitem(last=False)
+            self.stats["expired"] += 1
+
+    def register(self, sql: str, params: Optional[dict], columns: list[str], question: str = "") -> str:
+        handle = ResultHandle(
+            handle_id=secrets.token_urlsafe(12),
+            sql=sql.strip().rstrip(";"),
+            params=dict(params or {}),
+            columns=list(columns),
+            question=question,
+        )
+        with self._lock:
+            self._handles[handle.handle_id] = handle
+            self.stats["registered"] += 1
+            self._expire()
+        return handle.handle_id
+
+    def get(self, handle_id: str) -> Optional[ResultHandle]:
+        with self._lock:
+            self._expire()
+            return self._handles.get(handle_id)
+
+    def count(self, kind: str) -> None:
+        with self._lock:
+            self.stats[kind] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "handles": len(self._handles)}
+
+
+result_handles = ResultHandleStore()
+
+
+# ── Keyset pagination ───────────────────────────────────────────────
+# The query is wrapped as a derived table with positional column names
+# (c0, c1, ...), ordered by all of its columns, and each page continues
+# after the last row of the previous one. Rows that are exact duplicates of
+# that last row are skipped by count, so duplicates are neither lost nor
+# repeated. Pages therefore come in key order, not the query's own ORDER BY
+# (the CSV/Arrow exports keep that). The cursor is opaque to clients: base64
+# JSON of the last row's values, type-tagged so dates and decimals bind back
+# with their types.
+
+
+def _encode_value(value) -> list:
+    if isinstance(value, dt.datetime):
+        return ["datetime", value.isoformat()]
+    if isinstance(value, dt.date):
+        return ["date", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["decimal", str(value)]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return ["raw", value]
+    return ["str", str(value)]
+
+
+def _decode_value(tagged: list):
+    kind, value = tagged
+    if kind == "datetime":
+        return dt.datetime.fromisoformat(value)
+    if kind == "date":
+        return dt.date.fromisoformat(value)
+    if kind == "decimal":
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(last_row: tuple, duplicates: int) -> str:
+    payload = json.dumps({"after": [_encode_value(v) for v in last_row], "dups": duplicates})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[tuple, int]:
+    """Raises ValueError for a cursor this module did not produce."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return tuple(_decode_value(v) for v in payload["after"]), int(payload["dups"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def _page_sql(sql: str, width: int, after: Optional[tuple]) -> str:
+    names = [f"c{i}" for i in range(width)]
+    query = f"SELECT * FROM ({sql}) AS r({', '.join(names)})"
+    if after is not None:
+        # Rows equal to `after` or sorting after it (ascending, NULLS LAST)
+        terms = [" AND ".join(f"{n} IS NOT DISTINCT FROM :_k{i}" for i, n in enumerate(names))]
+        for i, name in enumerate(names):
+            if after[i] is None:
+                continue  # nothing sorts after NULL in this column
+            equal = [f"{names[j]} IS NOT DISTINCT FROM :_k{j}" for j in range(i)]
+            terms.append(" AND ".join(equal + [f"({name} > :_k{i} OR {name} IS NULL)"]))
+        query += " WHERE " + " OR ".join(f"({t})" for t in terms)
+    return query + f" ORDER BY {', '.join(names)} LIMIT :_limit"
+
+
+def fetch_page(handle: ResultHandle, cursor: Optional[str] = None, page_size: int = RESULT_PAGE_SIZE) -> dict:
+    """One page of the handle's result and the cursor for the next one (None on the last page).
+
+    Raises QueryRejected when the planner estimate is over the cost limit.
+    """
+    page_size = max(1, min(page_size, RESULT_PAGE_MAX))
+    after, duplicates = decode_cursor(cursor) if cursor else (None, 0)
+    width = len(handle.columns)
+    if after is not None and len(after) != width:
+        raise ValueError("Invalid cursor: it does not belong to this result")
+
+    params = dict(handle.params)
+    params["_limit"] = page_size + duplicates
+    if after is not None:
+        params.update({f"_k{i}": value for i, value in enumerate(after)})
+
+    page_sql = _page_sql(handle.sql, width, after)
+    with guarded_connection() as conn:
+        if conn.dialect.name == "postgresql":
+            # The handle holds the unlimited query; sorting all of it for a page
+            # gets the same cost check as the answer itself (rows are capped by LIMIT)
+            check_plan(conn, page_sql, params, max_rows=math.inf)
+        rows = [tuple(row) for row in conn.execute(text(page_sql), params)]
+    more = len(rows) == page_size + duplicates
+    rows = rows[duplicates:]
+    result_handles.count("pages")
+
+    next_cursor = None
+    if more and rows:
+        last = rows[-1]
+        run = 0
+        for row in reversed(rows):
+            if row != last:
+                break
+            run += 1
+        if last == after:
+            run += duplicates  # the whole page continued the previous run of duplicates
+        next_cursor = encode_cursor(last, run)
+
+    return {
+        "columns": handle.columns,
+        "rows": [dict(zip(handle.columns, row)) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+# ── Streaming exports ───────────────────────────────────────────────
+def stream_csv(handle: ResultHandle) -> Iterator[str]:
+    """The full result as CSV text, one chunk per fetched batch."""
+    result_handles.count("exports")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, batch in stream_select(handle.sql, handle.params):
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def stream_arrow(handle: ResultHandle) -> Iterator[bytes]:
+    """The full result as an Arrow IPC stream, one record batch per fetched batch.
+
+    The schema is fixed up front from the result's PostgreSQL column types,
+    mapped as for analytics snapshots: unconstrained numerics become
+    float64 and anything unrecognised becomes string.
+    """
+    import pyarrow as pa
+
+    result_handles.count("exports")
+    sink = io.BytesIO()
+    writer, schema, pg_types = None, None, []
+    for columns, batch in stream_select(handle.sql, handle.params, on_types=pg_types.extend):
+        values = [list(column) for column in zip(*batch)] or [[] for _ in columns]
+        if schema is None:
+            types = [_arrow_type(pg_type) for pg_type in pg_types] or [pa.string()] * len(columns)
+            schema = pa.schema(list(zip(unique_columns(columns), types)))
+            writer = pa.ipc.new_stream(sink, schema)
+        arrays = []
+        for column, type_ in zip(values, schema.types):
+            if pa.types.is_floating(type_):
+                column = [None if v is None else float(v) for v in column]
+            elif pa.types.is_string(type_):
+                column = [None if v is None else str(v) for v in column]
+            arrays.append(pa.array(column, type=type_))
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
@@ -0,0 +1,318 @@
+# rollups.py
+# Install / rebuild: python -m agents.sql_agent.rollups [--rebuild]
+import sys
+
+from sqlalchemy import inspect
+
+from .shared import _db
+from .catalog import catalog_service
+
+ROLLUP_TABLES = (
+    "daily_product_sales",
+    "monthly_pnl",
+    "customer_outstanding_credit",
+    "vendor_outstanding_credit",
+)
+
+# Rollup tables, the indexes their maintenance relies on, and row triggers that
+# apply each insert/update/delete on the base tables as a delta. Credit rollups
+# are recomputed for the one customer/vendor touched, from open udhar rows only.
+ROLLUP_DDL = """
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    sale_date date NOT NULL,
+    prod_id integer NOT NULL REFERENCES products (product_id),
+    sales_count integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, prod_id)
+);
+
+CREATE TABLE IF NOT EXISTS monthly_pnl (
+    month date PRIMARY KEY,
+    sales_count integer NOT NULL DEFAULT 0,
+    revenue numeric(14, 2) NOT NULL DEFAULT 0,
+    profit_amount numeric(14, 2) NOT NULL DEFAULT 0,
+    loss_amount numeric(14, 2) NOT NULL DEFAULT 0,
+    net_profit numeric(14, 2) GENERATED ALWAYS AS (profit_amount + loss_amount) STORED,
+    purchase_count integer NOT NULL DEFAULT 0,
+    purchase_amount numeric(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS customer_outstanding_credit (
+    customer_id integer PRIMARY KEY REFERENCES customers (cust_id),
+    unpaid_sales integer NOT NULL,
+    outstanding_amount numeric(14, 2) NOT NULL,
+    oldest_entry date
+);
+
+CREATE TABLE IF NOT EXISTS vendor_outstanding_credit (
+    vendor_id integer PRIMARY KEY REFERENCES vendors (vend_id),
+    unpaid_purchases integer NOT NULL,
+    outstanding_amount numeric(14, 2) NOT NULL,
+    oldest_entry date
+);
+
+CREATE INDEX IF NOT EXISTS ix_sales_data_customer_id ON sales_data (customer_id);
+CREATE INDEX IF NOT EXISTS ix_purchase_data_vendor_id ON purchase_data (vendor_id);
+CREATE INDEX IF NOT EXISTS ix_udhar_sales_open ON udhar_sales (sales_id) WHERE date_of_payment IS NULL;
+CREATE INDEX IF NOT EXISTS ix_udhar_purchase_open ON udhar_purchase (purch_id) WHERE date_of_payment IS NULL;
+
+CREATE OR REPLACE FUNCTION rollup_bump_product_day(p_day date, p_prod_id integer, p_delta integer)
+RETURNS void AS $$
+    INSERT INTO daily_product_sales AS d (sale_date, prod_id, sales_count)
+    SELECT p_day, p_prod_id, p_delta
+    WHERE p_day IS NOT NULL
+    ON CONFLICT (sale_date, prod_id) DO UPDATE
+        SET sales_count = d.sales_count + EXCLUDED.sales_count;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rollup_bump_month(
+    p_day date, p_sales integer, p_revenue numeric, p_profit numeric, p_loss numeric,
+    p_purchases integer, p_purchase_amount numeric
+) RETURNS void AS $$
+    INSERT INTO monthly_pnl AS m
+        (month, sales_count, revenue, profit_amount, loss_amount, purchase_count, purchase_amount)
+    SELECT date_trunc('month', p_day)::date, p_sales, p_revenue, p_profit, p_loss,
+           p_purchases, p_purchase_amount
+    WHERE p_day IS NOT NULL
+    ON CONFLICT (month) DO UPDATE SET
+        sales_count = m.sales_count + EXCLUDED.sales_count,
+        revenue = m.revenue + EXCLUDED.revenue,
+        profit_amount = m.profit_amount + EXCLUDED.profit_amount,
+        loss_amount = m.loss_amount + EXCLUDED.loss_amount,
+        purchase_count = m.purchase_count + EXCLUDED.purchase_count,
+        purchase_amount = m.purchase_amount + EXCLUDED.purchase_amount;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rollup_refresh_customer_credit(p_customer_id integer)
+RETURNS void AS $$
+    DELETE FROM customer_outstanding_credit WHERE customer_id = p_customer_id;
+    INSERT INTO customer_outstanding_credit (customer_id, unpaid_sales, outstanding_amount, oldest_entry)
+    SELECT s.customer_id, COUNT(*), SUM(s.total_amount::numeric), MIN(u.date_of_entry)
+    FROM udhar_sales u
+    JOIN sales_data s ON s.sales_id = u.sales_id
+    WHERE u.date_of_payment IS NULL AND s.customer_id = p_customer_id
+    GROUP BY s.customer_id;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rollup_refresh_vendor_credit(p_vendor_id integer)
+RETURNS void AS $$
+    DELETE FROM vendor_outstanding_credit WHERE vendor_id = p_vendor_id;
+    INSERT INTO vendor_outstanding_credit (vendor_id, unpaid_purchases, outstanding_amount, oldest_entry)
+    SELECT p.vendor_id, COUNT(*), SUM(p.total_amount::numeric), MIN(u.date_of_entry)
+    FROM udhar_purchase u
+    JOIN purchase_data p ON p.purch_id = u.purch_id
+    WHERE u.date_of_payment IS NULL AND p.vendor_id = p_vendor_id
+    GROUP BY p.vendor_id;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rollup_sale_product() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM rollup_bump_product_day(s.transaction_date, OLD.prod_id, -1)
+        FROM sales_data s WHERE s.sales_id = OLD.sales_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM rollup_bump_product_day(s.transaction_date, NEW.prod_id, 1)
+        FROM sales_data s WHERE s.sales_id = NEW.sales_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_profit_loss() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM rollup_bump_month(
+            s.transaction_date, 0, 0,
+            CASE WHEN OLD.is_profit THEN -OLD.amount::numeric ELSE 0 END,
+            CASE WHEN OLD.is_profit THEN 0 ELSE -OLD.amount::numeric END, 0, 0)
+        FROM sales_data s WHERE s.sales_id = OLD.sales_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM rollup_bump_month(
+            s.transaction_date, 0, 0,
+            CASE WHEN NEW.is_profit THEN NEW.amount::numeric ELSE 0 END,
+            CASE WHEN NEW.is_profit THEN 0 ELSE NEW.amount::numeric END, 0, 0)
+        FROM sales_data s WHERE s.sales_id = NEW.sales_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_sales_data() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM rollup_bump_month(OLD.transaction_date, -1, -OLD.total_amount::numeric, 0, 0, 0, 0);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM rollup_bump_month(NEW.transaction_date, 1, NEW.total_amount::numeric, 0, 0, 0, 0);
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        IF NEW.transaction_date IS DISTINCT FROM OLD.transaction_date THEN
+            -- move this sale's product counts and profit/loss to the new date
+            PERFORM rollup_bump_product_day(OLD.transaction_date, sp.prod_id, -1),
+                    rollup_bump_product_day(NEW.transaction_date, sp.prod_id, 1)
+            FROM sale_product sp WHERE sp.sales_id = NEW.sales_id;
+
+            PERFORM rollup_bump_month(OLD.transaction_date, 0, 0,
+                        CASE WHEN pl.is_profit THEN -pl.amount::numeric ELSE 0 END,
+                        CASE WHEN pl.is_profit THEN 0 ELSE -pl.amount::numeric END, 0, 0),
+                    rollup_bump_month(NEW.transaction_date, 0, 0,
+                        CASE WHEN pl.is_profit THEN pl.amount::numeric ELSE 0 END,
+                        CASE WHEN pl.is_profit THEN 0 ELSE pl.amount::numeric END, 0, 0)
+            FROM profit_loss pl WHERE pl.sales_id = NEW.sales_id;
+        END IF;
+
+        IF NEW.customer_id IS DISTINCT FROM OLD.customer_id
+           OR NEW.total_amount IS DISTINCT FROM OLD.total_amount THEN
+            PERFORM rollup_refresh_customer_credit(OLD.customer_id);
+            PERFORM rollup_refresh_customer_credit(NEW.customer_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_purchase_data() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM rollup_bump_month(OLD.transaction_date, 0, 0, 0, 0, -1, -OLD.total_amount::numeric);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM rollup_bump_month(NEW.transaction_date, 0, 0, 0, 0, 1, NEW.total_amount::numeric);
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND (NEW.vendor_id IS DISTINCT FROM OLD.vendor_id
+                             OR NEW.total_amount IS DISTINCT FROM OLD.total_amount) THEN
+        PERFORM rollup_refresh_vendor_credit(OLD.vendor_id);
+        PERFORM rollup_refresh_vendor_credit(NEW.vendor_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_udhar_sales() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM rollup_refresh_customer_credit(s.customer_id)
+        FROM sales_data s WHERE s.sales_id = OLD.sales_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM rollup_refresh_customer_credit(s.customer_id)
+        FROM sales_data s WHERE s.sales_id = NEW.sales_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_udhar_purchase() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM rollup_refresh_vendor_credit(p.vendor_id)
+        FROM purchase_data p WHERE p.purch_id = OLD.purch_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM rollup_refresh_vendor_credit(p.vendor_id)
+        FROM purchase_data p WHERE p.purch_id = NEW.purch_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS rollup_sync ON sale_product;
+CREATE TRIGGER rollup_sync AFTER INSERT OR UPDATE OR DELETE ON sale_product
+    FOR EACH ROW EXECUTE FUNCTION rollup_sale_product();
+DROP TRIGGER IF EXISTS rollup_sync ON profit_loss;
+CREATE TRIGGER rollup_sync AFTER INSERT OR UPDATE OR DELETE ON profit_loss
+    FOR EACH ROW EXECUTE FUNCTION rollup_profit_loss();
+DROP TRIGGER IF EXISTS rollup_sync ON sales_data;
+CREATE TRIGGER rollup_sync AFTER INSERT OR UPDATE OR DELETE ON sales_data
+    FOR EACH ROW EXECUTE FUNCTION rollup_sales_data();
+DROP TRIGGER IF EXISTS rollup_sync ON purchase_data;
+CREATE TRIGGER rollup_sync AFTER INSERT OR UPDATE OR DELETE ON purchase_data
+    FOR EACH ROW EXECUTE FUNCTION rollup_purchase_data();
+DROP TRIGGER IF EXISTS rollup_sync ON udhar_sales;
+CREATE TRIGGER rollup_sync AFTER INSERT OR UPDATE OR DELETE ON udhar_sales
+    FOR EACH ROW EXECUTE FUNCTION rollup_udhar_sales();
+DROP TRIGGER IF EXISTS rollup_sync ON udhar_purchase;
+CREATE TRIGGER rollup_sync AFTER INSERT OR UPDATE OR DELETE ON udhar_purchase
+    FOR EACH ROW EXECUTE FUNCTION rollup_udhar_purchase();
+"""
+
+# Full recompute from the base tables (first install, or after a bulk load
+# that ran with triggers disabled / TRUNCATE, which row triggers don't see).
+REBUILD_SQL = """
+TRUNCATE daily_product_sales, monthly_pnl, customer_outstanding_credit, vendor_outstanding_credit;
+
+INSERT INTO daily_product_sales (sale_date, prod_id, sales_count)
+SELECT s.transaction_date, sp.prod_id, COUNT(*)
+FROM sale_product sp
+JOIN sales_data s ON s.sales_id = sp.sales_id
+WHERE s.transaction_date IS NOT NULL
+GROUP BY s.transaction_date, sp.prod_id;
+
+INSERT INTO monthly_pnl
+    (month, sales_count, revenue, profit_amount, loss_amount, purchase_count, purchase_amount)
+SELECT month, SUM(sales_count), SUM(revenue), SUM(profit_amount), SUM(loss_amount),
+       SUM(purchase_count), SUM(purchase_amount)
+FROM (
+    SELECT date_trunc('month', transaction_date)::date AS month, COUNT(*) AS sales_count,
+           SUM(total_amount::numeric) AS revenue, 0 AS profit_amount, 0 AS loss_amount,
+           0 AS purchase_count, 0 AS purchase_amount
+    FROM sales_data WHERE transaction_date IS NOT NULL
+    GROUP BY 1
+    UNION ALL
+    SELECT date_trunc('month', s.transaction_date)::date, 0, 0,
+           COALESCE(SUM(pl.amount::numeric) FILTER (WHERE pl.is_profit), 0),
+           COALESCE(SUM(pl.amount::numeric) FILTER (WHERE NOT pl.is_profit), 0), 0, 0
+    FROM profit_loss pl JOIN sales_data s ON s.sales_id = pl.sales_id
+    WHERE s.transaction_date IS NOT NULL
+    GROUP BY 1
+    UNION ALL
+    SELECT date_trunc('month', transaction_date)::date, 0, 0, 0, 0,
+           COUNT(*), SUM(total_amount::numeric)
+    FROM purchase_data WHERE transaction_date IS NOT NULL
+    GROUP BY 1
+) parts
+GROUP BY month;
+
+INSERT INTO customer_outstanding_credit (customer_id, unpaid_sales, outstanding_amount, oldest_entry)
+SELECT s.customer_id, COUNT(*), SUM(s.total_amount::numeric), MIN(u.date_of_entry)
+FROM udhar_sales u JOIN sales_data s ON s.sales_id = u.sales_id
+WHERE u.date_of_payment IS NULL AND s.customer_id IS NOT NULL
+GROUP BY s.customer_id;
+
+INSERT INTO vendor_outstanding_credit (vendor_id, unpaid_purchases, outstanding_amount, oldest_entry)
+SELECT p.vendor_id, COUNT(*), SUM(p.total_amount::numeric), MIN(u.date_of_entry)
+FROM udhar_purchase u JOIN purchase_data p ON p.purch_id = u.purch_id
+WHERE u.date_of_payment IS NULL AND p.vendor_id IS NOT NULL
+GROUP BY p.vendor_id;
+"""
+
+
+def rollups_installed(engine=None) -> bool:
+    tables = set(inspect(engine or _db._engine).get_table_names())
+    return all(table in tables for table in ROLLUP_TABLES)
+
+
+def rebuild_rollups(engine=None) -> None:
+    with (engine or _db._engine).begin() as conn:
+        conn.exec_driver_sql(REBUILD_SQL)
+    print("✅ Rollups rebuilt from base tables")
+
+
+def install_rollups(engine=None) -> None:
+    """Create (or update) rollup tables and triggers, then backfill them."""
+    with (engine or _db._engine).begin() as conn:
+        conn.exec_driver_sql(ROLLUP_DDL)
+        conn.exec_driver_sql(REBUILD_SQL)
+    catalog_service.invalidate()
+    print(f"✅ Rollups installed: {', '.join(ROLLUP_TABLES)}")
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv[1:]:
+        rebuild_rollups()
+    else:
+        install_rollups()
+    _db._engine.dispose()
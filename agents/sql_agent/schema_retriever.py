@@ -0,0 +1,155 @@
+# schema_retriever.py
+import hashlib
+import math
+import threading
+from collections import deque
+from typing import Optional
+
+from config import EMBEDDING_MODEL, SCHEMA_PRUNING_ENABLED, SCHEMA_TOP_N
+from .shared import get_schema, embed_question
+from .catalog import COLUMN_NOTES, TABLE_NOTES, TableInfo, get_catalog, catalog_service
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def table_docs(table: TableInfo) -> list[str]:
+    """Texts to embed for one table: its description, then one per column.
+
+    Built from the catalog rather than the rendered schema so that row
+    estimates, which change with every ANALYZE, never force a re-embed.
+    """
+    description = TABLE_NOTES.get(table.name, "table.")
+    docs = [f"{table.name}: {description}"]
+    for column in table.columns:
+        note = COLUMN_NOTES.get(f"{table.name}.{column}")
+        text = column.replace("_", " ") + (f", {note}" if note else "")
+        docs.append(f"{text} ({table.name}: {description})")
+    return docs
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def fk_graph() -> dict[str, set[str]]:
+    """Undirected table adjacency from the catalog's foreign keys."""
+    graph: dict[str, set[str]] = {}
+    for table in get_catalog().values():
+        graph.setdefault(table.name, set())
+        for fk in table.foreign_keys:
+            graph[table.name].add(fk["ref_table"])
+            graph.setdefault(fk["ref_table"], set()).add(table.name)
+    return graph
+
+
+def _shortest_path(graph: dict[str, set[str]], sources: set[str], target: str) -> list[str]:
+    parents = {source: None for source in sources}
+    queue = deque(sources)
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = parents[node]
+            return path
+        for neighbour in graph.get(node, ()):
+            if neighbour not in parents:
+                parents[neighbour] = node
+                queue.append(neighbour)
+    return [target]
+
+
+def join_closure(tables: list[str], graph: dict[str, set[str]]) -> set[str]:
+    """Add the tables on the FK paths that connect `tables` to each other."""
+    if not tables:
+        return set()
+    tree = {tables[0]}
+    for table in tables[1:]:
+        if table not in tree:
+            tree |= set(_shortest_path(graph, tree, table))
+    return tree
+
+
+class SchemaRetriever:
+    """Embeds every table and column description once and serves per-question schema slices."""
+
+    def __init__(self, top_n: int = SCHEMA_TOP_N, embed_documents=None, embed_query=None):
+        self.top_n = top_n
+        self.embed_documents = embed_documents or EMBEDDING_MODEL.embed_documents
+        self.embed_query = embed_query or embed_question
+        self._index: dict[str, list[list[float]]] = {}
+        self._schema_hash: Optional[str] = None
+        self._lock = threading.Lock()
+        self.stats = {"questions": 0, "full_schema_tokens": 0, "pruned_schema_tokens": 0}
+
+    def _ensure_index(self, tables: dict[str, TableInfo]) -> None:
+        table_texts = {name: table_docs(table) for name, table in tables.items()}
+        schema_hash = hashlib.sha256(repr(table_texts).encode()).hexdigest()
+        with self._lock:
+            if schema_hash == self._schema_hash:
+                return
+            owners, docs = [], []
+            for table, texts in table_texts.items():
+                owners += [table] * len(texts)
+                docs += texts
+            vectors = self.embed_documents(docs)
+            index: dict[str, list[list[float]]] = {table: [] for table in tables}
+            for table, vector in zip(owners, vectors):
+                index[table].append(vector)
+            self._index, self._schema_hash = index, schema_hash
+            print(f"🧭 Indexed {len(docs)} table/column descriptions for schema retrieval")
+
+    def rank_tables(self, question: str) -> list[tuple[str, float]]:
+        self._ensure_index(get_catalog())
+        vector = self.embed_query(question)
+        scores = {
+            table: max((_cosine(vector, v) for v in vectors), default=0.0)
+            for table, vectors in self._index.items()
+        }
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def select_tables(self, question: str) -> list[str]:
+        """Top-N tables for the question plus the tables needed to join them."""
+        top = [table for table, _ in self.rank_tables(question)[: self.top_n]]
+        selected = join_closure(top, fk_graph())
+        return [table for table in self._index if table in selected]
+
+    def schema_for(self, question: str) -> str:
+        try:
+            tables = self.select_tables(question)
+            pruned = catalog_service.render(tables)
+        except Exception as e:
+            print(f"⚠️ Schema retrieval failed, sending the full schema: {e}")
+            return get_schema()
+
+        schema = get_schema()
+        with self._lock:
+            self.stats["questions"] += 1
+            self.stats["full_schema_tokens"] += estimate_tokens(schema)
+            self.stats["pruned_schema_tokens"] += estimate_tokens(pruned)
+        print(f"🧭 Schema pruned to: {', '.join(tables)}")
+        return pruned
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        if stats["full_schema_tokens"]:
+            stats["token_savings"] = round(
+                1 - stats["pruned_schema_tokens"] / stats["full_schema_tokens"], 3
+            )
+        return stats
+
+
+schema_retriever = SchemaRetriever()
+
+
+def get_schema_for(question: str) -> str:
+    """Schema text to put in a prompt about `question`."""
+    if not SCHEMA_PRUNING_ENABLED or not question:
+        return get_schema()
+    return schema_retriever.schema_for(question)
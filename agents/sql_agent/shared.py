@@ -1,69 +1,17 @@
 # shared.py
+import time
+from functools import lru_cache
+from typing import Optional
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
-from config import GLOBAL_LLM, DATABASE_URL
+from config import GLOBAL_LLM, DATABASE_URL, EMBEDDING_MODEL
 from langchain_community.utilities import SQLDatabase
+from .catalog import catalog_service
 
 
-# Shared DB schema
+# Shared DB schema, rendered from the live catalog
 def get_schema():
-    return """
-    customers: stores customer information.
-      - cust_id (Primary Key)
-      - customer_name
-      - phone_no
-
-    products: details about available products.
-      - product_id (Primary Key)
-      - product_name (Unique)
-      - price_purchase
-      - price_sale
-      - quantity
-
-    vendors: stores vendor details.
-      - vend_id (Primary Key)
-      - vendor_name
-      - phone_no
-
-    sales_data: records of customer purchases.
-      - sales_id (Primary Key)
-      - customer_id (Foreign Key → customers)
-      - transaction_date
-      - total_amount
-      - total_quantity
-
-    purchase_data: records of purchases from vendors.
-      - purch_id (Primary Key)
-      - vendor_id (Foreign Key → vendors)
-      - transaction_date
-      - total_amount
-      - total_quantity
-
-    sale_product: links sales to products (many-to-many).
-      - sales_id (Foreign Key → sales_data)
-      - prod_id (Foreign Key → products)
-
-    purchase_product: links purchases to products (many-to-many).
-      - purch_id (Foreign Key → purchase_data)
-      - prod_id (Foreign Key → products)
-
-    profit_loss: result of a sale, whether profit or loss.
-      - sales_id (Primary Key, Foreign Key → sales_data)
-      - is_profit (boolean)
-      - amount
-
-    udhar_sales: sales done on credit.
-      - udhar_id (Primary Key)
-      - sales_id (Foreign Key → sales_data)
-      - date_of_entry
-      - date_of_payment
-
-    udhar_purchase: purchases done on credit.
-      - udhar_id (Primary Key)
-      - purch_id (Foreign Key → purchase_data)
-      - date_of_entry
-      - date_of_payment
-    """
+    return catalog_service.render()
 
 
 # Agent State class
@@ -72,9 +20,54 @@ class AgentState(TypedDict):
     curr_question: str
     sql_query: str
     query_result: str
+    query_columns: list[str]
+    query_rows: list[dict]  # typed rows, capped by SQL_MAX_ROWS / SQL_MAX_BYTES
+    truncated_rows: int
+    result_summary: str  # local statistics over every returned row
+    export_sql: str  # sql_query without the validator's default LIMIT
+    result_handle: str  # id in result_handles for paging/exporting the full result
     attempts: int
     relevance: bool
     sql_error: list[str]
+    sql_params: dict  # bind parameters for template SQL
+    sql_source: str  # "llm", "plan_cache" or "template"
+    llm_calls: int
+    few_shot_examples: int  # logged examples put in the last SQL generation prompt
+    started_at: float  # time.perf_counter() when the question came in
+    speculation: dict  # speculative mode: SQL generated alongside the relevance check
+    relevance_seconds: float
+    entities: list[str]  # names in the question resolved to rows, as given to the prompt
+    approximate: Optional[bool]  # True: sample when possible, False: always exact, None: decide
+    approximation: str  # how the answer was approximated; "" for exact answers
+
+
+def new_state(question: str) -> AgentState:
+    """Initial state for one question."""
+    return {
+        "question": question,
+        "attempts": 0,
+        "curr_question": "",
+        "sql_query": "",
+        "query_result": "",
+        "query_columns": [],
+        "query_rows": [],
+        "truncated_rows": 0,
+        "result_summary": "",
+        "export_sql": "",
+        "result_handle": "",
+        "relevance": False,
+        "sql_error": [],
+        "sql_params": {},
+        "sql_source": "",
+        "llm_calls": 0,
+        "few_shot_examples": 0,
+        "started_at": time.perf_counter(),
+        "speculation": {},
+        "relevance_seconds": 0.0,
+        "entities": [],
+        "approximate": None,
+        "approximation": "",
+    }
 
 
 # Output Models
@@ -86,6 +79,13 @@ class ConvertToSQL(BaseModel):
     sql_query: str = Field(...)
 
 
+class RelevanceAndSQL(BaseModel):
+    is_relevant: bool = Field(...)
+    sql_query: str = Field(
+        "", description="PostgreSQL SELECT answering the question; empty if not relevant"
+    )
+
+
 class HumanAnswer(BaseModel):
     answer: str = Field(...)
 
@@ -94,5 +94,16 @@ class RewrittenQuestion(BaseModel):
     question: str = Field(...)
 
 
+# Question embeddings, shared by every cache/index that needs one
+@lru_cache(maxsize=1024)
+def _embed_question(question: str) -> tuple[float, ...]:
+    return tuple(EMBEDDING_MODEL.embed_query(question))
+
+
+def embed_question(question: str) -> list[float]:
+    return list(_embed_question(question))
+
+
 # Database instance
-_db = SQLDatabase.from_uri(DATABASE_URL)
+# Tables are described by the catalog service; skip SQLDatabase's own reflection
+_db = SQLDatabase.from_uri(DATABASE_URL, lazy_table_reflection=True)
@@ -0,0 +1,196 @@
+# summarizer.py
+import datetime as dt
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Optional
+
+import pandas as pd
+
+from config import SUMMARY_MAX_CHARS
+from .executor import unique_columns
+
+MAX_TRACKED_VALUES = 10_000  # per categorical column, keeps memory bounded
+CHUNK_ROWS = 20_000  # rows buffered before one vectorized pass
+MEASURE_HINT = re.compile(r"amount|total|revenue|profit|loss|sales|price|qty|quantity|count|sum")
+ID_COLUMN = re.compile(r"(^id$|_id$)")
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return str(value)
+
+
+class ResultSummarizer:
+    """Streaming column statistics over every row a query returns.
+
+    `update()` is called with each fetched batch (also the ones dropped by the
+    row/byte caps). Batches are buffered into chunks of CHUNK_ROWS and each
+    chunk is folded into a handful of accumulators with vectorized pandas, so
+    memory stays bounded and the summary costs the same prompt size for ten
+    rows or ten million. The summary is optional: if a chunk can't be
+    summarized, `summary()` returns "" and callers show the plain rows.
+    """
+
+    def __init__(self, max_chars: int = SUMMARY_MAX_CHARS):
+        self.max_chars = max_chars
+        self.columns: list[str] = []
+        self.kinds: dict[str, str] = {}  # column → numeric | date | category
+        self.rows = 0
+        self.numeric: dict[str, dict] = {}
+        self.values: dict[str, Counter] = {}
+        self.overflowed: set[str] = set()
+        self.date_range: dict[str, list] = {}
+        self.measure: Optional[str] = None
+        self.group_totals: dict[str, defaultdict] = {}
+        self.trend: dict[pd.Period, float] = defaultdict(float)
+        self.trend_column: Optional[str] = None
+        self._buffer: list[tuple] = []
+        self.failed = False
+
+    # ── Accumulation ────────────────────────────────────────────────
+    def _classify(self, df: pd.DataFrame) -> None:
+        for column in df.columns:
+            sample = df[column].dropna()
+            first = sample.iloc[0] if len(sample) else None
+            if pd.api.types.is_bool(first):
+                self.kinds[column] = "category"
+            elif isinstance(first, (dt.date, dt.datetime)):
+                self.kinds[column] = "date"
+            elif pd.api.types.is_number(first):  # ints, floats, Decimal
+                self.kinds[column] = "numeric"
+            else:
+                self.kinds[column] = "category"
+
+        numeric = [c for c, k in self.kinds.items() if k == "numeric" and not ID_COLUMN.search(c)]
+        hinted = [c for c in numeric if MEASURE_HINT.search(c.lower())]
+        self.measure = (hinted or numeric or [None])[0]
+        self.trend_column = next((c for c, k in self.kinds.items() if k == "date"), None)
+
+    def update(self, columns: list[str], batch) -> None:
+        if self.failed:
+            return
+        self.columns = unique_columns(columns)  # df[column] must be a Series
+        self._buffer.extend(tuple(row) for row in batch)
+        if len(self._buffer) >= CHUNK_ROWS:
+            self._safe_flush()
+
+    def _safe_flush(self) -> None:
+        # Runs inside the fetch loop: a summary problem must not fail the query
+        try:
+            self._flush()
+        except Exception as e:
+            print(f"⚠️ Result summary skipped: {e}")
+            self.failed = True
+            self._buffer = []
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        df = pd.DataFrame.from_records(self._buffer, columns=self.columns)
+        self._buffer = []
+        if not self.kinds:
+            self._classify(df)
+        self.rows += len(df)
+
+        for column, kind in self.kinds.items():
+            series = df[column]
+            if kind == "numeric":
+                values = pd.to_numeric(series, errors="coerce").dropna().astype(float)
+                if values.empty:
+                    continue
+                acc = self.numeric.setdefault(
+                    column, {"count": 0, "sum": 0.0, "sumsq": 0.0, "min": math.inf, "max": -math.inf}
+                )
+                acc["count"] += len(values)
+                acc["sum"] += values.sum()
+                acc["sumsq"] += (values**2).sum()
+                acc["min"] = min(acc["min"], values.min())
+                acc["max"] = max(acc["max"], values.max())
+            elif kind == "date":
+                dates = pd.to_datetime(series, errors="coerce").dropna()
+                if dates.empty:
+                    continue
+                lo, hi = self.date_range.get(column, [dates.min(), dates.max()])
+                self.date_range[column] = [min(lo, dates.min()), max(hi, dates.max())]
+            else:
+                self._count_values(column, series)
+
+        if self.measure:
+            measure = pd.to_numeric(df[self.measure], errors="coerce").fillna(0).astype(float)
+            for column, kind in self.kinds.items():
+                if kind == "category" and column not in self.overflowed:
+                    totals = measure.groupby(df[column].astype(str)).sum()
+                    group = self.group_totals.setdefault(column, defaultdict(float))
+                    for key, value in totals.items():
+                        group[key] += value
+            if self.trend_column:
+                months = pd.to_datetime(df[self.trend_column], errors="coerce").dt.to_period("M")
+                for period, value in measure.groupby(months).sum().items():
+                    self.trend[period] += value
+
+    def _count_values(self, column: str, series: pd.Series) -> None:
+        counts = self.values.setdefault(column, Counter())
+        for value, n in series.astype(str).value_counts().items():
+            if value in counts or len(counts) < MAX_TRACKED_VALUES:
+                counts[value] += n
+            else:
+                self.overflowed.add(column)
+        if column in self.overflowed:
+            self.group_totals.pop(column, None)
+
+    # ── Rendering ───────────────────────────────────────────────────
+    def summary(self, shown_rows: Optional[int] = None) -> str:
+        self._safe_flush()
+        if self.failed:
+            return ""
+        if not self.rows:
+            return "The query returned no rows."
+
+        lines = [f"Rows returned: {self.rows:,}"]
+        if shown_rows is not None and shown_rows < self.rows:
+            lines[0] += f" (the user sees the first {shown_rows:,})"
+        lines.append(f"Columns: {', '.join(f'{c} ({self.kinds[c]})' for c in self.columns)}")
+
+        for column, acc in self.numeric.items():
+            if ID_COLUMN.search(column):
+                lines.append(f"{column}: ids {acc['min']:.0f} to {acc['max']:.0f}")
+                continue
+            mean = acc["sum"] / acc["count"]
+            std = math.sqrt(max(acc["sumsq"] / acc["count"] - mean**2, 0.0))
+            lines.append(
+                f"{column}: sum {_fmt(acc['sum'])}, mean {_fmt(mean)}, std {_fmt(std)}, "
+                f"min {_fmt(acc['min'])}, max {_fmt(acc['max'])}"
+            )
+
+        for column, (lo, hi) in self.date_range.items():
+            lines.append(f"{column}: from {lo.date()} to {hi.date()}")
+
+        for column, counts in self.values.items():
+            distinct = f"{len(counts):,}{'+' if column in self.overflowed else ''} distinct"
+            top = ", ".join(f"{value} ({n:,})" for value, n in counts.most_common(5))
+            lines.append(f"{column}: {distinct}; most frequent: {top}")
+
+        for column, totals in self.group_totals.items():
+            if 1 < len(totals) < self.rows:
+                top = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:5]
+                lines.append(
+                    f"{self.measure} by {column}, top {len(top)}: "
+                    + ", ".join(f"{key} = {_fmt(value)}" for key, value in top)
+                )
+
+        if len(self.trend) > 1:
+            months = sorted(self.trend.items())
+            first, last = months[0][1], months[-1][1]
+            change = f"{(last - first) / abs(first):+.0%}" if first else "n/a"
+            recent = ", ".join(f"{period} = {_fmt(value)}" for period, value in months[-12:])
+            lines.append(
+                f"{self.measure} per month of {self.trend_column} "
+                f"(change first→last month {change}): {recent}"
+            )
+
+        text = "\n".join(lines)
+        if len(text) > self.max_chars:
+            text = text[: self.max_chars].rsplit("\n", 1)[0] + "\n…"
+        return text
@@ -0,0 +1,395 @@
+# templates.py
+import calendar
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+from config import LOW_STOCK_THRESHOLD
+
+ALL_TIME = (date(1970, 1, 1), date(9999, 12, 31))
+
+MONTHS = {
+    name.lower(): i
+    for i, name in enumerate(calendar.month_name)
+    if name
+} | {name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+
+# ── Parameter extraction ─────────────────────────────────────────────
+def _month_range(year: int, month: int) -> tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def parse_period(text: str, today: Optional[date] = None) -> tuple[date, date, str]:
+    """Find a date range in the question; returns (start, end, matched phrase)."""
+    today = today or date.today()
+
+    if m := re.search(r"\btoday'?s?\b", text):
+        return today, today, m.group(0)
+    if m := re.search(r"\byesterday'?s?\b", text):
+        day = today - timedelta(days=1)
+        return day, day, m.group(0)
+    if m := re.search(r"\b(this|current) week\b", text):
+        return today - timedelta(days=today.weekday()), today, m.group(0)
+    if m := re.search(r"\blast week\b", text):
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6), m.group(0)
+    if m := re.search(r"\b(this|current) month\b", text):
+        return today.replace(day=1), today, m.group(0)
+    if m := re.search(r"\b(last|previous) month\b", text):
+        last = today.replace(day=1) - timedelta(days=1)
+        return *_month_range(last.year, last.month), m.group(0)
+    if m := re.search(r"\b(this|current) year\b", text):
+        return date(today.year, 1, 1), today, m.group(0)
+    if m := re.search(r"\b(last|previous) year\b", text):
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31), m.group(0)
+    if m := re.search(r"\b(?:last|past) (\d+|\w+) (day|week|month)s?\b", text):
+        count = int(m.group(1)) if m.group(1).isdigit() else NUMBER_WORDS.get(m.group(1))
+        if count:
+            days = {"day": 1, "week": 7, "month": 30}[m.group(2)] * count
+            return today - timedelta(days=days - 1), today, m.group(0)
+
+    # Month names need a preposition or a year so "may I know..." isn't May
+    month_names = "|".join(sorted(MONTHS, key=len, reverse=True))
+    if m := re.search(
+        rf"\b(?:(?:in|for|during|of|since) ({month_names})\.?(?: (\d{{4}}))?|({month_names})\.? (\d{{4}}))\b",
+        text,
+    ):
+        month_name, year_text = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+        month = MONTHS[month_name]
+        year = int(year_text) if year_text else today.year
+        if not year_text and month > today.month:
+            year -= 1  # "in november" asked in march means last november
+        return *_month_range(year, month), m.group(0)
+    if m := re.search(r"\b(?:in |for |during )?(19|20)(\d{2})\b", text):
+        year = int(m.group(1) + m.group(2))
+        return date(year, 1, 1), date(year, 12, 31), m.group(0)
+
+    return *ALL_TIME, ""
+
+
+def parse_top_n(text: str, default: int = 5) -> tuple[int, str]:
+    """(N of a "top N" question, matched phrase); the default when no N is given."""
+    if m := re.search(r"\b(?:top|best|first|highest|biggest) (\d+|\w+)\b", text):
+        if m.group(1).isdigit():
+            return max(1, min(int(m.group(1)), 100)), m.group(0)
+        if m.group(1) in NUMBER_WORDS:
+            return NUMBER_WORDS[m.group(1)], m.group(0)
+    return default, ""
+
+
+def parse_threshold(text: str, default: int = LOW_STOCK_THRESHOLD) -> tuple[int, str]:
+    """(stock threshold, matched phrase): only a number right after a comparison counts."""
+    if m := re.search(r"\b(?:below|under|less than|fewer than|lower than)\s*(\d+)\b", text):
+        return int(m.group(1)), m.group(0)
+    return default, ""
+
+
+# Filler a question may carry without changing what it asks. Every other
+# word has to be consumed by the template (its trigger words, period, top N,
+# threshold or name), otherwise the question goes to the LLM path:
+# "total sales in cash" must not be answered as "total sales".
+STOPWORDS = frozenset(
+    """
+    a an the and of for in on at to from by with is are was were be been do does did
+    what what's whats which who how much many me my i we our us you your can could would
+    show list give tell get find display see check please pls kindly ji sahab bhai sir
+    total all overall till until so far now there any
+    kya hai hain ka ki ke mera meri mere batao dikhao
+    """.split()
+)
+
+# Still needed to tell a name from a constraint: "sales to ravi above 500"
+CONSTRAINTS = re.compile(
+    r"\b(\d+"
+    r"|more than|less than|greater than|fewer than|higher than|lower than|above|below|under"
+    r"|at least|at most|between|exceeding|equal to|except|excluding|without)\b"
+)
+ENTITY_WORDS = r"\b(customers?|vendors?|suppliers?|products?|items?|parts?|id|name[ds]?)\b"
+
+
+def unconsumed(text: str, consumed: list[str], words: frozenset[str] = frozenset()) -> list[str]:
+    """Words left in `text` once the phrases a template used are taken out,
+    other than stopwords and the template's own `words`."""
+    for phrase in consumed:
+        if phrase:
+            text = re.sub(r"\s+", " ", text.replace(phrase, " ", 1))
+    return [
+        word for word in re.findall(r"[\w']+", text)
+        if word not in STOPWORDS and word not in words
+    ]
+
+
+def _clean_name(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    name = re.sub(r"\b(please|pls|ji|sahab|the|all|with|and|their|dates?|named|called)\b", " ", name)
+    name = re.sub(ENTITY_WORDS, " ", name)  # "customer alice" → "alice"
+    name = re.sub(r"\s+", " ", name).strip(" ?.,'\"")
+    return name or None
+
+
+# ── Templates ────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class QueryTemplate:
+    name: str
+    description: str
+    patterns: tuple[str, ...]
+    sql: str
+    uses_period: bool = False
+    uses_top_n: bool = False
+    name_param: Optional[str] = None  # bound as an ILIKE pattern
+    name_required: bool = False
+    uses_threshold: bool = False
+    allowed: tuple[str, ...] = ()  # words the template answers besides its pattern words
+
+    @property
+    def words(self) -> frozenset[str]:
+        """Every word the template understands: literals in its patterns plus `allowed`."""
+        return frozenset(re.findall(r"[a-z]+", " ".join(self.patterns))) | frozenset(self.allowed)
+
+    def match(self, text: str) -> Optional[re.Match]:
+        for pattern in self.patterns:
+            if m := re.search(pattern, text):
+                return m
+        return None
+
+
+TEMPLATES: list[QueryTemplate] = [
+    QueryTemplate(
+        name="outstanding_udhar_by_customer",
+        description="Unpaid udhar (credit) sales per customer",
+        patterns=(
+            r"\b(udhar|udhaar|credit|dues?|pending|outstanding|unpaid|baki|baaki)\b.*\bcustomers?\b(?: (?P<name>[\w .]+))?",
+            r"\bcustomers?\b.*\b(udhar|udhaar|credit|dues?|pending|outstanding|unpaid)\b",
+            r"\bwho (owes|has to pay)\b",
+        ),
+        sql="""
+SELECT c.customer_name, c.phone_no,
+       COUNT(*) AS unpaid_sales,
+       SUM(s.total_amount) AS outstanding_amount,
+       MIN(u.date_of_entry) AS oldest_entry
+FROM udhar_sales u
+JOIN sales_data s ON s.sales_id = u.sales_id
+JOIN customers c ON c.cust_id = s.customer_id
+WHERE u.date_of_payment IS NULL
+  AND (CAST(:customer_name AS TEXT) IS NULL OR c.customer_name ILIKE :customer_name)
+GROUP BY c.cust_id, c.customer_name, c.phone_no
+ORDER BY outstanding_amount DESC
+""",
+        name_param="customer_name",
+        allowed=("customer", "customers", "money", "amount", "owed", "due"),
+    ),
+    QueryTemplate(
+        name="outstanding_udhar_by_vendor",
+        description="Unpaid udhar (credit) purchases per vendor",
+        patterns=(
+            r"\b(udhar|udhaar|credit|dues?|pending|outstanding|unpaid|baki|baaki)\b.*\b(vendors?|suppliers?)\b(?: (?P<name>[\w .]+))?",
+            r"\b(vendors?|suppliers?)\b.*\b(udhar|udhaar|credit|dues?|pending|outstanding|unpaid)\b",
+            r"\bwho do (i|we) owe\b",
+        ),
+        sql="""
+SELECT v.vendor_name, v.phone_no,
+       COUNT(*) AS unpaid_purchases,
+       SUM(p.total_amount) AS outstanding_amount,
+       MIN(u.date_of_entry) AS oldest_entry
+FROM udhar_purchase u
+JOIN purchase_data p ON p.purch_id = u.purch_id
+JOIN vendors v ON v.vend_id = p.vendor_id
+WHERE u.date_of_payment IS NULL
+  AND (CAST(:vendor_name AS TEXT) IS NULL OR v.vendor_name ILIKE :vendor_name)
+GROUP BY v.vend_id, v.vendor_name, v.phone_no
+ORDER BY outstanding_amount DESC
+""",
+        name_param="vendor_name",
+        allowed=("vendor", "vendors", "supplier", "suppliers", "money", "amount", "owed", "due"),
+    ),
+    QueryTemplate(
+        name="low_stock",
+        description="Products with stock below a threshold",
+        patterns=(
+            r"\b(low|less|short|running out|running low|below|under|fewer than|less than)\b.*\b(stock|quantity|qty|inventory)\b",
+            r"\b(stock|quantity|qty|inventory)\b.*\b(low|below|under|less than|fewer than)\b",
+            r"\bout of stock\b",
+        ),
+        sql="""
+SELECT p.product_name, p.quantity, p.price_purchase, p.price_sale
+FROM products p
+WHERE p.quantity < :threshold
+ORDER BY p.quantity ASC
+""",
+        uses_threshold=True,
+        allowed=("product", "products", "item", "items", "part", "parts", "left", "level", "levels", "remaining"),
+    ),
+    QueryTemplate(
+        name="top_selling_products",
+        description="Most sold products",
+        patterns=(
+            r"\b(top|best|most|highest)[ -](\d+ |\w+ )?(selling|sold|popular)\b.*\b(products?|items?|parts?)\b",
+            r"\b(products?|items?|parts?)\b.*\b(sold|sell|selling) (the )?most\b",
+            r"\bwhich (products?|items?|parts?) (sold|sells|sell)\b",
+        ),
+        sql="""
+SELECT p.product_name, COUNT(*) AS times_sold
+FROM sale_product sp
+JOIN products p ON p.product_id = sp.prod_id
+JOIN sales_data s ON s.sales_id = sp.sales_id
+WHERE s.transaction_date BETWEEN :start_date AND :end_date
+GROUP BY p.product_id, p.product_name
+ORDER BY times_sold DESC
+LIMIT :top_n
+""",
+        uses_period=True,
+        uses_top_n=True,
+        allowed=("product", "products", "item", "items", "part", "parts", "sold"),
+    ),
+    QueryTemplate(
+        name="top_customers",
+        description="Customers with the highest sales amount",
+        patterns=(
+            r"\b(top|best|biggest|highest)\b(?: \d+| \w+)? customers?\b",
+            r"\bwhich customers? (bought|spent|purchased) (the )?most\b",
+        ),
+        sql="""
+SELECT c.customer_name, COUNT(s.sales_id) AS sales_count,
+       SUM(s.total_amount) AS total_amount
+FROM sales_data s
+JOIN customers c ON c.cust_id = s.customer_id
+WHERE s.transaction_date BETWEEN :start_date AND :end_date
+GROUP BY c.cust_id, c.customer_name
+ORDER BY total_amount DESC
+LIMIT :top_n
+""",
+        uses_period=True,
+        uses_top_n=True,
+        allowed=("customer", "customers", "amount", "spending", "purchase", "purchases", "value"),
+    ),
+    QueryTemplate(
+        name="monthly_profit",
+        description="Profit and loss per month",
+        patterns=(
+            r"\b(profit|loss|p ?& ?l|p and l|munafa|kamai)\b",
+        ),
+        sql="""
+SELECT COALESCE(to_char(date_trunc('month', s.transaction_date), 'YYYY-MM'), 'TOTAL') AS month,
+       SUM(pl.amount) AS net_profit,
+       COUNT(*) FILTER (WHERE pl.is_profit) AS profitable_sales,
+       COUNT(*) FILTER (WHERE NOT pl.is_profit) AS loss_sales
+FROM profit_loss pl
+JOIN sales_data s ON s.sales_id = pl.sales_id
+WHERE s.transaction_date BETWEEN :start_date AND :end_date
+GROUP BY ROLLUP (date_trunc('month', s.transaction_date))
+ORDER BY date_trunc('month', s.transaction_date) NULLS LAST
+""",
+        uses_period=True,
+        allowed=("monthly", "month", "months", "per", "net", "made", "earned"),
+    ),
+    QueryTemplate(
+        name="customer_sales_history",
+        description="Sales made to one customer",
+        patterns=(
+            r"\b(sales|bills?|purchases|orders|transactions)\b (made )?(to|by|for|of) "
+            r"(?!(?:products?|items?|parts?|vendors?|suppliers?)\b)(?P<name>[\w .]+)",
+        ),
+        sql="""
+SELECT c.customer_name, s.sales_id, s.transaction_date,
+       s.total_amount, s.total_quantity
+FROM sales_data s
+JOIN customers c ON c.cust_id = s.customer_id
+WHERE c.customer_name ILIKE :customer_name
+  AND s.transaction_date BETWEEN :start_date AND :end_date
+ORDER BY s.transaction_date DESC
+LIMIT 100
+""",
+        uses_period=True,
+        name_param="customer_name",
+        name_required=True,
+        allowed=("customer", "customers", "history", "date", "dates"),
+    ),
+    QueryTemplate(
+        name="total_purchases",
+        description="Total purchases from vendors in a period",
+        patterns=(
+            r"\b(total|how much)\b.*\b(purchases?|purchased|bought|kharid)\b",
+        ),
+        sql="""
+SELECT COUNT(*) AS purchase_count,
+       COALESCE(SUM(p.total_amount), 0) AS total_purchases,
+       COALESCE(SUM(p.total_quantity), 0) AS items_bought
+FROM purchase_data p
+WHERE p.transaction_date BETWEEN :start_date AND :end_date
+""",
+        uses_period=True,
+        allowed=("amount", "value", "made", "done", "purchase"),
+    ),
+    QueryTemplate(
+        name="total_sales",
+        description="Total sales in a period",
+        patterns=(
+            r"\b(total|how much|kitna|kitni)\b.*\b(sales?|sold|sell|revenue|income|bikri)\b",
+            r"\b(sales?|revenue|bikri)\b.*\b(today|yesterday|this|last|in|for)\b",
+        ),
+        sql="""
+SELECT COUNT(*) AS sales_count,
+       COALESCE(SUM(s.total_amount), 0) AS total_sales,
+       COALESCE(SUM(s.total_quantity), 0) AS items_sold
+FROM sales_data s
+WHERE s.transaction_date BETWEEN :start_date AND :end_date
+""",
+        uses_period=True,
+        allowed=("amount", "value", "made", "done", "sale"),
+    ),
+]
+
+
+def match_template(question: str) -> Optional[tuple[QueryTemplate, dict]]:
+    """Find the first template that matches and consumes every meaningful word of the question."""
+    text = re.sub(r"\s+", " ", question.lower()).strip(" ?!.")
+
+    for template in TEMPLATES:
+        m = template.match(text)
+        if not m:
+            continue
+
+        params: dict = {}
+        consumed = []
+        if template.uses_period:
+            params["start_date"], params["end_date"], phrase = parse_period(text)
+            consumed.append(phrase)
+        if template.uses_top_n:
+            params["top_n"], phrase = parse_top_n(text)
+            consumed.append(phrase)
+        if template.uses_threshold:
+            params["threshold"], phrase = parse_threshold(text)
+            consumed.append(phrase)
+        if template.name_param:
+            # Re-match without the period so "sales to ravi last month" yields "ravi"
+            if template.uses_period and consumed[0]:
+                m = template.match(re.sub(r"\s+", " ", text.replace(consumed[0], " ")))
+            raw_name = m.groupdict().get("name") if m else None
+            name = _clean_name(raw_name)
+            if name and (name.isdigit() or CONSTRAINTS.search(name)):
+                continue  # "customer 7", "ravi above 500": not a plain name
+            if name is None and template.name_required:
+                continue
+            consumed.append(raw_name or "")
+            params[template.name_param] = f"%{name}%" if name else None
+
+        leftover = unconsumed(text, consumed, template.words)
+        if leftover:
+            print(f"📋 Template {template.name} skipped, unhandled words: {leftover}")
+            continue
+        return template, params
+
+    return None
+
+
+# Templates whose answer depends on a name from the question: an empty
+# result usually means the name didn't match, not that there is nothing
+NAME_PARAMS = {template.name_param for template in TEMPLATES if template.name_param}
@@ -1,18 +1,23 @@
 # tools.py
-from .shared import _db
+from .executor import QueryResult
 
 
-def format_sql_results(result):
-    if not result:
+def _cell(value) -> str:
+    return "NULL" if value is None else str(value)
+
+
+def format_sql_results(result: QueryResult) -> str:
+    if not result.rows:
         return "No matching records found"
 
-    if isinstance(result, list):
-        if not result:
-            return "No results returned"
-        if len(result) == 1:
-            return "\n".join(f"{k}: {v}" for k, v in result[0].items())
-        return "\n\n".join(
-            f"Record {i + 1}:\n" + "\n".join(f"{k}: {v}" for k, v in row.items())
-            for i, row in enumerate(result[:5])
-        )  # Show max 5 for readability
-    return str(result)
+    if len(result.rows) == 1 and not result.truncated:
+        return "\n".join(f"{k}: {_cell(v)}" for k, v in result.rows[0].items())
+
+    lines = [" | ".join(result.columns)]
+    lines += [" | ".join(_cell(v) for v in row.values()) for row in result.rows]
+    if result.truncated:
+        lines.append(
+            f"... {result.truncated_rows} more rows not shown "
+            f"(capped by {result.truncated_by} after {len(result.rows)} rows)"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,232 @@
+# validator.py
+import difflib
+from dataclasses import dataclass, field
+from typing import Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, SqlglotError
+from sqlglot.optimizer.scope import Scope, traverse_scope
+
+from config import SQL_DEFAULT_LIMIT
+from .catalog import TableInfo
+
+
+@dataclass
+class ValidationResult:
+    sql: str
+    errors: list[str] = field(default_factory=list)
+    fixes: list[str] = field(default_factory=list)
+    export_sql: Optional[str] = None  # the query without the LIMIT added here, for exports
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _suggest(name: str, candidates) -> str:
+    matches = difflib.get_close_matches(name.lower(), list(candidates), n=3, cutoff=0.5)
+    return f" Did you mean {', '.join(matches)}?" if matches else ""
+
+
+def _source_columns(source, catalog: dict[str, TableInfo]) -> Optional[set[str]]:
+    """Column names a FROM source exposes, or None when they can't be known."""
+    if isinstance(source, exp.Table):
+        info = catalog.get(source.name)
+        return set(info.columns) if info else None
+    if isinstance(source, Scope) and isinstance(source.expression, exp.Query):
+        names = source.expression.named_selects
+        return None if not names or "*" in names else set(names)
+    return None
+
+
+def _scope_chain(scope: Scope):
+    while scope is not None:
+        yield scope
+        scope = scope.parent
+
+
+def _fix_table_names(tree: exp.Expression, catalog: dict[str, TableInfo], result: ValidationResult):
+    lookup = {name.lower(): name for name in catalog}
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+
+    for table in tree.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier):
+            continue  # table functions such as generate_series(...)
+        name = table.name
+        if name in catalog or (name.lower() in cte_names and not table.db):
+            continue
+        real = lookup.get(name.lower())
+        if real:
+            table.set("this", exp.to_identifier(real))
+            result.fixes.append(f"table {name} → {real}")
+        else:
+            result.errors.append(
+                f"Unknown table '{name}'.{_suggest(name, catalog)} "
+                f"Available tables: {', '.join(sorted(catalog))}."
+            )
+
+
+def _resolve_qualifier(column: exp.Column, scope: Scope, result: ValidationResult):
+    """Map `column.table` onto a FROM source visible from `scope`, fixing it if needed."""
+    qualifier = column.table
+    for current in _scope_chain(scope):
+        sources = current.selected_sources
+        if qualifier in sources:
+            return sources[qualifier][1]
+        for alias, (_, source) in sources.items():
+            if alias.lower() == qualifier.lower():
+                column.set("table", exp.to_identifier(alias))
+                result.fixes.append(f"{qualifier}.{column.name} → {alias}.{column.name}")
+                return source
+        # Table name used although the table was given an alias
+        for alias, (_, source) in sources.items():
+            if isinstance(source, exp.Table) and source.name.lower() == qualifier.lower():
+                column.set("table", exp.to_identifier(alias))
+                result.fixes.append(f"{qualifier}.{column.name} → {alias}.{column.name}")
+                return source
+
+    in_scope = ", ".join(
+        f"{alias} ({source.name})" if isinstance(source, exp.Table) else alias
+        for alias, (_, source) in scope.selected_sources.items()
+    )
+    result.errors.append(
+        f"Unknown table or alias '{qualifier}' in {qualifier}.{column.name}. "
+        f"Tables in this query: {in_scope or 'none'}."
+    )
+    return None
+
+
+def _fix_column_name(column: exp.Column, columns: set[str], result: ValidationResult) -> bool:
+    name = column.name
+    if name in columns:
+        return True
+    for real in columns:
+        if real.lower() == name.lower():
+            column.set("this", exp.to_identifier(real))
+            result.fixes.append(f"column {name} → {real}")
+            return True
+    return False
+
+
+def _check_columns(scope: Scope, catalog: dict[str, TableInfo], result: ValidationResult):
+    if not isinstance(scope.expression, exp.Select):
+        return
+    # ORDER BY / HAVING may refer to output aliases
+    output_names = {s.alias for s in scope.expression.selects if isinstance(s, exp.Alias)}
+
+    for column in scope.columns:
+        # Outer scopes also list the unqualified columns of correlated subqueries
+        if column.find_ancestor(exp.Select) is not scope.expression:
+            continue
+        name = column.name
+
+        if column.table:
+            source = _resolve_qualifier(column, scope, result)
+            if source is None or isinstance(column.this, exp.Star):
+                continue
+            columns = _source_columns(source, catalog)
+            if columns is None or _fix_column_name(column, columns, result):
+                continue
+            label = source.name if isinstance(source, exp.Table) else column.table
+            result.errors.append(
+                f"Column '{name}' does not exist in {label} ({column.table}).{_suggest(name, columns)} "
+                f"Columns of {label}: {', '.join(sorted(columns))}."
+            )
+            continue
+
+        # Unqualified column: find the sources that have it, innermost scope first
+        unknown_sources, seen = False, set()
+        for current in _scope_chain(scope):
+            matches = []
+            for alias, (_, source) in current.selected_sources.items():
+                columns = _source_columns(source, catalog)
+                if columns is None:
+                    unknown_sources = True
+                    continue
+                seen |= columns
+                if name.lower() in {c.lower() for c in columns}:
+                    matches.append((alias, columns))
+            if matches:
+                break
+
+        if len(matches) > 1:
+            result.errors.append(
+                f"Column '{name}' is ambiguous; it exists in "
+                f"{', '.join(alias for alias, _ in matches)}. Qualify it with the right alias."
+            )
+        elif matches:
+            alias, columns = matches[0]
+            _fix_column_name(column, columns, result)
+            if len(scope.selected_sources) > 1:
+                column.set("table", exp.to_identifier(alias))
+                result.fixes.append(f"{name} → {alias}.{column.name}")
+        elif name not in output_names and not unknown_sources:
+            result.errors.append(
+                f"Column '{name}' does not exist in any table of this query.{_suggest(name, seen)}"
+            )
+
+
+def _add_limit(tree: exp.Query, limit: int, result: ValidationResult) -> exp.Query:
+    if not limit or tree.args.get("limit"):
+        return tree
+    if (
+        isinstance(tree, exp.Select)
+        and not tree.args.get("group")
+        and any(
+            not agg.find_ancestor(exp.Window)
+            for select in tree.selects
+            for agg in select.find_all(exp.AggFunc)
+        )
+    ):
+        return tree  # a plain aggregate returns a single row; COUNT(*) OVER () doesn't
+    result.fixes.append(f"added LIMIT {limit}")
+    return tree.limit(limit)
+
+
+def validate_sql(
+    sql: str, catalog: dict[str, TableInfo], default_limit: int = SQL_DEFAULT_LIMIT
+) -> ValidationResult:
+    """Check generated SQL against the catalog without touching the database.
+
+    Trivial problems (identifier case, table name used instead of its alias,
+    unqualified columns in joins, a missing LIMIT) are fixed in place;
+    everything else comes back as precise errors for the retry loop.
+    """
+    result = ValidationResult(sql)
+    try:
+        statements = [s for s in sqlglot.parse(sql, read="postgres") if s is not None]
+    except ParseError as e:
+        detail = e.errors[0] if e.errors else {}
+        result.errors.append(
+            f"Syntax error at line {detail.get('line', '?')}, column {detail.get('col', '?')}: "
+            f"{detail.get('description', str(e))}"
+        )
+        return result
+
+    if len(statements) != 1:
+        result.errors.append(f"Exactly one SELECT statement is allowed, got {len(statements)}.")
+        return result
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        result.errors.append(f"Only SELECT queries are allowed, got {tree.key.upper()}.")
+        return result
+
+    _fix_table_names(tree, catalog, result)
+    if result.errors:
+        return result
+
+    try:
+        for scope in traverse_scope(tree):
+            _check_columns(scope, catalog, result)
+    except SqlglotError as e:
+        print(f"⚠️ Skipping column checks: {e}")
+    if result.errors:
+        return result
+
+    unlimited = tree.sql(dialect="postgres", pretty=True) if result.fixes else sql
+    limited = _add_limit(tree, default_limit, result)
+    if result.fixes:
+        result.sql = limited.sql(dialect="postgres", pretty=True)
+    result.export_sql = unlimited if limited is not tree else result.sql
+    return result
@@ -3,11 +3,12 @@ import os
 import io
 import sys
 import tempfile
+import uuid
 from typing import cast
 from agents.sql_agent.langgraph_agent import agent as sql_agent  # Import the SQL agent
-from agents.rag_agent.langgraph_agent import agent as rag_agent  # Import the RAG agent
-from agents.rag_agent.shared import AgentState as RagAgentState
-from agents.sql_agent.shared import AgentState as SQLAgentState
+from agents.rag_agent.langgraph_agent import thread_config
+from agents.rag_agent.streaming import stream_rag_events
+from agents.sql_agent.shared import AgentState as SQLAgentState, new_state
 from langchain_core.messages import HumanMessage
 from utils.main import Store, delete_temp_files
 
@@ -24,6 +25,8 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "uploaded_files" not in st.session_state:
     st.session_state.uploaded_files = []
+if "thread_id" not in st.session_state:
+    st.session_state.thread_id = str(uuid.uuid4())  # RAG conversation memory
 
 
 def save_uploaded_file(uploaded_file) -> str:
@@ -41,15 +44,7 @@ def run_sql_query(question: str) -> str:
         response = cast(
             SQLAgentState,
             sql_agent.invoke(
-                {
-                    "question": question,
-                    "attempts": 0,
-                    "curr_question": "",
-                    "sql_query": "",
-                    "query_result": "",
-                    "relevance": False,
-                    "sql_error": [],
-                }
+                new_state(question)
             ),
         )
 
@@ -76,41 +71,17 @@ def run_sql_query(question: str) -> str:
         return f"❌ Error running SQL Agent:\n{str(e)}"
 
 
-def run_document_search(question: str) -> str:
-    """Run RAG agent and return formatted response"""
-    try:
-        response = cast(
-            RagAgentState,
-            rag_agent.invoke(
-                {
-                    "messages": [HumanMessage(content=question)],
-                    "route": "rag",
-                    "rag": "",
-                    "web": "",
-                    "Rag_Citation": None,
-                    "Web_Citation": None,
-                }
-            ),
-        )
-
-        messages = response.get("messages", [])
-        rag_citation = response.get("Rag_Citation")
-        web_citation = response.get("Web_Citation")
-
-        if not messages:
-            return "⚠️ No response generated from RAG agent."
-
-        content = "\n\n".join([f"💬 {msg.content}" for msg in messages])
+def format_rag_response(question: str, content: str, rag_citation, web_citation) -> str:
+    """Format RAG answer with its citations for the chat history"""
+    citation_section = ""
+    if rag_citation or web_citation:
+        citation_section = "\n\n---\n#### 📚 Citations"
+        if rag_citation:
+            citation_section += f"\n- From Documents: {rag_citation}"
+        if web_citation:
+            citation_section += f"\n- From Web: {web_citation}"
 
-        citation_section = ""
-        if rag_citation or web_citation:
-            citation_section = "\n\n---\n#### 📚 Citations"
-            if rag_citation:
-                citation_section += f"\n- From Documents: {rag_citation}"
-            if web_citation:
-                citation_section += f"\n- From Web: {web_citation}"
-
-        formatted = f"""
+    return f"""
 ### 🔍 RAG Agent Response
 
 **❓ Question:** {question}
@@ -119,10 +90,56 @@ def run_document_search(question: str) -> str:
 
 {citation_section}
 """
-        return formatted
 
+
+def stream_document_search(question: str) -> str:
+    """Run RAG agent, rendering progress and answer tokens as they arrive"""
+    status = st.status("Thinking...", expanded=False)
+    answer_box = st.empty()
+    answer = ""
+    rag_citation, web_citation = None, None
+
+    try:
+        for event in stream_rag_events(
+            {
+                "messages": [HumanMessage(content=question)],
+                "route": "rag",
+                "rag": "",
+                "web": "",
+                "Rag_Citation": None,
+                "Web_Citation": None,
+            },
+            config=thread_config(st.session_state.thread_id),
+        ):
+            kind = event["event"]
+            if kind == "routed":
+                status.update(label=f"🧭 Route: {event['route']}")
+                status.write(f"🧭 Routed to **{event['route']}** by {event['by']}")
+            elif kind == "retrieved":
+                status.update(label="📚 Checking retrieved documents...")
+                status.write(f"📚 Retrieved {len(event['sources'])} chunks")
+            elif kind == "judged":
+                verdict = "sufficient" if event["sufficient"] else "not sufficient"
+                status.write(f"⚖️ Documents judged {verdict}")
+            elif kind == "web_searched":
+                status.write(f"🌐 Web search returned {len(event['sources'])} results")
+            elif kind == "token":
+                if not answer:
+                    status.update(label="✍️ Answering...")
+                answer += event["content"]
+                answer_box.markdown(f"💬 {answer}▌")
+            elif kind == "done":
+                rag_citation = event["rag_citation"]
+                web_citation = event["web_citation"]
+        status.update(label="✅ Done", state="complete")
+        content = f"💬 {answer}" if answer else "⚠️ No response generated from RAG agent."
     except Exception as e:
-        return f"❌ Error running RAG Agent:\n{str(e)}"
+        status.update(label="❌ Failed", state="error")
+        content = f"❌ Error running RAG Agent:\n{str(e)}"
+
+    formatted = format_rag_response(question, content, rag_citation, web_citation)
+    answer_box.markdown(formatted, unsafe_allow_html=True)
+    return formatted
 
 
 def extract_text_preview(file_path: str) -> str:
@@ -353,17 +370,15 @@ def main():
         with st.chat_message("user"):
             st.markdown(prompt)
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                if "RAG Agent" in agent_type:
-                    st.write("🔍 **Using RAG Agent** - Searching through documents...")
-                    response = run_document_search(prompt)
-                elif "SQL Agent" in agent_type:
+            if "RAG Agent" in agent_type:
+                st.write("🔍 **Using RAG Agent** - Searching through documents...")
+                response = stream_document_search(prompt)
+            elif "SQL Agent" in agent_type:
+                with st.spinner("Thinking..."):
                     st.write("📊 **Using SQL Agent** - Querying database...")
                     response = run_sql_query(prompt)
                 st.markdown(response, unsafe_allow_html=True)
-                st.session_state.messages.append(
-                    {"role": "assistant", "content": response}
-                )
+            st.session_state.messages.append({"role": "assistant", "content": response})
 
     st.markdown("---")
     col1, col2, col3 = st.columns(3)
@@ -374,6 +389,7 @@ def main():
     with col3:
         if st.button("🗑️ Clear Chat History"):
             st.session_state.messages = []
+            st.session_state.thread_id = str(uuid.uuid4())
             st.rerun()
 
     sys.stdout = sys.__stdout__
@@ -26,3 +26,121 @@ EMBEDDING_MODEL = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
 DOCUMENTS_DIR = "./documents"  # Adjust path as needed
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+
+# RAG agent: local pre-router in front of the LLM router
+PRE_ROUTER_ENABLED = os.getenv("PRE_ROUTER_ENABLED", "true").lower() == "true"
+PRE_ROUTER_CONFIDENCE = float(os.getenv("PRE_ROUTER_CONFIDENCE", "0.6"))
+PRE_ROUTER_MARGIN = float(os.getenv("PRE_ROUTER_MARGIN", "0.15"))
+
+# RAG agent: start the Tavily search while judge_llm is still deciding
+SPECULATIVE_WEB_SEARCH = os.getenv("SPECULATIVE_WEB_SEARCH", "false").lower() == "true"
+
+# RAG agent: Tavily result cache (WEB_CACHE_PATH="" keeps it in memory only)
+WEB_CACHE_TTL_SECONDS = float(os.getenv("WEB_CACHE_TTL_SECONDS", "3600"))
+WEB_CACHE_STALE_SECONDS = float(os.getenv("WEB_CACHE_STALE_SECONDS", "86400"))
+WEB_CACHE_MAX_ENTRIES = int(os.getenv("WEB_CACHE_MAX_ENTRIES", "500"))
+WEB_CACHE_PATH = os.getenv("WEB_CACHE_PATH", "./web_cache.sqlite3")
+
+# RAG agent: split compound questions into sub-queries retrieved in one round trip
+RAG_MULTI_QUERY = os.getenv("RAG_MULTI_QUERY", "true").lower() == "true"
+RAG_MAX_SUBQUERIES = int(os.getenv("RAG_MAX_SUBQUERIES", "4"))
+
+# RAG agent: per-thread conversation memory
+RAG_CHECKPOINT_BACKEND = os.getenv("RAG_CHECKPOINT_BACKEND", "sqlite")  # sqlite | postgres | memory
+RAG_CHECKPOINT_PATH = os.getenv("RAG_CHECKPOINT_PATH", "./rag_memory.sqlite3")
+RAG_CHECKPOINT_DB_URL = os.getenv("RAG_CHECKPOINT_DB_URL", V_DATABASE_URL)
+RAG_MEMORY_WINDOW = int(os.getenv("RAG_MEMORY_WINDOW", "6"))  # messages kept verbatim
+
+# SQL agent: question → validated SQL cache (similarity 0 disables embedding matches)
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "./sql_plan_cache.json")
+PLAN_CACHE_SIMILARITY = float(os.getenv("PLAN_CACHE_SIMILARITY", "0"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "2000"))  # least recently used evicted
+PLAN_CACHE_SAVE_DELAY_SECONDS = float(os.getenv("PLAN_CACHE_SAVE_DELAY_SECONDS", "5"))  # batch file writes
+
+# SQL agent graph variant: "sequential" (relevance, then SQL), "fused" (one call)
+# or "speculative" (both calls concurrently, SQL discarded if irrelevant)
+SQL_AGENT_MODE = os.getenv("SQL_AGENT_MODE", "sequential")
+
+# SQL agent: local query templates
+SQL_TEMPLATES_ENABLED = os.getenv("SQL_TEMPLATES_ENABLED", "true").lower() == "true"
+SQL_TEMPLATE_INSIGHTS = os.getenv("SQL_TEMPLATE_INSIGHTS", "false").lower() == "true"
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "20"))
+
+# SQL agent: caps on rows/bytes fetched from one query (server-side cursor)
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "200"))
+SQL_MAX_BYTES = int(os.getenv("SQL_MAX_BYTES", "262144"))
+SQL_FETCH_SIZE = int(os.getenv("SQL_FETCH_SIZE", "100"))
+
+# SQL agent: guardrails applied before/while running generated SQL
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "1000000"))
+SQL_MAX_PLAN_ROWS = float(os.getenv("SQL_MAX_PLAN_ROWS", "1000000"))
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))
+
+# SQL agent: local sqlglot validation / auto-repair of generated SQL
+SQL_VALIDATE_ENABLED = os.getenv("SQL_VALIDATE_ENABLED", "true").lower() == "true"
+SQL_DEFAULT_LIMIT = int(os.getenv("SQL_DEFAULT_LIMIT", "1000"))  # 0 disables
+
+# SQL agent: send only the tables relevant to each question (plus join paths)
+SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() == "true"
+SCHEMA_TOP_N = int(os.getenv("SCHEMA_TOP_N", "3"))
+
+# SQL agent: introspected schema catalog (CATALOG_CACHE_PATH="" keeps it in memory only)
+CATALOG_CACHE_PATH = os.getenv("CATALOG_CACHE_PATH", "./schema_catalog.json")
+CATALOG_CHECK_SECONDS = float(os.getenv("CATALOG_CHECK_SECONDS", "60"))  # DDL signature check interval
+
+# SQL agent: compact local summary of the full result sent to the insights prompt
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "2000"))
+SUMMARY_SAMPLE_ROWS = int(os.getenv("SUMMARY_SAMPLE_ROWS", "10"))
+
+# SQL agent: result handles for paging through / exporting full results
+RESULT_HANDLE_TTL_SECONDS = float(os.getenv("RESULT_HANDLE_TTL_SECONDS", "3600"))
+RESULT_HANDLE_MAX = int(os.getenv("RESULT_HANDLE_MAX", "1000"))
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "100"))
+RESULT_PAGE_MAX = int(os.getenv("RESULT_PAGE_MAX", "1000"))
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+SQL_EXPORT_TIMEOUT_MS = int(os.getenv("SQL_EXPORT_TIMEOUT_MS", "120000"))
+
+# SQL agent: log of answered questions, reused as few-shot examples (QUERY_LOG_PATH="" keeps it in memory)
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "./sql_query_log.sqlite3")
+FEW_SHOT_ENABLED = os.getenv("FEW_SHOT_ENABLED", "true").lower() == "true"
+FEW_SHOT_K = int(os.getenv("FEW_SHOT_K", "3"))
+FEW_SHOT_MIN_SIMILARITY = float(os.getenv("FEW_SHOT_MIN_SIMILARITY", "0.6"))
+FEW_SHOT_INDEX_MAX = int(os.getenv("FEW_SHOT_INDEX_MAX", "2000"))
+
+# SQL agent: result cache invalidated by trigger-maintained table versions (LISTEN/NOTIFY)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+RESULT_CACHE_VOLATILE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_VOLATILE_TTL_SECONDS", "60"))  # now(), CURRENT_DATE
+
+# SQL agent: fuzzy resolution of product/customer/vendor names mentioned in questions
+ENTITY_RESOLUTION_ENABLED = os.getenv("ENTITY_RESOLUTION_ENABLED", "true").lower() == "true"
+ENTITY_MIN_SIMILARITY = float(os.getenv("ENTITY_MIN_SIMILARITY", "0.45"))
+ENTITY_REFRESH_SECONDS = float(os.getenv("ENTITY_REFRESH_SECONDS", "300"))  # re-check for pg_trgm while it is missing
+
+# SQL agent: monthly range partitions of sales_data / purchase_data
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "12"))  # empty months kept ahead of today
+
+# SQL agent: heavy aggregates offloaded to DuckDB over Parquet snapshots of the core tables
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "false").lower() == "true"
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "./analytics_snapshots")
+ANALYTICS_TABLES = os.getenv(
+    "ANALYTICS_TABLES",
+    "customers,vendors,products,sales_data,purchase_data,sale_product,purchase_product,"
+    "profit_loss,udhar_sales,udhar_purchase",
+).split(",")
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "60"))
+ANALYTICS_MAX_STALENESS_SECONDS = float(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", "300"))
+ANALYTICS_MIN_COST = float(os.getenv("ANALYTICS_MIN_COST", "50000"))  # PostgreSQL plan cost
+# Insert-only changes are appended by key; rewriting a file bigger than
+# ANALYTICS_FULL_EXPORT_MAX_MB (after updates/deletes) waits for ANALYTICS_FULL_EXPORT_SECONDS
+ANALYTICS_FULL_EXPORT_MAX_MB = float(os.getenv("ANALYTICS_FULL_EXPORT_MAX_MB", "64"))
+ANALYTICS_FULL_EXPORT_SECONDS = float(os.getenv("ANALYTICS_FULL_EXPORT_SECONDS", "3600"))
+ANALYTICS_MAX_DELTA_FILES = int(os.getenv("ANALYTICS_MAX_DELTA_FILES", "20"))  # merged locally beyond this
+
+# SQL agent: approximate answers from block samples (with ± bounds) for rough questions and huge scans
+APPROX_ENABLED = os.getenv("APPROX_ENABLED", "true").lower() == "true"
+APPROX_MIN_COST = float(os.getenv("APPROX_MIN_COST", "100000"))  # plan cost that gets sampled unasked
+APPROX_SAMPLE_ROWS = int(os.getenv("APPROX_SAMPLE_ROWS", "100000"))  # rows the sample aims to read
+APPROX_MAX_FRACTION = float(os.getenv("APPROX_MAX_FRACTION", "0.2"))  # above this, run exactly
@@ -1,13 +1,32 @@
 # main.py (project root)
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-from agents.rag_agent.langgraph_agent import agent as rag_agent
+from agents.rag_agent.langgraph_agent import agent as rag_agent, thread_config
 from agents.sql_agent.langgraph_agent import agent as sql_agent
 from agents.rag_agent.shared import AgentState as RagAgentState
-from agents.sql_agent.shared import AgentState as SQLAgentState
+from agents.sql_agent.shared import AgentState as SQLAgentState, new_state
+from agents.sql_agent.plan_cache import plan_cache
+from agents.sql_agent.schema_retriever import schema_retriever
+from agents.sql_agent.catalog import catalog_service
+from agents.sql_agent.executor import QueryRejected
+from agents.sql_agent.query_log import query_log
+from agents.sql_agent.result_cache import result_cache
+from agents.sql_agent.entities import entity_index
+from agents.sql_agent.analytics import analytics_engine
+from agents.sql_agent.nodes import get_speculative_sql_stats
+from agents.sql_agent.approximate import get_approximate_stats
+from agents.sql_agent.result_handles import result_handles, fetch_page, stream_csv, stream_arrow
+from agents.rag_agent.pre_router import get_pre_router_stats
+from agents.rag_agent.nodes import get_speculative_web_stats
+from agents.rag_agent.tools import web_cache
+from agents.rag_agent.streaming import stream_rag_events, to_sse
 from langchain_core.messages import HumanMessage
+from sqlalchemy.exc import SQLAlchemyError
+from itertools import chain
+from config import RESULT_PAGE_SIZE
 
 app = FastAPI(title="LangGraph Agent Hub")
 
@@ -16,41 +35,146 @@ app = FastAPI(title="LangGraph Agent Hub")
 class QueryInput(BaseModel):
     question: str
     agent_type: str  # "rag" or "sql"
+    thread_id: Optional[str] = None  # RAG conversation to continue; new one if omitted
+    approximate: Optional[bool] = None  # SQL: True to sample when possible, False for exact only
 
 
 @app.post("/agent/execute")
 def run_agent(query: QueryInput):
     user_message = HumanMessage(content=query.question)
     if query.agent_type == "rag":
+        # Earlier turns come from the thread's checkpoint, only send the new one
+        config = thread_config(query.thread_id)
         initial_state: RagAgentState = {
-            "messages": user_message,
+            "messages": [user_message],
             "route": "rag",  # Start with RAG lookup
             "rag": "",
             "web": "",
             "Rag_Citation": None,
             "Web_Citation": None,
         }  # type: ignore
-        final_state = rag_agent.invoke(initial_state)
+        final_state = rag_agent.invoke(initial_state, config=config)
 
     elif query.agent_type == "sql":
-        initial_state: SQLAgentState = {
-            "question": query.question,
-            "attempts": 0,
-            "curr_question": "",
-            "sql_query": "",
-            "query_result": "",
-            "relevance": False,
-            "sql_error": [],
-        }
+        initial_state: SQLAgentState = new_state(query.question)
+        initial_state["approximate"] = query.approximate
         final_state = sql_agent.invoke(initial_state)
 
     else:
         return {"error": "Invalid agent_type. Use 'rag' or 'sql'."}
 
     if query.agent_type == "rag":
-        return {"response": [msg.content for msg in final_state["messages"]]}
+        return {
+            "response": [msg.content for msg in final_state["messages"]],
+            "thread_id": config["configurable"]["thread_id"],
+        }
     else:
-        return {"response": final_state.get("query_result", "No response generated")}
+        return {
+            "response": final_state.get("query_result", "No response generated"),
+            "result_handle": final_state.get("result_handle") or None,
+            "truncated_rows": final_state.get("truncated_rows", 0),
+            "approximate": final_state.get("approximation") or None,
+        }
+
+
+@app.post("/agent/stream")
+def stream_agent(query: QueryInput):
+    """Server-Sent Events: routed/retrieved/judged progress, then answer tokens."""
+    if query.agent_type != "rag":
+        return {"error": "Streaming is only available for agent_type 'rag'."}
+
+    config = thread_config(query.thread_id)
+    initial_state: RagAgentState = {
+        "messages": [HumanMessage(content=query.question)],
+        "route": "rag",
+        "rag": "",
+        "web": "",
+        "Rag_Citation": None,
+        "Web_Citation": None,
+    }  # type: ignore
+
+    def event_stream():
+        try:
+            for event in stream_rag_events(initial_state, config=config):
+                yield to_sse(event)
+        except Exception as e:
+            yield to_sse({"event": "error", "message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _get_handle(handle_id: str):
+    handle = result_handles.get(handle_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result handle.")
+    return handle
+
+
+@app.get("/agent/results/{handle_id}")
+def result_page(handle_id: str, cursor: Optional[str] = None, page_size: int = RESULT_PAGE_SIZE):
+    """Keyset-paginated rows of an earlier SQL answer; pass back `next_cursor` for the next page."""
+    handle = _get_handle(handle_id)
+    try:
+        return fetch_page(handle, cursor, page_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (SQLAlchemyError, QueryRejected) as e:
+        raise HTTPException(status_code=502, detail=f"Query failed: {e}")
+
+
+def _export(chunks, media_type: str, filename: str):
+    # Start the query before answering, so a rejected or failing query is an
+    # HTTP error instead of a truncated download
+    try:
+        first = next(chunks)
+    except (SQLAlchemyError, QueryRejected) as e:
+        raise HTTPException(status_code=502, detail=f"Query failed: {e}")
+    return StreamingResponse(
+        chain([first], chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/agent/results/{handle_id}/csv")
+def result_csv(handle_id: str):
+    handle = _get_handle(handle_id)
+    return _export(stream_csv(handle), "text/csv", f"result-{handle_id}.csv")
+
+
+@app.get("/agent/results/{handle_id}/arrow")
+def result_arrow(handle_id: str):
+    handle = _get_handle(handle_id)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Arrow export needs pyarrow installed.")
+    return _export(
+        stream_arrow(handle), "application/vnd.apache.arrow.stream", f"result-{handle_id}.arrows"
+    )
+
+
+@app.get("/agent/stats")
+def agent_stats():
+    return {
+        "rag_pre_router": get_pre_router_stats(),
+        "rag_speculative_web": get_speculative_web_stats(),
+        "rag_web_cache": web_cache.get_stats(),
+        "sql_plan_cache": plan_cache.get_stats(),
+        "sql_schema_retriever": schema_retriever.get_stats(),
+        "sql_catalog": catalog_service.get_stats(),
+        "sql_result_handles": result_handles.get_stats(),
+        "sql_query_log": query_log.get_stats(),
+        "sql_speculative": get_speculative_sql_stats(),
+        "sql_result_cache": result_cache.get_stats() if result_cache else None,
+        "sql_entities": entity_index.get_stats(),
+        "sql_analytics": analytics_engine.get_stats() if analytics_engine else None,
+        "sql_approximate": get_approximate_stats(),
+    }
 
 
 @app.get("/")
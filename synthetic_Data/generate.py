@@ -0,0 +1,432 @@
+# generate.py
+# Production-size synthetic data, TPC-H style: every row is a function of
+# (seed, scale factor), so two runs with the same arguments load the same data.
+#   python -m synthetic_Data.generate --scale 1 --seed 42 --workers 4 [--reset]
+import argparse
+import datetime as dt
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from .data_filling import Base, DATABASE_URL
+
+# Rows per unit of scale factor; line items, P&L and udhar follow from sales/purchases
+BASE_ROWS = {
+    "customers": 150_000,
+    "vendors": 2_000,
+    "products": 20_000,
+    "sales_data": 1_500_000,
+    "purchase_data": 100_000,
+}
+CHUNK_ROWS = 250_000  # rows generated and COPYed per job
+START, END = dt.date(2021, 1, 1), dt.date(2024, 12, 31)
+
+UDHAR_SALES_SHARE = 0.2  # sales on credit
+UDHAR_SALES_PAID = 0.75  # of those, settled by END
+UDHAR_PURCHASE_SHARE = 0.35
+UDHAR_PURCHASE_PAID = 0.8
+
+# Popularity follows a Zipf law: a few customers, products and vendors get
+# most of the business (the exponent sets how steep)
+ZIPF = {"customers": 0.9, "products": 1.1, "vendors": 1.2}
+MONTH_SEASONALITY = np.array([0.9, 0.85, 0.95, 1.0, 1.0, 0.9, 0.9, 0.95, 1.05, 1.3, 1.35, 1.1])  # Oct/Nov festivals
+WEEKEND_BOOST = 1.35
+YEARLY_GROWTH = 0.2
+
+# Keys for the per-table random streams
+CALENDAR, POPULARITY, CUSTOMERS, VENDORS, PRODUCTS, SALES, PURCHASES = range(7)
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Arjun", "Rohan", "Ishaan", "Kabir", "Rahul", "Amit", "Suresh",
+    "Priya", "Ananya", "Diya", "Kavya", "Neha", "Pooja", "Sunita", "Meera", "Fatima", "Ayesha",
+    "Imran", "Salman", "Hamza", "Bilal", "Gurpreet", "Harpreet", "Manoj", "Deepak", "Ravi", "Sanjay",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Gupta", "Singh", "Kumar", "Patel", "Shah", "Khan", "Ansari", "Qureshi",
+    "Reddy", "Naidu", "Iyer", "Nair", "Das", "Bose", "Yadav", "Chauhan", "Mehta", "Joshi",
+]
+VENDOR_KINDS = ["Auto Parts", "Motors", "Traders", "Distributors", "Spares", "Agencies", "Enterprises", "Wholesale"]
+PART_ITEMS = [
+    "Brake Pad", "Oil Filter", "Air Filter", "Spark Plug", "Clutch Plate", "Headlight Bulb", "Wiper Blade",
+    "Engine Oil 1L", "Radiator Hose", "Timing Belt", "Battery", "Shock Absorber", "Fuel Pump", "Fan Belt",
+    "Horn", "Side Mirror", "Tail Lamp", "Brake Shoe", "Chain Sprocket Kit", "Coolant",
+]
+PART_BRANDS = ["Bosch", "Lumax", "Minda", "Exide", "Amaron", "Castrol", "Valeo", "Denso", "Gabriel", "NGK", "Rolon", "TVS"]
+PART_FITS = [
+    "Maruti Swift", "Hyundai i20", "Honda City", "Tata Nexon", "Mahindra Bolero",
+    "Hero Splendor", "Bajaj Pulsar", "Honda Activa", "Toyota Innova", "Royal Enfield",
+]
+
+TABLE_COLUMNS = {
+    "customers": ("cust_id", "customer_name", "phone_no"),
+    "vendors": ("vend_id", "vendor_name", "phone_no"),
+    "products": ("product_id", "product_name", "price_purchase", "price_sale", "quantity"),
+    "sales_data": ("sales_id", "customer_id", "transaction_date", "total_amount", "total_quantity"),
+    "purchase_data": ("purch_id", "vendor_id", "transaction_date", "total_amount", "total_quantity"),
+    "sale_product": ("sales_id", "prod_id"),
+    "purchase_product": ("purch_id", "prod_id"),
+    "profit_loss": ("sales_id", "is_profit", "amount"),
+    "udhar_sales": ("udhar_id", "sales_id", "date_of_entry", "date_of_payment"),
+    "udhar_purchase": ("udhar_id", "purch_id", "date_of_entry", "date_of_payment"),
+}
+# Chunks of these tables follow the chunks of their parent rows
+PARENT = {
+    "sale_product": "sales_data",
+    "profit_loss": "sales_data",
+    "udhar_sales": "sales_data",
+    "purchase_product": "purchase_data",
+    "udhar_purchase": "purchase_data",
+}
+SERIAL_COLUMNS = {
+    "customers": "cust_id",
+    "vendors": "vend_id",
+    "products": "product_id",
+    "sales_data": "sales_id",
+    "purchase_data": "purch_id",
+    "udhar_sales": "udhar_id",
+    "udhar_purchase": "udhar_id",
+}
+
+
+def row_counts(scale: float) -> dict[str, int]:
+    return {table: max(1, int(rows * scale)) for table, rows in BASE_ROWS.items()}
+
+
+def _rng(seed: int, *key: int) -> np.random.Generator:
+    return np.random.default_rng([seed, *key])
+
+
+def _chunk_ids(rows: int, chunk: int) -> np.ndarray:
+    return np.arange(chunk * CHUNK_ROWS + 1, min((chunk + 1) * CHUNK_ROWS, rows) + 1)
+
+
+# ── Shared distributions (rebuilt identically in every worker) ───────
+@lru_cache(maxsize=None)
+def _calendar(seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """(days, cumulative share of transactions): growth, busier weekends and festival months."""
+    days = np.arange(np.datetime64(START), np.datetime64(END + dt.timedelta(days=1)))
+    years = (days - days[0]).astype(int) / 365.25
+    weights = (1 + YEARLY_GROWTH) ** years
+    weights *= np.where((days.astype(int) + 3) % 7 >= 5, WEEKEND_BOOST, 1.0)  # 1970-01-01 was a Thursday
+    weights *= MONTH_SEASONALITY[days.astype("datetime64[M]").astype(int) % 12]
+    weights *= np.exp(_rng(seed, CALENDAR).normal(0, 0.1, len(days)))
+    cdf = np.cumsum(weights)
+    return days, cdf / cdf[-1]
+
+
+def _dates(seed: int, rng: np.random.Generator, ids: np.ndarray, rows: int) -> np.ndarray:
+    """Transaction dates for ids 1..rows, non-decreasing in id like a real append-only log."""
+    days, cdf = _calendar(seed)
+    position = (ids - 1 + rng.random(len(ids))) / rows
+    return days[np.minimum(np.searchsorted(cdf, position, side="right"), len(days) - 1)]
+
+
+@lru_cache(maxsize=None)
+def _popularity(seed: int, kind: str, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """(ids ordered by popularity, cumulative Zipf share) for picking `kind` rows."""
+    ranked = _rng(seed, POPULARITY, list(ZIPF).index(kind)).permutation(n) + 1
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1) ** ZIPF[kind])
+    return ranked, cdf / cdf[-1]
+
+
+def _pick(seed: int, kind: str, n: int, rng: np.random.Generator, size: int) -> np.ndarray:
+    ranked, cdf = _popularity(seed, kind, n)
+    return ranked[np.minimum(np.searchsorted(cdf, rng.random(size)), n - 1)]
+
+
+@lru_cache(maxsize=None)
+def _products(seed: int, n: int) -> dict[str, np.ndarray]:
+    rng = _rng(seed, PRODUCTS)
+    cost = np.maximum(np.round(np.exp(rng.normal(np.log(150), 0.9, n)), 2), 5.0)
+    margin = rng.uniform(0.05, 0.45, n)
+    combos = len(PART_ITEMS) * len(PART_BRANDS) * len(PART_FITS)
+    names = [
+        f"{PART_BRANDS[(i // len(PART_ITEMS)) % len(PART_BRANDS)]} {PART_ITEMS[i % len(PART_ITEMS)]} "
+        f"{PART_FITS[(i // (len(PART_ITEMS) * len(PART_BRANDS))) % len(PART_FITS)]}"
+        + (f" Mk{i // combos + 1}" if i >= combos else "")
+        for i in range(n)
+    ]
+    return {
+        "product_id": np.arange(1, n + 1),
+        "product_name": np.array(names, dtype=object),
+        "price_purchase": cost,
+        "price_sale": np.round(cost * (1 + margin), 2),
+        "quantity": rng.integers(0, 500, n),
+    }
+
+
+def _phones(rng: np.random.Generator, prefix: str, size: int) -> np.ndarray:
+    return np.char.add(prefix, np.char.zfill(rng.integers(0, 10**8, size).astype(str), 8))
+
+
+# ── Table chunks ────────────────────────────────────────────────────
+def _named(seed: int, key: int, rows: int, chunk: int, first: list[str], second: list[str], phone_prefix: str) -> list:
+    """id, "<first> <second>" name and phone number, for customers and vendors."""
+    ids = _chunk_ids(rows, chunk)
+    rng = _rng(seed, key, chunk)
+    names = (
+        np.array(first, dtype=object)[rng.integers(0, len(first), len(ids))]
+        + " "
+        + np.array(second, dtype=object)[rng.integers(0, len(second), len(ids))]
+    )
+    return [ids, names, _phones(rng, phone_prefix, len(ids))]
+
+
+def _udhar(rng: np.random.Generator, ids: np.ndarray, dates: np.ndarray, share: float, paid: float, mean_days: int) -> list:
+    """Credit on a `share` of the transactions; the paid ones settle after ~mean_days."""
+    on_credit = rng.random(len(ids)) < share
+    ids, dates = ids[on_credit], dates[on_credit]
+    payment = np.minimum(dates + rng.geometric(1 / mean_days, len(ids)).astype("timedelta64[D]"), np.datetime64(END))
+    payment = np.where(rng.random(len(ids)) < paid, payment, np.datetime64("NaT", "D"))
+    # One credit record per transaction, so its id doubles as udhar_id and
+    # stays the same whichever worker loads it
+    return [ids, ids, dates, payment]
+
+
+def _lines(seed: int, rng: np.random.Generator, ids: np.ndarray, products: int, p: float, cap: int) -> tuple[np.ndarray, np.ndarray]:
+    """(parent id, product id) line items, distinct per parent, sorted."""
+    per_parent = np.minimum(rng.geometric(p, len(ids)), cap)
+    parent = np.repeat(ids, per_parent).astype(np.int64)
+    product = _pick(seed, "products", products, rng, len(parent))
+    key = np.unique(parent * (products + 1) + product)
+    return key // (products + 1), key % (products + 1)
+
+
+def _sales_chunk(seed: int, counts: dict, chunk: int) -> dict[str, list]:
+    rows = counts["sales_data"]
+    ids = _chunk_ids(rows, chunk)
+    rng = _rng(seed, SALES, chunk)
+    dates = _dates(seed, rng, ids, rows)
+    customers = _pick(seed, "customers", counts["customers"], rng, len(ids))
+    line_sale, line_product = _lines(seed, rng, ids, counts["products"], 0.4, 8)
+    quantity = rng.integers(1, 5, len(line_sale))
+
+    catalog = _products(seed, counts["products"])
+    slot = line_sale - ids[0]
+    revenue = np.bincount(slot, quantity * catalog["price_sale"][line_product - 1], len(ids))
+    cost = np.bincount(slot, quantity * catalog["price_purchase"][line_product - 1], len(ids))
+    # Bargaining: most bills at list price, some discounted past the margin
+    discount = rng.choice([1.0, 0.97, 0.95, 0.9, 0.8], len(ids), p=[0.6, 0.2, 0.1, 0.07, 0.03])
+    total = np.round(revenue * discount, 2)
+    profit = np.round(total - cost, 2)
+    return {
+        "sales_data": [ids, customers, dates, total, np.bincount(slot, quantity, len(ids)).astype(int)],
+        "sale_product": [line_sale, line_product],
+        "profit_loss": [ids, profit >= 0, profit],
+        "udhar_sales": _udhar(rng, ids, dates, UDHAR_SALES_SHARE, UDHAR_SALES_PAID, 20),
+    }
+
+
+def _purchases_chunk(seed: int, counts: dict, chunk: int) -> dict[str, list]:
+    rows = counts["purchase_data"]
+    ids = _chunk_ids(rows, chunk)
+    rng = _rng(seed, PURCHASES, chunk)
+    dates = _dates(seed, rng, ids, rows)
+    vendors = _pick(seed, "vendors", counts["vendors"], rng, len(ids))
+    line_purchase, line_product = _lines(seed, rng, ids, counts["products"], 0.2, 15)
+    quantity = rng.integers(10, 200, len(line_purchase))
+
+    catalog = _products(seed, counts["products"])
+    slot = line_purchase - ids[0]
+    cost = np.bincount(slot, quantity * catalog["price_purchase"][line_product - 1], len(ids))
+    total = np.round(cost * rng.uniform(0.95, 1.0, len(ids)), 2)  # bulk rebates
+    return {
+        "purchase_data": [ids, vendors, dates, total, np.bincount(slot, quantity, len(ids)).astype(int)],
+        "purchase_product": [line_purchase, line_product],
+        "udhar_purchase": _udhar(rng, ids, dates, UDHAR_PURCHASE_SHARE, UDHAR_PURCHASE_PAID, 30),
+    }
+
+
+def table_chunk(table: str, seed: int, counts: dict, chunk: int) -> list[np.ndarray]:
+    """Columns (in TABLE_COLUMNS order) of one chunk of `table`."""
+    if table == "customers":
+        return _named(seed, CUSTOMERS, counts["customers"], chunk, FIRST_NAMES, LAST_NAMES, "98")
+    if table == "vendors":
+        return _named(seed, VENDORS, counts["vendors"], chunk, LAST_NAMES, VENDOR_KINDS, "88")
+    if table == "products":
+        catalog = _products(seed, counts["products"])
+        part = slice(chunk * CHUNK_ROWS, (chunk + 1) * CHUNK_ROWS)
+        return [catalog[column][part] for column in TABLE_COLUMNS["products"]]
+    family = PARENT.get(table, table)
+    # The children are rebuilt from the same random stream as their parent
+    # chunk, so each table can be loaded by its own worker
+    build = _sales_chunk if family == "sales_data" else _purchases_chunk
+    return build(seed, counts, chunk)[table]
+
+
+def chunks(table: str, counts: dict) -> int:
+    return -(-counts[PARENT.get(table, table)] // CHUNK_ROWS)
+
+
+# ── COPY ────────────────────────────────────────────────────────────
+def _as_text(column: np.ndarray) -> np.ndarray:
+    if column.dtype == bool:
+        return np.where(column, "t", "f")
+    if np.issubdtype(column.dtype, np.datetime64):
+        return np.where(np.isnat(column), "", column.astype(str))  # empty CSV field = NULL
+    return column.astype(str)
+
+
+def to_csv(columns: list[np.ndarray]) -> io.StringIO:
+    buffer = io.StringIO()
+    buffer.writelines(",".join(row) + "\n" for row in zip(*map(_as_text, columns)))
+    buffer.seek(0)
+    return buffer
+
+
+def copy_chunk(url: str, table: str, seed: int, counts: dict, chunk: int) -> tuple[str, int]:
+    """Generate one chunk and stream it in with COPY, on this worker's own connection."""
+    columns = table_chunk(table, seed, counts, chunk)
+    engine = create_engine(url, poolclass=NullPool)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.execute("SET synchronous_commit = off")  # a lost chunk is regenerated, not recovered
+            # No triggers during the load: children land before their parents, so
+            # rollup triggers would join against nothing; _finish rebuilds instead
+            cur.execute("SET session_replication_role = replica")
+            cur.copy_expert(
+                f"COPY {table} ({', '.join(TABLE_COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)",
+                to_csv(columns),
+            )
+        raw.commit()
+    finally:
+        raw.close()
+        engine.dispose()
+    return table, len(columns[0])
+
+
+def _prepare(engine, reset: bool) -> None:
+    Base.metadata.create_all(bind=engine)  # no-op for tables that exist (partitioned ones included)
+    with engine.begin() as conn:
+        if reset:
+            conn.exec_driver_sql(f"TRUNCATE {', '.join(TABLE_COLUMNS)} RESTART IDENTITY CASCADE")
+            return
+        filled = [t for t in TABLE_COLUMNS if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {t})")).scalar()]
+    if filled:
+        raise SystemExit(f"❌ {', '.join(filled)} already hold rows; rerun with --reset to replace them")
+
+
+def _drop_constraints(engine) -> list[str]:
+    """Drop foreign keys and secondary indexes for the load; returns the DDL that restores them.
+
+    Checking a foreign key per COPYed row costs more than generating the row;
+    re-adding it afterwards validates every row in one join, and an index
+    built once is faster than one maintained row by row.
+    """
+    tables = {"tables": list(TABLE_COLUMNS)}
+    with engine.begin() as conn:
+        foreign_keys = conn.execute(
+            text(
+                "SELECT conrelid::regclass::text, quote_ident(conname), pg_get_constraintdef(oid) "
+                "FROM pg_constraint WHERE contype = 'f' AND conrelid = ANY(CAST(:tables AS regclass[]))"
+            ),
+            tables,
+        ).all()
+        indexes = conn.execute(
+            text(
+                "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index "
+                "WHERE indrelid = ANY(CAST(:tables AS regclass[])) AND NOT indisunique"
+            ),
+            tables,
+        ).all()
+        for table, name, _ in foreign_keys:
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+        for name, _ in indexes:
+            conn.exec_driver_sql(f"DROP INDEX {name}")  # on a partitioned parent, drops the partitions' too
+    # pg_get_indexdef says "ON ONLY" for partitioned parents; without ONLY the
+    # index cascades to every partition again
+    return [ddl.replace(" ON ONLY ", " ON ", 1) for _, ddl in indexes] + [
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}" for table, name, definition in foreign_keys
+    ]
+
+
+def _finish(engine, restore: list[str]) -> None:
+    with engine.begin() as conn:
+        for ddl in restore:
+            conn.exec_driver_sql(ddl)
+        for table, column in SERIAL_COLUMNS.items():
+            conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)"
+                )
+            )
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in TABLE_COLUMNS:
+            conn.exec_driver_sql(f"ANALYZE {table}")
+    _refresh_derived(engine)
+
+
+def _refresh_derived(engine) -> None:
+    """Catch up what the disabled triggers (and TRUNCATE) didn't see: rollups, table versions, catalog."""
+    with engine.connect() as conn:
+        has_rollups = conn.execute(text("SELECT to_regclass('monthly_pnl') IS NOT NULL")).scalar()
+        has_versions = conn.execute(text("SELECT to_regclass('table_versions') IS NOT NULL")).scalar()
+    if has_rollups:
+        from agents.sql_agent.rollups import rebuild_rollups
+
+        rebuild_rollups(engine)
+    if has_versions:
+        # Cached results of every table are stale; NOTIFY reaches running result caches
+        with engine.begin() as conn:
+            changed = conn.execute(
+                text("UPDATE table_versions SET version = version + 1, changed_at = now() RETURNING table_name")
+            ).scalars().all()
+            for table in changed:
+                conn.execute(text("SELECT pg_notify('table_versions', :table)"), {"table": table})
+    from agents.sql_agent.catalog import catalog_service
+
+    catalog_service.invalidate()  # row estimates moved by orders of magnitude
+
+
+def generate(url: str = DATABASE_URL, scale: float = 1.0, seed: int = 42, workers: int = 4, reset: bool = False) -> dict[str, int]:
+    """Load the ten shop tables at `scale`; returns rows loaded per table."""
+    counts = row_counts(scale)
+    engine = create_engine(url)
+    _prepare(engine, reset)
+    loaded = dict.fromkeys(TABLE_COLUMNS, 0)
+    started = time.perf_counter()
+    restore = _drop_constraints(engine)
+    try:
+        # Round-robin over the tables so every table streams in parallel;
+        # without foreign keys during the load, the order doesn't matter
+        jobs = [
+            (table, chunk)
+            for chunk in range(max(chunks(table, counts) for table in TABLE_COLUMNS))
+            for table in TABLE_COLUMNS
+            if chunk < chunks(table, counts)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(copy_chunk, url, table, seed, counts, chunk) for table, chunk in jobs]
+            for future in futures:
+                table, rows = future.result()
+                loaded[table] += rows
+        copied = time.perf_counter()
+        print(f"📦 COPY done in {copied - started:.1f}s: {', '.join(f'{t} {n:,}' for t, n in loaded.items())}")
+    finally:
+        _finish(engine, restore)  # put the keys back even if a job failed
+        engine.dispose()
+    elapsed = time.perf_counter() - started
+    total = sum(loaded.values())
+    print(
+        f"✅ Scale {scale:g}, seed {seed}: {total:,} rows in {elapsed:.1f}s "
+        f"({total / elapsed:,.0f} rows/s, {elapsed - (copied - started):.1f}s of it rebuilding keys and indexes)"
+    )
+    return loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seeded synthetic shop data at a scale factor, loaded with COPY.")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 ≈ 1.5M sales, 150k customers, 20k products")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=4, help="parallel COPY connections")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--reset", action="store_true", help="truncate the tables first")
+    args = parser.parse_args()
+    generate(args.database_url, args.scale, args.seed, args.workers, args.reset)
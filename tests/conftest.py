@@ -0,0 +1,5 @@
+import os
+
+# config.py builds the LLM clients at import; they only need a key to exist
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
@@ -0,0 +1,15 @@
+from agents.sql_agent.executor import QueryResult, _collect, unique_columns
+from agents.sql_agent.tools import format_sql_results
+
+
+def test_repeated_columns_get_suffixes():
+    assert unique_columns(["sales_id", "amount", "sales_id", "sales_id"]) == [
+        "sales_id", "amount", "sales_id_2", "sales_id_3",
+    ]
+
+
+def test_rows_keep_every_value_of_a_join_with_repeated_names():
+    result = QueryResult(columns=["sales_id", "total_amount", "sales_id", "amount"])
+    _collect(result, [[(1, 61.0, 1, 12.2), (2, 72.0, 2, 14.4)]], max_rows=10, max_bytes=10_000, on_batch=None)
+    assert result.rows[0] == {"sales_id": 1, "total_amount": 61.0, "sales_id_2": 1, "amount": 12.2}
+    assert format_sql_results(result).splitlines()[1] == "1 | 61.0 | 1 | 12.2"
@@ -0,0 +1,25 @@
+import pytest
+
+from agents.rag_agent.pre_router import SMALL_TALK_REPLIES, pre_route, small_talk_reply
+
+
+@pytest.mark.parametrize(
+    "message, kind",
+    [
+        ("hi", "greeting"),
+        ("good morning ji", "greeting"),
+        ("thanks a lot", "thanks"),
+        ("thank you so much!", "thanks"),
+        ("ok", "ack"),
+        ("bye", "farewell"),
+        ("ok bye", "farewell"),
+        ("goodbye 👋", "farewell"),
+    ],
+)
+def test_small_talk_gets_a_reply_for_its_kind(message, kind):
+    assert small_talk_reply(message) == SMALL_TALK_REPLIES[kind]
+
+
+def test_greeting_rule_is_whole_message_only():
+    assert pre_route("thanks")[0] == "end"
+    assert pre_route("hi, what is the total on the laptop bill?")[0] == "rag"
@@ -0,0 +1,34 @@
+from agents.sql_agent import schema_retriever as module
+from agents.sql_agent.catalog import TableInfo
+from agents.sql_agent.schema_retriever import SchemaRetriever, table_docs
+
+
+def _catalog(rows: int) -> dict[str, TableInfo]:
+    return {
+        "customers": TableInfo("customers", {"customer_id": "INTEGER", "customer_name": "VARCHAR"}, row_estimate=rows),
+        "udhar_sales": TableInfo("udhar_sales", {"date_of_payment": "DATE"}, row_estimate=rows),
+    }
+
+
+def test_docs_come_from_catalog_names_and_notes():
+    docs = table_docs(_catalog(10)["udhar_sales"])
+    assert docs[1].startswith("date of payment, NULL while unpaid (udhar_sales:")
+    assert not any("rows" in doc for doc in docs)
+
+
+def test_row_estimate_changes_do_not_reembed(monkeypatch):
+    embedded = []
+    retriever = SchemaRetriever(embed_documents=lambda docs: embedded.append(docs) or [[1.0]] * len(docs))
+    monkeypatch.setattr(module, "get_catalog", lambda: _catalog(10))
+    retriever._ensure_index(module.get_catalog())
+    monkeypatch.setattr(module, "get_catalog", lambda: _catalog(5_000))
+    retriever._ensure_index(module.get_catalog())
+    assert len(embedded) == 1
+
+
+def test_retrieval_failure_sends_full_schema(monkeypatch):
+    retriever = SchemaRetriever(embed_query=lambda question: 1 / 0)
+    monkeypatch.setattr(module, "get_catalog", lambda: _catalog(10))
+    monkeypatch.setattr(retriever, "embed_documents", lambda docs: [[1.0]] * len(docs))
+    monkeypatch.setattr(module, "get_schema", lambda: "FULL SCHEMA")
+    assert retriever.schema_for("who owes me money?") == "FULL SCHEMA"
@@ -0,0 +1,23 @@
+import datetime as dt
+
+from agents.sql_agent.summarizer import ResultSummarizer
+
+
+def test_repeated_column_names_are_summarized():
+    summarizer = ResultSummarizer()
+    summarizer.update(
+        ["sales_id", "customer", "total_amount", "sales_id", "amount"],
+        [(1, "ali", 61.0, 1, 12.2), (2, "ravi", 72.0, 2, 14.4), (3, "ali", 10.0, 3, 2.0)],
+    )
+    text = summarizer.summary()
+    assert "Rows returned: 3" in text
+    assert "sales_id_2" in text
+    assert "total_amount by customer" in text
+
+
+def test_unsummarizable_result_falls_back_to_empty_summary():
+    summarizer = ResultSummarizer()
+    summarizer.update(["day", "total_amount"], [(dt.date(2024, 1, 1), 5.0)])
+    summarizer._flush = lambda: 1 / 0
+    assert summarizer.summary() == ""
+    summarizer.update(["day", "total_amount"], [(dt.date(2024, 1, 2), 6.0)])  # ignored, no raise
@@ -0,0 +1,64 @@
+from datetime import date
+
+import pytest
+
+from agents.sql_agent.templates import match_template, parse_period, parse_threshold
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "total sales of product 7 this year",
+        "profit margin on product 7",
+        "compare profit in january and february",
+        "list customers with udhar more than 500",
+        "quantity less than 5 and price above 100",
+        "low stock in 2024",
+        "what is my profit from sharma ji",
+        "total sales on monday",
+        "total sales in cash",
+        "sales yesterday of brake pads",
+        "top 5 customers by number of visits",
+    ],
+)
+def test_unconsumed_words_fall_through_to_llm(question):
+    assert match_template(question) is None
+
+
+@pytest.mark.parametrize(
+    "question, template, params",
+    [
+        ("total sales today", "total_sales", {}),
+        ("what's the total sales today?", "total_sales", {}),
+        ("how much did we sell in 2024", "total_sales", {}),
+        ("what is my profit this year", "monthly_profit", {}),
+        ("which products are running out of stock", "low_stock", {}),
+        ("top 3 customers this month", "top_customers", {"top_n": 3}),
+        ("top selling products", "top_selling_products", {"top_n": 5}),
+        ("products with stock below 10", "low_stock", {"threshold": 10}),
+        ("which products are low in stock", "low_stock", {}),
+        ("who owes me money", "outstanding_udhar_by_customer", {"customer_name": None}),
+        ("pending udhar of customer ali", "outstanding_udhar_by_customer", {"customer_name": "%ali%"}),
+        ("total sales for customer Alice", "customer_sales_history", {"customer_name": "%alice%"}),
+        ("sales to ravi last month please", "customer_sales_history", {"customer_name": "%ravi%"}),
+    ],
+)
+def test_supported_questions_match(question, template, params):
+    matched = match_template(question)
+    assert matched is not None
+    assert matched[0].name == template
+    assert params.items() <= matched[1].items()
+
+
+def test_sales_history_rejects_numeric_names():
+    assert match_template("sales of customer id 7") is None
+
+
+def test_threshold_needs_a_comparison():
+    assert parse_threshold("stock in 2024")[0] != 2024
+    assert parse_threshold("stock under 15") == (15, "under 15")
+
+
+def test_month_without_year_means_the_last_one():
+    start, end, phrase = parse_period("profit in november", today=date(2025, 3, 10))
+    assert (start, end, phrase) == (date(2024, 11, 1), date(2024, 11, 30), "in november")
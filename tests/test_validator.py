@@ -0,0 +1,48 @@
+import pytest
+
+from agents.sql_agent.catalog import TableInfo
+from agents.sql_agent.validator import validate_sql
+
+CATALOG = {
+    "sales_data": TableInfo(
+        "sales_data",
+        {"sales_id": "INTEGER", "customer_id": "INTEGER", "total_amount": "FLOAT", "transaction_date": "DATE"},
+    ),
+    "customers": TableInfo("customers", {"cust_id": "INTEGER", "customer_name": "VARCHAR"}),
+}
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT COUNT(*) OVER () FROM sales_data",
+        "SELECT sales_id, SUM(total_amount) OVER (ORDER BY transaction_date) FROM sales_data",
+        "SELECT sales_id FROM sales_data",
+        "SELECT customer_id, SUM(total_amount) FROM sales_data GROUP BY customer_id",
+    ],
+)
+def test_row_returning_queries_get_a_limit(sql):
+    result = validate_sql(sql, CATALOG, default_limit=1000)
+    assert result.ok
+    assert "LIMIT 1000" in result.sql
+    assert "LIMIT" not in result.export_sql
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT COUNT(*) FROM sales_data",
+        "SELECT SUM(total_amount), COUNT(*) OVER () FROM sales_data",
+        "SELECT sales_id FROM sales_data LIMIT 5",
+    ],
+)
+def test_single_row_and_limited_queries_are_left_alone(sql):
+    result = validate_sql(sql, CATALOG, default_limit=1000)
+    assert result.ok
+    assert "LIMIT 1000" not in result.sql
+
+
+def test_unknown_column_is_reported():
+    result = validate_sql("SELECT amount FROM sales_data", CATALOG)
+    assert not result.ok
+    assert "amount" in result.errors[0]